@@ -13,7 +13,7 @@ class BlogPostForm(forms.ModelForm):
             'category': forms.Select(attrs={'class': 'form-select'}),
         }
         help_texts = {
-            'slug': 'A unique URL-friendly version of the title',
+            'slug': 'A unique URL-friendly version of the title; leave blank to generate it',
             'excerpt': 'A brief summary of your post (optional)',
         }
 
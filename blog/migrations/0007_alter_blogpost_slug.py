@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_alter_blogpost_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blogpost',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=250, unique=True),
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.utils import timezone
 import os
 from django.conf import settings
 
+from homabay_souq.slugs import save_with_unique_slug
+
 # Try to import CloudinaryField, fallback to ImageField if not available
 try:
     from cloudinary.models import CloudinaryField
@@ -39,7 +41,7 @@ class BlogPost(models.Model):
     )
     
     title = models.CharField(max_length=200)
-    slug = models.SlugField(unique=True, max_length=250)
+    slug = models.SlugField(unique=True, max_length=250, blank=True)
     excerpt = models.TextField(blank=True, help_text="Brief description of the post")
     content = models.TextField()
     
@@ -130,6 +132,10 @@ class BlogPost(models.Model):
             # Create directory if it doesn't exist
             os.makedirs(os.path.join(settings.MEDIA_ROOT, 'blog_images'), exist_ok=True)
         
+        # Generate a unique slug from the title if not provided
+        if not self.slug:
+            return save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
+        
         super().save(*args, **kwargs)
 
 class BlogPostLike(models.Model):
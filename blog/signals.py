@@ -0,0 +1,22 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from homabay_souq.conditional import bump_collection
+
+
+def bump_blog(sender, update_fields=None, **kwargs):
+    # Counting a read saves only view_count; that alone must not retire every validator
+    if update_fields is not None and set(update_fields) <= {'view_count'}:
+        return
+    bump_collection('blog')
+
+
+def bump_blog_likes(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_collection('blog')
+
+
+for sender in ('blog.BlogPost', 'blog.BlogCategory', 'blog.BlogComment', 'blog.BlogPostLike'):
+    post_save.connect(bump_blog, sender=sender, dispatch_uid=f'bump_blog:save:{sender}')
+    post_delete.connect(bump_blog, sender=sender, dispatch_uid=f'bump_blog:delete:{sender}')
+# post.likes.add()/remove() go through m2m_changed, not the through model's save
+m2m_changed.connect(bump_blog_likes, sender='blog.BlogPostLike', dispatch_uid='bump_blog_likes')
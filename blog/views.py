@@ -12,9 +12,13 @@ from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 
+from homabay_souq.conditional import Validators, collection_versions, conditional_page
+from homabay_souq.page_cache import cache_anonymous_page
+
 from .models import BlogPost, BlogCategory, BlogComment, BlogPostLike
 from .forms import BlogPostForm, BlogCategoryForm, BlogCommentForm, BlogSearchForm
 
+@method_decorator(cache_anonymous_page('blog'), name='dispatch')
 class BlogPostListView(ListView):
     model = BlogPost
     template_name = 'blog/post_list.html'
@@ -82,6 +86,20 @@ class BlogPostListView(ListView):
         
         return context
 
+def post_validators(request, slug):
+    updated = BlogPost.objects.filter(slug=slug, status='published').values_list('updated_at', flat=True).first()
+    if updated is None:
+        return None
+    versions = collection_versions('blog')
+    return Validators('post', slug, updated, versions, modified=[updated, *versions.values()])
+
+
+def count_cached_view(request, slug):
+    # The 304 skipped the view, which counts every read
+    BlogPost.objects.filter(slug=slug, status='published').update(view_count=F('view_count') + 1)
+
+
+@method_decorator(conditional_page(post_validators, on_not_modified=count_cached_view), name='dispatch')
 class BlogPostDetailView(DetailView):
     model = BlogPost
     template_name = 'blog/post_detail.html'
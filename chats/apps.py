@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chats'
+
+    def ready(self):
+        import chats.signals  # noqa: F401 (import registers signal handlers)
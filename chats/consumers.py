@@ -0,0 +1,241 @@
+"""
+WebSocket chat endpoint, served by ``homabay_souq.asgi`` at
+``/chats/ws/conversation/<pk>/``.
+
+Frames are JSON objects with a ``type``:
+
+client -> server
+    ``{"type": "message", "content": "...", "client_id": "..."}``
+    ``{"type": "typing"}``
+    ``{"type": "read", "message_id": 123}``
+
+server -> client
+    ``{"type": "message", "message": {...}}`` for every participant
+    ``{"type": "ack", "client_id": "...", "message": {...}}`` to the sender
+    ``{"type": "typing", "user": "...", "user_id": 1}``
+    ``{"type": "read", "user_id": 1, "message_id": 123}``
+    ``{"type": "resync"}`` when this socket fell behind; reload over HTTP
+    ``{"type": "error", "error": "..."}``
+
+Fan-out goes through the broker from ``homabay_souq.pubsub`` (the channel
+layer), so messages sent over plain HTTP reach open sockets too.
+"""
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.http.cookie import parse_cookie
+from django.http.request import validate_host
+
+from homabay_souq.pubsub import get_broker, publish
+from .inbox import mark_conversation_read
+from .models import Conversation, Message
+from .realtime import conversation_channel, message_payload
+
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+
+def database_sync_to_async(func):
+    """Run ORM code off the event loop, recycling stale connections like a request would"""
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(inner)
+
+
+def _header(scope, name):
+    values = [value for key, value in scope.get('headers', []) if key == name]
+    return b'; '.join(values).decode('latin1')
+
+
+def origin_allowed(scope):
+    """Reject cross-site socket hijacking: the Origin must be one of our hosts"""
+    origin = _header(scope, b'origin')
+    if not origin:
+        # Non-browser clients don't send Origin and can't ride a victim's cookies
+        return True
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    return validate_host(urlsplit(origin).hostname or '', allowed_hosts)
+
+
+async def get_scope_user(scope):
+    """Resolve the session cookie on a socket handshake to a user"""
+    session_key = parse_cookie(_header(scope, b'cookie')).get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return AnonymousUser()
+    engine = import_module(settings.SESSION_ENGINE)
+    request = SimpleNamespace(session=engine.SessionStore(session_key))
+    return await aget_user(request)
+
+
+class ChatConsumer:
+    """One WebSocket connection to one conversation"""
+
+    def __init__(self, scope, receive, send, conversation_id):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.conversation_id = conversation_id
+        self.user = None
+        self.subscription = None
+        self.last_typing = 0
+        self.tokens = self.burst = getattr(settings, 'CHAT_SOCKET_MESSAGE_BURST', 5)
+        self.refill_rate = getattr(settings, 'CHAT_SOCKET_MESSAGES_PER_SECOND', 1)
+        self.last_refill = time.monotonic()
+
+    async def __call__(self):
+        event = await self.receive()
+        if event['type'] != 'websocket.connect':
+            return
+        if not await self.authorize():
+            await self.send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+            return
+
+        self.subscription = get_broker().subscribe(
+            conversation_channel(self.conversation_id),
+            maxsize=getattr(settings, 'CHAT_SOCKET_QUEUE_SIZE', 50),
+        )
+        await self.send({'type': 'websocket.accept'})
+        pump = asyncio.create_task(self.pump())
+        try:
+            while True:
+                event = await self.receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    await self.handle_frame(event.get('text') or '')
+        finally:
+            pump.cancel()
+            self.subscription.close()
+
+    async def authorize(self):
+        if not origin_allowed(self.scope):
+            return False
+        self.user = await get_scope_user(self.scope)
+        if not self.user.is_authenticated:
+            return False
+        return await database_sync_to_async(
+            Conversation.objects.filter(pk=self.conversation_id, participants=self.user).exists
+        )()
+
+    async def send_json(self, data):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(data)})
+
+    async def pump(self):
+        """Forward broker events to this socket, signalling when events were dropped"""
+        while True:
+            event = await self.subscription.get()
+            if self.subscription.overflowed:
+                self.subscription.overflowed = False
+                await self.send_json({'type': 'resync'})
+            if event.get('type') == 'typing' and event.get('user_id') == self.user.pk:
+                continue
+            await self.send_json(event)
+
+    def take_token(self):
+        """Token bucket limiting how fast one socket can post messages"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def handle_frame(self, text):
+        try:
+            frame = json.loads(text)
+            frame_type = frame['type']
+        except (ValueError, TypeError, KeyError):
+            await self.send_json({'type': 'error', 'error': 'invalid_frame'})
+            return
+
+        if frame_type == 'message':
+            await self.handle_message(frame)
+        elif frame_type == 'typing':
+            await self.handle_typing()
+        elif frame_type == 'read':
+            await self.handle_read(frame)
+        else:
+            await self.send_json({'type': 'error', 'error': 'unknown_type'})
+
+    async def handle_message(self, frame):
+        content = str(frame.get('content') or '').strip()
+        max_length = getattr(settings, 'CHAT_MESSAGE_MAX_LENGTH', 5000)
+        if not content or len(content) > max_length:
+            await self.send_json({'type': 'error', 'error': 'invalid_content'})
+            return
+        if not self.take_token():
+            await self.send_json({'type': 'error', 'error': 'rate_limited'})
+            return
+
+        message = await database_sync_to_async(self.create_message)(content)
+        await self.send_json({
+            'type': 'ack',
+            'client_id': frame.get('client_id'),
+            'message': message_payload(message),
+        })
+
+    def create_message(self, content):
+        # The post_save handler fans the message out to every open socket
+        return Message.objects.create(
+            conversation_id=self.conversation_id,
+            sender=self.user,
+            content=content,
+        )
+
+    async def handle_typing(self):
+        # Typing indicators are ephemeral: broker only, no database
+        now = time.monotonic()
+        if now - self.last_typing < getattr(settings, 'CHAT_TYPING_INTERVAL_SECONDS', 3):
+            return
+        self.last_typing = now
+        publish(conversation_channel(self.conversation_id), {
+            'type': 'typing',
+            'user': self.user.username,
+            'user_id': self.user.pk,
+        })
+
+    async def handle_read(self, frame):
+        try:
+            message_id = int(frame.get('message_id'))
+        except (TypeError, ValueError):
+            await self.send_json({'type': 'error', 'error': 'invalid_message_id'})
+            return
+        await database_sync_to_async(self.mark_read)(message_id)
+
+    def mark_read(self, message_id):
+        return mark_conversation_read(self.conversation_id, self.user, up_to_message_id=message_id)
+
+
+websocket_routes = [
+    (re.compile(r'^/chats/ws/conversation/(?P<pk>\d+)/$'), ChatConsumer),
+]
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI entry point for every ``websocket`` scope"""
+    for pattern, consumer_class in websocket_routes:
+        match = pattern.match(scope['path'])
+        if match:
+            consumer = consumer_class(scope, receive, send, int(match.group('pk')))
+            return await consumer()
+
+    # Unknown path: wait for the handshake, then refuse it
+    await receive()
+    await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
@@ -1,17 +1,10 @@
-from .models import Message
+from .inbox import total_unread
 
 
 def messages_context(request):
     """Context processor to add unread messages count to all templates"""
     if request.user.is_authenticated:
-        unread_count = Message.objects.filter(
-            conversation__participants=request.user
-        ).exclude(
-            sender=request.user
-        ).filter(
-            is_read=False
-        ).count()
         return {
-            'unread_messages_count': unread_count
+            'unread_messages_count': total_unread(request.user)
         }
-    return {'unread_messages_count': 0}
\ No newline at end of file
+    return {'unread_messages_count': 0}
@@ -0,0 +1,52 @@
+from django.conf import settings
+
+from .models import ConversationMember, Message
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def get_page_size(requested=None):
+    default = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    if not requested:
+        return default
+    return max(1, min(int(requested), MAX_PAGE_SIZE))
+
+
+def get_message_page(conversation_id, after_id=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One slice of a conversation's messages in chronological order, with the
+    sender joined in the same query.
+
+    * ``after_id``: the oldest ``limit`` messages newer than it (delta sync)
+    * ``before_id``: the newest ``limit`` messages older than it (history)
+    * neither: the newest ``limit`` messages
+
+    Returns ``(messages, has_more)``; ``has_more`` means further messages exist
+    in the direction of travel (newer for ``after_id``, older otherwise).
+    """
+    messages = Message.objects.filter(conversation_id=conversation_id).select_related('sender')
+
+    if after_id is not None:
+        page = list(messages.filter(id__gt=after_id).order_by('id')[:limit + 1])
+        return page[:limit], len(page) > limit
+
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    page = list(messages.order_by('-id')[:limit + 1])
+    has_more = len(page) > limit
+    return page[:limit][::-1], has_more
+
+
+def sync_etag(conversation, user, after_id=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Entity tag for a message-list response. It changes whenever a message is
+    added to the conversation or another participant's read watermark moves
+    (which flips ``is_read`` on ``user``'s own messages), so an idle poll is
+    answered with a 304 without touching the messages table.
+    """
+    watermarks = ConversationMember.objects.filter(conversation_id=conversation.pk).exclude(
+        user_id=user.pk
+    ).order_by('user_id').values_list('last_read_message_id', flat=True)
+    read = '.'.join(str(watermark or 0) for watermark in watermarks)
+    return f'"m{conversation.pk}-{conversation.last_message_id or 0}-r{read}-u{user.pk}-{after_id}-{before_id}-{limit}"'
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import F, Q, Subquery, Sum
+
+from homabay_souq.conditional import bump_collection
+
+from .models import Conversation, ConversationMember, Message
+from .realtime import notify_messages_read
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_PAGE_SIZE = 30
+
+
+def inbox_collection(user_id):
+    return f'inbox:{user_id}'
+
+
+def bump_inboxes(user_ids):
+    """Retire the inbox validators of ``user_ids`` (see homabay_souq.conditional)"""
+    bump_collection(*(inbox_collection(user_id) for user_id in user_ids))
+
+
+def add_members(conversation_id, user_ids):
+    ConversationMember.objects.bulk_create(
+        [ConversationMember(conversation_id=conversation_id, user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def record_message(message):
+    """
+    Fold a newly written message into the denormalized inbox state: the
+    conversation's last message/activity and every other member's unread count.
+    """
+    conversation_id = message.conversation_id
+    Conversation.objects.filter(pk=conversation_id, last_activity_at__lte=message.timestamp).update(
+        last_message=message,
+        last_activity_at=message.timestamp,
+    )
+    ConversationMember.objects.filter(conversation_id=conversation_id).exclude(
+        user_id=message.sender_id
+    ).update(unread_count=F('unread_count') + 1)
+    ConversationMember.objects.filter(
+        conversation_id=conversation_id, user_id=message.sender_id
+    ).update(last_read_message_id=message.id)
+
+
+def mark_conversation_read(conversation_id, user, up_to_message_id=None):
+    """
+    Mark other participants' messages as read for ``user`` (optionally only up
+    to ``up_to_message_id``), update their membership row and push a read
+    receipt. Returns the number of messages marked.
+    """
+    unread = Message.objects.filter(conversation_id=conversation_id, is_read=False).exclude(sender=user)
+    if up_to_message_id is None:
+        marked_read = unread.update(is_read=True)
+        ConversationMember.objects.filter(conversation_id=conversation_id, user=user).update(
+            unread_count=0,
+            last_read_message_id=Subquery(
+                Conversation.objects.filter(pk=conversation_id).values('last_message_id')[:1]
+            ),
+        )
+    else:
+        marked_read = unread.filter(id__lte=up_to_message_id).update(is_read=True)
+        if marked_read:
+            ConversationMember.objects.filter(conversation_id=conversation_id, user=user).update(
+                unread_count=unread.count(),
+                last_read_message_id=up_to_message_id,
+            )
+    if marked_read:
+        # Senders see their last message's read state in their inbox too
+        bump_inboxes(ConversationMember.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True))
+    notify_messages_read(conversation_id, user.pk, marked_read, up_to_message_id)
+    return marked_read
+
+
+def total_unread(user):
+    """Unread messages across all of a user's conversations, from one indexed SUM"""
+    return ConversationMember.objects.filter(user=user).aggregate(
+        total=Sum('unread_count')
+    )['total'] or 0
+
+
+def encode_cursor(conversation):
+    delta = conversation.last_activity_at - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return f'{micros}_{conversation.pk}'
+
+
+def decode_cursor(cursor):
+    """Return ``(last_activity_at, conversation_id)`` or None for a malformed cursor"""
+    try:
+        micros, conversation_id = (int(part) for part in cursor.split('_'))
+    except (AttributeError, ValueError):
+        return None
+    return EPOCH + timedelta(microseconds=micros), conversation_id
+
+
+def get_inbox_page(user, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of the user's conversations, most recently active first.
+
+    Costs two queries whatever the page size: the memberships joined to their
+    conversation, last message, sender and listing, then the other
+    participants of the page. Each returned conversation carries
+    ``membership`` and ``other_participants``. Returns
+    ``(conversations, next_cursor)``.
+    """
+    memberships = ConversationMember.objects.filter(user=user).select_related(
+        'conversation__last_message__sender',
+        'conversation__listing',
+    ).order_by('-conversation__last_activity_at', '-conversation_id')
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        last_activity_at, conversation_id = position
+        memberships = memberships.filter(
+            Q(conversation__last_activity_at__lt=last_activity_at)
+            | Q(conversation__last_activity_at=last_activity_at, conversation_id__lt=conversation_id)
+        )
+
+    page = list(memberships[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    conversations = []
+    for membership in page:
+        conversation = membership.conversation
+        conversation.membership = membership
+        conversation.other_participants = []
+        conversations.append(conversation)
+
+    by_id = {conversation.pk: conversation for conversation in conversations}
+    if by_id:
+        others = ConversationMember.objects.filter(
+            conversation_id__in=by_id
+        ).exclude(user=user).select_related('user')
+        for other in others:
+            by_id[other.conversation_id].other_participants.append(other.user)
+
+    next_cursor = encode_cursor(conversations[-1]) if has_more else None
+    return conversations, next_cursor
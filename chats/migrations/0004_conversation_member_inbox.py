@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_inbox_state(apps, schema_editor):
+    Conversation = apps.get_model('chats', 'Conversation')
+    ConversationMember = apps.get_model('chats', 'ConversationMember')
+    Message = apps.get_model('chats', 'Message')
+
+    for conversation in Conversation.objects.all().iterator():
+        last_message = Message.objects.filter(conversation=conversation).order_by('-timestamp', '-id').first()
+        conversation.last_message = last_message
+        conversation.last_activity_at = last_message.timestamp if last_message else conversation.start_date
+        conversation.save(update_fields=['last_message', 'last_activity_at'])
+
+        members = []
+        for user_id in conversation.participants.values_list('id', flat=True):
+            unread = Message.objects.filter(conversation=conversation, is_read=False).exclude(sender_id=user_id)
+            members.append(ConversationMember(
+                conversation=conversation,
+                user_id=user_id,
+                unread_count=unread.count(),
+                last_read_message_id=last_message.id if last_message and not unread.exists() else None,
+            ))
+        ConversationMember.objects.bulk_create(members, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_initial'),
+        ('listings', '0023_alter_listing_image_alter_listingimage_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chats.message'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='chats_conve_last_ac_388ba6_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='chats.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversationmember',
+            unique_together={('conversation', 'user')},
+        ),
+        migrations.RunPython(backfill_inbox_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:04
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_conversation_keys(apps, schema_editor):
+    Conversation = apps.get_model('chats', 'Conversation')
+    seen = set()
+    # Oldest thread wins the key; later duplicates stay keyless but keep working
+    for conversation in Conversation.objects.order_by('start_date', 'id').iterator():
+        participants = ','.join(
+            str(user_id) for user_id in sorted(conversation.participants.values_list('id', flat=True))
+        )
+        key = hashlib.sha256(f"{participants}|{conversation.listing_id or ''}".encode()).hexdigest()
+        if key in seen:
+            continue
+        seen.add(key)
+        Conversation.objects.filter(pk=conversation.pk).update(key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0004_conversation_member_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_conversation_keys, migrations.RunPython.noop),
+    ]
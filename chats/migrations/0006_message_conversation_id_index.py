@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0005_conversation_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='chats_messa_convers_6bb6a0_idx'),
+        ),
+    ]
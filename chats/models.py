@@ -1,20 +1,76 @@
-from django.db import models
+import hashlib
+
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
+
+def conversation_key(user_ids, listing_id=None):
+    """Canonical identity of a thread: its sorted participant ids plus the listing"""
+    participants = ','.join(str(user_id) for user_id in sorted(set(user_ids)))
+    return hashlib.sha256(f"{participants}|{listing_id or ''}".encode()).hexdigest()
+
+
+class ConversationManager(models.Manager):
+    def get_or_create_between(self, users, listing=None):
+        """
+        Find the thread between ``users`` about ``listing`` with one indexed
+        lookup, creating it if needed. Safe under concurrent sends: the loser
+        of a creation race hits the unique key and reads the winner's row.
+        Returns ``(conversation, created)``.
+        """
+        key = conversation_key([user.pk for user in users], listing.pk if listing else None)
+        try:
+            return self.get(key=key), False
+        except self.model.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                conversation = self.create(key=key, listing=listing)
+                conversation.participants.add(*users)
+            return conversation, True
+        except IntegrityError:
+            return self.get(key=key), False
+
+
 class Conversation(models.Model):
     participants = models.ManyToManyField(User, related_name='conversations')
     listing = models.ForeignKey('listings.Listing', on_delete=models.CASCADE, related_name='conversations', null=True, blank=True)
     start_date = models.DateTimeField(auto_now_add=True)
+    # conversation_key() of the participants and listing; null only for legacy duplicate threads
+    key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    # Denormalized for the inbox; maintained whenever a message is written
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['-last_activity_at', '-id']),
+        ]
+
+    objects = ConversationManager()
 
     def __str__(self):
         participant_names = ", ".join([user.username for user in self.participants.all()])
         return f"Conversation between {participant_names}"
 
+class ConversationMember(models.Model):
+    """Per-participant inbox state, kept in step with ``Conversation.participants``"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    last_read_message_id = models.PositiveBigIntegerField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('conversation', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} in conversation {self.conversation_id}"
+
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -24,6 +80,10 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Delta sync and history pages slice a conversation by message id
+            models.Index(fields=['conversation', 'id']),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} at {self.timestamp}"
@@ -0,0 +1,41 @@
+from django.db import transaction
+
+from homabay_souq.pubsub import publish
+
+
+def conversation_channel(conversation_id):
+    """Broker channel shared by every socket open on one conversation"""
+    return f'conversation.{conversation_id}'
+
+
+def message_payload(message):
+    return {
+        'id': message.id,
+        'sender': message.sender.username,
+        'sender_id': message.sender_id,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+        'is_read': message.is_read,
+    }
+
+
+def publish_to_conversation(conversation_id, event):
+    """Fan an event out to the conversation's sockets once the transaction commits"""
+    transaction.on_commit(lambda: publish(conversation_channel(conversation_id), event))
+
+
+def notify_messages_read(conversation_id, reader_id, marked_read, message_id=None):
+    """
+    Send a read receipt to the conversation and drop the reader's unread badge.
+    ``message_id`` is the newest message covered, or None for "everything".
+    """
+    from notifications.realtime import push_counter
+
+    if not marked_read:
+        return
+    publish_to_conversation(conversation_id, {
+        'type': 'read',
+        'user_id': reader_id,
+        'message_id': message_id,
+    })
+    push_counter(reader_id, 'messages', delta=-marked_read)
@@ -0,0 +1,55 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from notifications.realtime import push_counter
+from .inbox import add_members, bump_inboxes, record_message
+from .models import Conversation, ConversationMember, Message
+from .realtime import message_payload, publish_to_conversation
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_conversation_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep ConversationMember rows in step with Conversation.participants"""
+    if action == 'post_add':
+        if reverse:
+            for conversation_id in pk_set:
+                add_members(conversation_id, [instance.pk])
+        else:
+            add_members(instance.pk, pk_set)
+        bump_inboxes([instance.pk] if reverse else pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            ConversationMember.objects.filter(user=instance, conversation_id__in=pk_set).delete()
+        else:
+            ConversationMember.objects.filter(conversation=instance, user_id__in=pk_set).delete()
+        bump_inboxes([instance.pk] if reverse else pk_set)
+    elif action == 'pre_clear':
+        if reverse:
+            ConversationMember.objects.filter(user=instance).delete()
+            bump_inboxes([instance.pk])
+        else:
+            members = ConversationMember.objects.filter(conversation=instance)
+            bump_inboxes(list(members.values_list('user_id', flat=True)))
+            members.delete()
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    """
+    Update the denormalized inbox, deliver new messages to open chat sockets
+    and bump the unread messages badge for everyone but the sender.
+    """
+    if not created:
+        return
+    record_message(instance)
+    publish_to_conversation(instance.conversation_id, {
+        'type': 'message',
+        'message': message_payload(instance),
+    })
+    recipient_ids = list(ConversationMember.objects.filter(
+        conversation_id=instance.conversation_id
+    ).exclude(
+        user_id=instance.sender_id
+    ).values_list('user_id', flat=True))
+    bump_inboxes([instance.sender_id, *recipient_ids])
+    for user_id in recipient_ids:
+        push_counter(user_id, 'messages', delta=1)
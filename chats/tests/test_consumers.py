@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+
+from chats.consumers import CLOSE_FORBIDDEN, websocket_application
+from chats.models import Conversation, Message
+from homabay_souq.pubsub import get_broker
+from chats.realtime import conversation_channel
+
+User = get_user_model()
+
+
+class SocketSession:
+    """Drives the raw ASGI websocket app in-process, like a browser would"""
+
+    def __init__(self, path, cookie='', origin='http://localhost'):
+        headers = [(b'origin', origin.encode())]
+        if cookie:
+            headers.append((b'cookie', cookie.encode()))
+        self.scope = {'type': 'websocket', 'path': path, 'headers': headers}
+        self.inbound = asyncio.Queue()
+        self.outbound = asyncio.Queue()
+
+    async def connect(self):
+        self.task = asyncio.create_task(
+            websocket_application(self.scope, self.inbound.get, self.outbound.put)
+        )
+        await self.inbound.put({'type': 'websocket.connect'})
+        return await self.next_event()
+
+    async def next_event(self):
+        return await asyncio.wait_for(self.outbound.get(), 2)
+
+    async def receive_json(self):
+        event = await self.next_event()
+        return json.loads(event['text'])
+
+    async def send_json(self, data):
+        await self.inbound.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def disconnect(self):
+        await self.inbound.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 2)
+
+
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+        self.stranger = User.objects.create_user(username='stranger', email='s@test.com', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+        self.path = f'/chats/ws/conversation/{self.conversation.pk}/'
+
+    async def open_socket(self, user, **kwargs):
+        await sync_to_async(self.client.force_login)(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        session = SocketSession(self.path, cookie=cookie, **kwargs)
+        return session, await session.connect()
+
+    async def test_anonymous_and_non_participants_are_refused(self):
+        session = SocketSession(self.path)
+        self.assertEqual(await session.connect(), {'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+
+        _, event = await self.open_socket(self.stranger)
+        self.assertEqual(event['code'], CLOSE_FORBIDDEN)
+
+    async def test_cross_site_origin_is_refused(self):
+        _, event = await self.open_socket(self.buyer, origin='https://evil.example')
+        self.assertEqual(event['code'], CLOSE_FORBIDDEN)
+
+    async def test_message_is_saved_acked_and_fanned_out(self):
+        socket, event = await self.open_socket(self.buyer)
+        self.assertEqual(event['type'], 'websocket.accept')
+
+        await socket.send_json({'type': 'message', 'content': 'Is this still available?', 'client_id': 'c1'})
+        frames = [await socket.receive_json(), await socket.receive_json()]
+        ack = next(frame for frame in frames if frame['type'] == 'ack')
+        broadcast = next(frame for frame in frames if frame['type'] == 'message')
+
+        self.assertEqual(ack['client_id'], 'c1')
+        self.assertEqual(broadcast['message']['id'], ack['message']['id'])
+        self.assertEqual(broadcast['message']['sender_id'], self.buyer.pk)
+        self.assertTrue(await Message.objects.filter(content='Is this still available?').aexists())
+        await socket.disconnect()
+        self.assertEqual(get_broker().subscriber_count(conversation_channel(self.conversation.pk)), 0)
+
+    @override_settings(CHAT_SOCKET_MESSAGE_BURST=1, CHAT_SOCKET_MESSAGES_PER_SECOND=0.001)
+    async def test_posting_too_fast_is_rate_limited(self):
+        socket, _ = await self.open_socket(self.buyer)
+        await socket.send_json({'type': 'message', 'content': 'one'})
+        await socket.receive_json()
+        await socket.receive_json()
+        await socket.send_json({'type': 'message', 'content': 'two'})
+        self.assertEqual(await socket.receive_json(), {'type': 'error', 'error': 'rate_limited'})
+        await socket.disconnect()
+
+    async def test_typing_and_read_receipts_reach_the_other_side(self):
+        message = await Message.objects.acreate(conversation=self.conversation, sender=self.seller, content='Yes')
+        socket, _ = await self.open_socket(self.buyer)
+        get_broker().publish(conversation_channel(self.conversation.pk), {'type': 'typing', 'user': 'seller', 'user_id': self.seller.pk})
+        self.assertEqual((await socket.receive_json())['type'], 'typing')
+
+        await socket.send_json({'type': 'read', 'message_id': message.pk})
+        receipt = await socket.receive_json()
+        self.assertEqual(receipt, {'type': 'read', 'user_id': self.buyer.pk, 'message_id': message.pk})
+        await message.arefresh_from_db()
+        self.assertTrue(message.is_read)
+        await socket.disconnect()
+
+    @override_settings(CHAT_SOCKET_QUEUE_SIZE=2)
+    async def test_slow_socket_is_told_to_resync(self):
+        socket, _ = await self.open_socket(self.buyer)
+        channel = conversation_channel(self.conversation.pk)
+        # Hold the pump back by flooding the queue before the loop can drain it
+        for i in range(5):
+            get_broker()._fan_out(channel, {'type': 'read', 'user_id': 0, 'message_id': i})
+        frames = [await socket.receive_json() for _ in range(3)]
+        self.assertIn({'type': 'resync'}, frames)
+        await socket.disconnect()
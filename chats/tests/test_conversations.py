@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from chats.models import Conversation, ConversationManager, conversation_key
+from listings.models import Category, Listing
+
+User = get_user_model()
+
+
+class ConversationKeyTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+        category = Category.objects.create(name='Phones')
+        self.listing = Listing.objects.create(
+            title='iPhone 12', description='Clean', price=20000, category=category,
+            location='HB_Town', seller=self.seller,
+        )
+
+    def test_key_ignores_participant_order_but_not_listing(self):
+        self.assertEqual(conversation_key([1, 2], 5), conversation_key([2, 1], 5))
+        self.assertNotEqual(conversation_key([1, 2], 5), conversation_key([1, 2]))
+
+    def test_get_or_create_between_reuses_the_thread(self):
+        first, created = Conversation.objects.get_or_create_between([self.buyer, self.seller], listing=self.listing)
+        self.assertTrue(created)
+        self.assertEqual(set(first.participants.all()), {self.buyer, self.seller})
+
+        with self.assertNumQueries(1):
+            again, created = Conversation.objects.get_or_create_between([self.seller, self.buyer], listing=self.listing)
+        self.assertFalse(created)
+        self.assertEqual(again, first)
+
+    def test_losing_a_creation_race_returns_the_winner(self):
+        winner, _ = Conversation.objects.get_or_create_between([self.buyer, self.seller], listing=self.listing)
+        real_get = ConversationManager.get
+        calls = []
+
+        def racing_get(manager, *args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise Conversation.DoesNotExist
+            return real_get(manager, *args, **kwargs)
+
+        with mock.patch.object(ConversationManager, 'get', racing_get):
+            conversation, created = Conversation.objects.get_or_create_between(
+                [self.buyer, self.seller], listing=self.listing
+            )
+        self.assertFalse(created)
+        self.assertEqual(conversation, winner)
+        self.assertEqual(Conversation.objects.count(), 1)
+
+    def test_start_conversation_view_uses_the_canonical_thread(self):
+        self.client.force_login(self.buyer)
+        url = reverse('start-conversation', args=[self.listing.pk, self.seller.pk])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(Conversation.objects.count(), 1)
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chats.history import get_message_page
+from chats.inbox import mark_conversation_read
+from chats.models import Conversation, ConversationMember, Message
+
+User = get_user_model()
+XHR = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+class MessageHistoryTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.seller, content=f'Message {i}')
+            for i in range(5)
+        ]
+        self.url = reverse('conversation-detail', args=[self.conversation.pk])
+        self.client.force_login(self.buyer)
+
+    def ids(self, messages):
+        return [message.id for message in messages]
+
+    def test_pages_walk_history_in_both_directions(self):
+        latest, has_more = get_message_page(self.conversation.id, limit=2)
+        self.assertEqual(self.ids(latest), self.ids(self.messages[3:]))
+        self.assertTrue(has_more)
+
+        older, has_more = get_message_page(self.conversation.id, before_id=latest[0].id, limit=2)
+        self.assertEqual(self.ids(older), self.ids(self.messages[1:3]))
+        self.assertTrue(has_more)
+
+        newer, has_more = get_message_page(self.conversation.id, after_id=self.messages[1].id, limit=2)
+        self.assertEqual(self.ids(newer), self.ids(self.messages[2:4]))
+        self.assertTrue(has_more)
+
+    def test_senders_come_with_their_messages(self):
+        with self.assertNumQueries(1):
+            page, _ = get_message_page(self.conversation.id)
+            [message.sender.username for message in page]
+
+    def test_delta_sync_returns_only_new_messages(self):
+        response = self.client.get(self.url, {'after_id': self.messages[3].id}, **XHR)
+        data = response.json()
+        self.assertEqual([m['id'] for m in data['messages']], [self.messages[4].id])
+        self.assertFalse(data['has_more'])
+        self.assertNotIn('participants', data)
+
+    def test_unchanged_poll_is_not_modified(self):
+        params = {'after_id': self.messages[4].id}
+        etag = self.client.get(self.url, params, **XHR)['ETag']
+
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag, **XHR)
+        self.assertEqual(response.status_code, 304)
+
+        Message.objects.create(conversation=self.conversation, sender=self.seller, content='New')
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag, **XHR)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['content'] for m in response.json()['messages']], ['New'])
+
+    def test_read_receipts_change_the_senders_etag(self):
+        self.client.force_login(self.seller)
+        params = {'after_id': self.messages[0].id}
+        etag = self.client.get(self.url, params, **XHR)['ETag']
+
+        mark_conversation_read(self.conversation.id, self.buyer)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag, **XHR)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(m['is_read'] for m in response.json()['messages']))
+
+    def test_not_modified_poll_still_marks_conversation_read(self):
+        params = {'after_id': self.messages[4].id}
+        etag = self.client.get(self.url, params, **XHR)['ETag']
+        Message.objects.filter(pk=self.messages[4].pk).update(is_read=False)
+        ConversationMember.objects.filter(conversation=self.conversation, user=self.buyer).update(unread_count=1)
+
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag, **XHR)
+        self.assertEqual(response.status_code, 304)
+        member = ConversationMember.objects.get(conversation=self.conversation, user=self.buyer)
+        self.assertEqual(member.unread_count, 0)
+        self.assertTrue(Message.objects.get(pk=self.messages[4].pk).is_read)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'after_id': 'abc'}, **XHR)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CHAT_HISTORY_PAGE_SIZE=2)
+    def test_page_renders_latest_messages_with_older_link(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.ids(response.context['messages']), self.ids(self.messages[3:]))
+        self.assertContains(response, 'load-older-messages')
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from chats.inbox import get_inbox_page, mark_conversation_read, total_unread
+from chats.models import Conversation, ConversationMember, Message
+
+User = get_user_model()
+
+
+class InboxStateTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+
+    def member(self, user):
+        return ConversationMember.objects.get(conversation=self.conversation, user=user)
+
+    def test_members_follow_participants(self):
+        self.assertEqual(self.conversation.memberships.count(), 2)
+        self.conversation.participants.remove(self.seller)
+        self.assertFalse(ConversationMember.objects.filter(user=self.seller).exists())
+        self.seller.conversations.add(self.conversation)
+        self.assertTrue(ConversationMember.objects.filter(user=self.seller).exists())
+
+    def test_message_write_updates_last_message_and_unread_counts(self):
+        first = Message.objects.create(conversation=self.conversation, sender=self.seller, content='Hello')
+        second = Message.objects.create(conversation=self.conversation, sender=self.seller, content='Still there?')
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, second)
+        self.assertEqual(self.conversation.last_activity_at, second.timestamp)
+        self.assertEqual(self.member(self.buyer).unread_count, 2)
+        self.assertEqual(self.member(self.seller).unread_count, 0)
+        self.assertEqual(self.member(self.seller).last_read_message_id, second.id)
+        self.assertEqual(total_unread(self.buyer), 2)
+
+        mark_conversation_read(self.conversation.id, self.buyer, up_to_message_id=first.id)
+        self.assertEqual(self.member(self.buyer).unread_count, 1)
+
+        mark_conversation_read(self.conversation.id, self.buyer)
+        buyer = self.member(self.buyer)
+        self.assertEqual(buyer.unread_count, 0)
+        self.assertEqual(buyer.last_read_message_id, second.id)
+        self.assertFalse(Message.objects.filter(is_read=False).exists())
+
+    def test_viewing_conversation_clears_unread(self):
+        Message.objects.create(conversation=self.conversation, sender=self.seller, content='Hello')
+        self.client.force_login(self.buyer)
+        self.client.get(reverse('conversation-detail', args=[self.conversation.pk]))
+        self.assertEqual(total_unread(self.buyer), 0)
+
+
+class InboxPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        now = timezone.now()
+        self.conversations = []
+        for i in range(5):
+            other = User.objects.create_user(username=f'seller{i}', email=f's{i}@test.com', password='testpass123')
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user, other)
+            Message.objects.create(conversation=conversation, sender=other, content=f'hi {i}')
+            # Two conversations share a timestamp to exercise the id tie-breaker
+            Conversation.objects.filter(pk=conversation.pk).update(
+                last_activity_at=now - timedelta(minutes=min(i, 3))
+            )
+            self.conversations.append(conversation)
+
+    def test_keyset_pages_cover_every_conversation_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_inbox_page(self.user, cursor=cursor, limit=2)
+            seen.extend(conversation.pk for conversation in page)
+            if not cursor:
+                break
+        self.assertEqual(seen, [c.pk for c in self.conversations[:3]] + sorted(
+            [c.pk for c in self.conversations[3:]], reverse=True
+        ))
+
+    def test_inbox_json_query_count_is_independent_of_conversation_count(self):
+        self.client.force_login(self.user)
+        # session + user + memberships page + other participants
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('inbox'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = response.json()
+        self.assertEqual(len(data['conversations']), 5)
+        self.assertEqual(data['conversations'][0]['unread_count'], 1)
+        self.assertEqual(data['conversations'][0]['participants'][0]['username'], 'seller0')
+        self.assertIsNone(data['next_cursor'])
+
+    def test_inbox_page_renders(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('inbox'))
+        self.assertContains(response, 'seller4')
@@ -4,59 +4,64 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, CreateView
 from django.db.models import Q
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 import json
+from homabay_souq.conditional import Validators, collection_versions, conditional_page
+
 from .models import Conversation, Message
 from .forms import MessageForm
+from .history import get_message_page, get_page_size, sync_etag
+from .inbox import get_inbox_page, mark_conversation_read, total_unread
+from .realtime import message_payload
+
+
+PLACEHOLDER_AVATAR = 'https://placehold.co/50x50/c2c2c2/1f1f1f?text=HS'
+
+
+def inbox_validators(request):
+    name = f'inbox:{request.user.pk}'
+    version = collection_versions(name)[name]
+    return Validators('inbox', request.user.pk, version, modified=[version])
 
 
 @login_required
+@conditional_page(inbox_validators)
 def inbox(request):
-    conversations = Conversation.objects.filter(participants=request.user).order_by('-start_date')
+    # Keyset pagination over the denormalized membership rows: two queries a page
+    conversations, next_cursor = get_inbox_page(request.user, cursor=request.GET.get('cursor'))
     
     # Handle AJAX requests for partial updates
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         conversations_data = []
         for conversation in conversations:
-            last_message = conversation.messages.last()
-            other_participants = conversation.participants.exclude(id=request.user.id)
+            last_message = conversation.last_message
             
             conversations_data.append({
                 'id': conversation.id,
                 'participants': [{
                     'username': user.username,
-                    'profile_picture': user.get_profile_picture_url() if hasattr(user, 'get_profile_picture_url') else (
-                        user.profile.profile_picture.url if getattr(user, 'profile', None) and getattr(user.profile, 'profile_picture', None) else 'https://placehold.co/50x50/c2c2c2/1f1f1f?text=HS'
-                    )
-                } for user in other_participants],
+                    'profile_picture': user.get_profile_picture_url() or PLACEHOLDER_AVATAR
+                } for user in conversation.other_participants],
                 'last_message': {
                     'content': last_message.content if last_message else '',
                     'timestamp': last_message.timestamp.isoformat() if last_message else conversation.start_date.isoformat(),
                     'sender': last_message.sender.username if last_message else '',
                     'is_read': last_message.is_read if last_message else True
                 },
-                'unread_count': conversation.messages.exclude(sender=request.user).filter(is_read=False).count(),
+                'unread_count': conversation.membership.unread_count,
                 'listing_title': conversation.listing.title if conversation.listing else None
             })
         
-        return JsonResponse({'conversations': conversations_data})
+        return JsonResponse({'conversations': conversations_data, 'next_cursor': next_cursor})
     
-    return render(request, 'chats/inbox.html', {'conversations': conversations})
+    return render(request, 'chats/inbox.html', {'conversations': conversations, 'next_cursor': next_cursor})
 
 @login_required
 def conversation_detail(request, pk):
     conversation = get_object_or_404(Conversation, pk=pk, participants=request.user)
     
-    # Mark messages as read when viewing the conversation
-    Message.objects.filter(
-        conversation=conversation
-    ).exclude(
-        sender=request.user
-    ).filter(
-        is_read=False
-    ).update(is_read=True)
-    
     if request.method == 'POST':
         form = MessageForm(request.POST)
         if form.is_valid():
@@ -72,6 +77,8 @@ def conversation_detail(request, pk):
                 return JsonResponse({
                     'success': True,
                     'message': {
+                        'id': message.id,
+                        'sender_id': message.sender_id,
                         'content': message.content,
                         'timestamp': message.timestamp.isoformat(),
                         'sender': message.sender.username
@@ -79,39 +86,64 @@ def conversation_detail(request, pk):
                 })
             return redirect('conversation-detail', pk=pk)
     
-    # GET request handling
-    messages = conversation.messages.all()
-    form = MessageForm()
+    # GET request handling: one page of history (or a delta), senders joined in
+    try:
+        after_id = _int_param(request, 'after_id')
+        before_id = _int_param(request, 'before_id')
+        limit = get_page_size(request.GET.get('limit'))
+    except ValueError:
+        return JsonResponse({'error': 'after_id, before_id and limit must be integers'}, status=400)
+    
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    if is_ajax:
+        etag = sync_etag(conversation, request.user, after_id, before_id, limit)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            # Nothing new to send, but reopening still clears the unread count
+            mark_conversation_read(conversation.id, request.user)
+            return not_modified
+    
+    # Mark messages as read when viewing the conversation
+    mark_conversation_read(conversation.id, request.user)
+    messages, has_more = get_message_page(conversation.id, after_id=after_id, before_id=before_id, limit=limit)
     
     # Handle AJAX requests for message list
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if is_ajax:
         messages_data = []
         for msg in messages:
-            messages_data.append({
-                'id': msg.id,
-                'sender': msg.sender.username,
-                'content': msg.content,
-                'timestamp': msg.timestamp.isoformat(),
-                'is_read': msg.is_read,
-                'is_own_message': msg.sender == request.user
-            })
+            data = message_payload(msg)
+            data['is_own_message'] = msg.sender_id == request.user.id
+            messages_data.append(data)
         
-        return JsonResponse({
+        response_data = {
             'conversation_id': conversation.id,
             'messages': messages_data,
-            'participants': [{
+            'has_more': has_more,
+        }
+        if after_id is None:
+            response_data['participants'] = [{
                 'id': user.id,
                 'username': user.username,
                 'is_current_user': user == request.user
             } for user in conversation.participants.all()]
-        })
+        response = JsonResponse(response_data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
     
     return render(request, 'chats/conversation.html', {
         'conversation': conversation,
         'messages': messages,
-        'form': form
+        'has_older': has_more,
+        'form': MessageForm()
     })
-        
+
+
+def _int_param(request, name):
+    value = request.GET.get(name)
+    return int(value) if value else None
+
+
 @login_required
 def start_conversation(request, listing_id, recipient_id):
     from listings.models import Listing
@@ -121,19 +153,10 @@ def start_conversation(request, listing_id, recipient_id):
     listing = get_object_or_404(Listing, pk=listing_id)
     recipient = get_object_or_404(User, pk=recipient_id)
     
-    # Check if conversation already exists
-    conversation = Conversation.objects.filter(
-        participants=request.user
-    ).filter(
-        participants=recipient
-    ).filter(
-        listing=listing
-    ).first()
-    
-    if not conversation:
-        conversation = Conversation.objects.create(listing=listing)
-        conversation.participants.add(request.user, recipient)
-        conversation.save()
+    # Single indexed lookup on the canonical key; creates the thread if needed
+    conversation, created = Conversation.objects.get_or_create_between(
+        [request.user, recipient], listing=listing
+    )
     
     return redirect('conversation-detail', pk=conversation.pk)
 
@@ -156,22 +179,10 @@ def send_message_api(request):
         listing = get_object_or_404(Listing, id=listing_id) if listing_id else None
         
         # Find or create conversation
-        conversation = Conversation.objects.filter(
-            participants=request.user
-        ).filter(
-            participants=recipient
+        conversation, created = Conversation.objects.get_or_create_between(
+            [request.user, recipient], listing=listing
         )
         
-        if listing:
-            conversation = conversation.filter(listing=listing).first()
-        else:
-            conversation = conversation.first()
-        
-        if not conversation:
-            conversation = Conversation.objects.create(listing=listing)
-            conversation.participants.add(request.user, recipient)
-            conversation.save()
-        
         # Create message
         message = Message.objects.create(
             conversation=conversation,
@@ -194,20 +205,12 @@ def send_message_api(request):
 @login_required
 def unread_messages_count(request):
     """API endpoint to get unread messages count"""
-    unread_count = Message.objects.filter(
-        conversation__participants=request.user
-    ).exclude(
-        sender=request.user
-    ).filter(
-        is_read=False
-    ).count()
-    
-    return JsonResponse({'count': unread_count})
+    return JsonResponse({'count': total_unread(request.user)})
 
 @login_required
 def mark_messages_read(request, conversation_id):
     """Mark all messages in a conversation as read"""
     conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
-    Message.objects.filter(conversation=conversation).exclude(sender=request.user).update(is_read=True)
+    mark_conversation_read(conversation.id, request.user)
     
     return JsonResponse({'success': True})
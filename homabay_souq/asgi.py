@@ -3,6 +3,11 @@ ASGI config for homabaysoqou project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn homabay_souq.asgi:application``
+or gunicorn with a uvicorn worker) to enable the long-lived live update stream
+at ``/notifications/stream/`` and the chat sockets at
+``/chats/ws/conversation/<pk>/``; under WSGI neither is available.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'homabay_souq.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up so models can load
+from chats.consumers import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
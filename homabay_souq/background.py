@@ -0,0 +1,45 @@
+"""
+Work that runs off the request thread once the current transaction commits.
+
+``after_commit`` schedules ``func(*args)`` for when the transaction commits,
+so rolled-back work never runs. The work then runs on a daemon thread with
+its own database connection, so the request does not wait for it. Each
+caller names a setting (``*_IN_BACKGROUND``) that runs the work inline on the
+committing thread instead when off, which is what tests use.
+
+The thread does not survive a worker restart. Work that must not be lost
+leaves a durable record that a management command can pick up (staged
+gallery files, pending notification clears...).
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def after_commit(func, *args, setting=None):
+    """Run ``func(*args)`` once the current transaction commits; see ``run_in_background``"""
+    transaction.on_commit(lambda: run_in_background(func, *args, setting=setting))
+
+
+def run_in_background(func, *args, setting=None):
+    """Run ``func(*args)`` on a daemon thread, or inline if the ``setting`` named is off"""
+    if setting and not getattr(settings, setting, True):
+        func(*args)
+        return
+    thread = threading.Thread(target=_run_in_background, args=(func, *args))
+    thread.daemon = True
+    thread.start()
+
+
+def _run_in_background(func, *args):
+    try:
+        close_old_connections()
+        func(*args)
+    except Exception as e:
+        logger.error(f"Background task {func.__qualname__} failed: {str(e)}")
+    finally:
+        connection.close()
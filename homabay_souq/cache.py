@@ -0,0 +1,319 @@
+"""
+The project's cache layer.
+
+The backend behind it is chosen in settings with CACHE_BACKEND: ``locmem``
+for a single process, ``file`` for several workers on one host, or ``redis``
+for several hosts (a ``redis://`` CACHE_LOCATION; requires the ``redis``
+package). Every cache in the project goes through a ``Namespace`` from
+``namespace(name)``:
+
+* Keys are prefixed with the namespace name, and every value is stored with
+  the namespace's version. ``bump()`` moves the version, retiring every entry
+  in the namespace at once without deleting anything. Reads fetch the
+  version in the same round-trip as the values they look up.
+* ``get_or_set`` collapses concurrent misses: one caller computes the value
+  while the others, in this process or another, wait for it.
+* Hits, misses, writes and the time spent talking to the backend are counted
+  per namespace. Each process folds its counts into the shared cache every
+  CACHE_STATS_FLUSH_SECONDS, and ``cache_stats()`` reports the totals (see
+  ``manage.py cache_stats`` and the staff cache monitor).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = 'cachestats'
+STATS_FIELDS = ('hits', 'misses', 'sets', 'calls', 'microseconds')
+STATS_INDEX_KEY = f'{STATS_PREFIX}:namespaces'
+LOCK_TIMEOUT = 60
+POLL_INTERVAL = 0.05
+MISSING = object()
+
+
+def get_cache(alias=None):
+    return caches[alias or getattr(settings, 'PROJECT_CACHE_ALIAS', 'default')]
+
+
+def is_shared():
+    """
+    Whether every process sees the same cache (CACHE_SHARED; by default any
+    backend but locmem). Features that must agree across workers check this.
+    """
+    shared = getattr(settings, 'CACHE_SHARED', None)
+    if shared is None:
+        return not isinstance(get_cache(), LocMemCache)
+    return shared
+
+
+class CacheStats:
+    """Counters of this process not yet folded into the shared totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+
+    def record(self, name, **counts):
+        with self._lock:
+            pending = self._pending.setdefault(name, dict.fromkeys(STATS_FIELDS, 0))
+            for field, count in counts.items():
+                pending[field] += count
+            due = time.monotonic() - self._flushed_at >= getattr(settings, 'CACHE_STATS_FLUSH_SECONDS', 60)
+        if due:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._pending.items()}
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        cache = get_cache()
+        try:
+            names = cache.get(STATS_INDEX_KEY, set())
+            if not set(pending) <= names:
+                cache.set(STATS_INDEX_KEY, names | set(pending), None)
+            for name, counts in pending.items():
+                for field, count in counts.items():
+                    if count:
+                        _incr(cache, f'{STATS_PREFIX}:{name}:{field}', count)
+        except Exception as e:
+            logger.warning(f"Could not record cache statistics: {str(e)}")
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+            self._flushed_at = time.monotonic()
+
+
+stats = CacheStats()
+
+
+def _incr(cache, key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def cache_stats():
+    """``{namespace: counters}`` across every process, with hit rate and mean latency"""
+    cache = get_cache()
+    pending = stats.pending()
+    names = set(cache.get(STATS_INDEX_KEY, set())) | set(pending)
+    keys = [f'{STATS_PREFIX}:{name}:{field}' for name in names for field in STATS_FIELDS]
+    shared = cache.get_many(keys)
+    report = {}
+    for name in sorted(names):
+        counts = {
+            field: shared.get(f'{STATS_PREFIX}:{name}:{field}', 0) + pending.get(name, {}).get(field, 0)
+            for field in STATS_FIELDS
+        }
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / lookups if lookups else None
+        counts['mean_latency_ms'] = counts['microseconds'] / counts['calls'] / 1000 if counts['calls'] else None
+        report[name] = counts
+    return report
+
+
+def reset_cache_stats():
+    cache = get_cache()
+    names = cache.get(STATS_INDEX_KEY, set())
+    cache.delete_many([f'{STATS_PREFIX}:{name}:{field}' for name in names for field in STATS_FIELDS])
+    cache.delete(STATS_INDEX_KEY)
+    stats.reset()
+
+
+class Namespace:
+    """A versioned slice of the project cache; see the module docstring"""
+
+    def __init__(self, name, timeout=300, alias=None):
+        self.name = name
+        self.timeout = timeout
+        self.alias = alias
+        self.version_key = f'{name}:version'
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return get_cache(self.alias)
+
+    def key(self, key):
+        return f'{self.name}:{key}'
+
+    @contextmanager
+    def _timed(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.record(self.name, calls=1, microseconds=int((time.perf_counter() - started) * 1_000_000))
+
+    def _fetch(self, keys):
+        """``(version, {key: raw entry})`` from one round-trip"""
+        with self._timed():
+            found = self.cache.get_many([self.version_key, *(self.key(key) for key in keys)])
+        version = found.pop(self.version_key, None)
+        if version is None:
+            version = self._start_version()
+        return version, found
+
+    def _start_version(self):
+        # Evicted or never set: restart from the clock so no old entry can match
+        version = time.time_ns()
+        with self._timed():
+            if not self.cache.add(self.version_key, version, None):
+                version = self.cache.get(self.version_key, version)
+        return version
+
+    def version(self):
+        return self._fetch([])[0]
+
+    def lookup(self, keys):
+        """
+        ``(version, {key: value})`` for the current entries among ``keys``.
+        Values computed after a miss should be stored with this version, so
+        that a bump while they were computed retires them.
+        """
+        keys = list(keys)
+        version, found = self._fetch(keys)
+        values = {}
+        for key in keys:
+            entry = found.get(self.key(key))
+            if entry is not None and entry[0] == version:
+                values[key] = entry[1]
+        stats.record(self.name, hits=len(values), misses=len(keys) - len(values))
+        return version, values
+
+    def get_many(self, keys):
+        """``{key: value}`` for the current entries among ``keys``"""
+        return self.lookup(keys)[1]
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, values, timeout=MISSING, version=None):
+        if version is None:
+            version = self.version()
+        timeout = self.timeout if timeout is MISSING else timeout
+        with self._timed():
+            self.cache.set_many({self.key(key): (version, value) for key, value in values.items()}, timeout)
+        stats.record(self.name, sets=len(values))
+
+    def set(self, key, value, timeout=MISSING, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def add(self, key, value, timeout=MISSING):
+        """Store ``value`` unless ``key`` holds a current entry; returns whether it was stored"""
+        version, found = self._fetch([key])
+        entry = found.get(self.key(key))
+        if entry is not None and entry[0] == version:
+            return False
+        timeout = self.timeout if timeout is MISSING else timeout
+        with self._timed():
+            if entry is not None:
+                # A retired entry is in the way of add()
+                self.cache.delete(self.key(key))
+            added = self.cache.add(self.key(key), (version, value), timeout)
+        if added:
+            stats.record(self.name, sets=1)
+        return added
+
+    def delete_many(self, keys):
+        with self._timed():
+            self.cache.delete_many([self.key(key) for key in keys])
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def bump(self):
+        """Retire every entry in the namespace"""
+        with self._timed():
+            try:
+                self.cache.incr(self.version_key)
+            except ValueError:
+                self._start_version()
+
+    def bump_on_commit(self):
+        """``bump()`` once the current transaction commits"""
+        transaction.on_commit(self.bump)
+
+    def _current(self, key):
+        # As lookup(), without counting a second hit or miss for the same read
+        version, found = self._fetch([key])
+        entry = found.get(self.key(key))
+        return version, entry[1] if entry is not None and entry[0] == version else MISSING
+
+    @contextmanager
+    def _flight(self, key):
+        # One lock per key being computed, dropped once nobody waits on it
+        with self._flights_lock:
+            flight = self._flights.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+        try:
+            with flight[0]:
+                yield
+        finally:
+            with self._flights_lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self._flights[key]
+
+    def get_or_set(self, key, compute, timeout=MISSING):
+        """
+        The current value of ``key``, computing and storing it on a miss.
+        Concurrent misses wait for a single ``compute()`` instead of all
+        running it, up to CACHE_SINGLE_FLIGHT_WAIT_SECONDS.
+        """
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        # Threads of this process queue on a lock; other processes on a cache key
+        with self._flight(key):
+            version, value = self._current(key)
+            if value is not MISSING:
+                return value
+            lock_key = self.key(f'{key}:lock')
+            with self._timed():
+                locked = self.cache.add(lock_key, 1, LOCK_TIMEOUT)
+            if locked:
+                try:
+                    value = compute()
+                    self.set(key, value, timeout, version)
+                    return value
+                finally:
+                    self.cache.delete(lock_key)
+            deadline = time.monotonic() + getattr(settings, 'CACHE_SINGLE_FLIGHT_WAIT_SECONDS', 10)
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                value = self._current(key)[1]
+                if value is not MISSING:
+                    return value
+            logger.warning(f"Timed out waiting for {self.key(key)}; computing it here")
+            return compute()
+
+
+_namespaces = {}
+_namespaces_lock = threading.Lock()
+
+
+def namespace(name, timeout=300, alias=None):
+    """The ``Namespace`` called ``name``, created on first use"""
+    with _namespaces_lock:
+        if name not in _namespaces:
+            _namespaces[name] = Namespace(name, timeout, alias)
+        return _namespaces[name]
@@ -0,0 +1,161 @@
+"""
+Conditional GET for public pages and JSON feeds.
+
+``conditional_page`` wraps a view so that a returning visitor's
+``If-None-Match``/``If-Modified-Since`` is answered with a 304 before the view
+builds its context. Each view supplies a function that derives the page's
+validators cheaply: the ``date_updated``/``updated_at`` of the object it shows,
+plus the version of every collection the page draws on.
+
+A collection version (``listings``, ``reviews``, ``stores``, ``blog``,
+``inbox:<user id>``...) is the time of the collection's last change. Writers
+call ``bump_collection`` and the bump lands when their transaction commits.
+A version missing from the cache counts as changed just now, so losing the
+cache can only cost a full response, never a stale 304. Versions expire after
+COLLECTION_VERSION_TIMEOUT for the same reason. They must be seen by every
+process, so with a per-process cache (locmem under several workers; see
+``homabay_souq.cache.is_shared``) pages are always sent in full and nothing
+is bumped.
+
+A page whose Last-Modified is younger than the read replica's lag renders
+from the primary, so its ETag never labels content the replica has not caught
+up with (see ``homabay_souq.db_router``).
+
+HTML pages are only validated for anonymous visitors; JSON (XMLHttpRequest)
+responses for everyone. Signed-in pages carry cart, notification and message
+counts that no validator here tracks, and a page with flash messages waiting
+is always sent in full.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from .cache import is_shared, namespace
+from .db_router import replica_may_lag, use_primary
+
+VERSIONS = namespace('conditional')
+
+
+def _version_timeout():
+    return getattr(settings, 'COLLECTION_VERSION_TIMEOUT', 3600)
+
+
+def bump_collection(*names):
+    """Record that ``names`` changed, once the current transaction commits"""
+    if not is_shared():
+        # Nothing reads versions from a per-process cache (nor the page cache)
+        return
+
+    def bump():
+        now = time.time()
+        VERSIONS.set_many({name: now for name in names}, _version_timeout())
+
+    transaction.on_commit(bump)
+
+
+def collection_versions(*names):
+    """``{name: time of its last change}`` from one cache round-trip"""
+    found = VERSIONS.get_many(names)
+    for name in names:
+        if name not in found:
+            now = time.time()
+            found[name] = now if VERSIONS.add(name, now, _version_timeout()) else VERSIONS.get(name, now)
+    return {name: found[name] for name in names}
+
+
+class Validators:
+    """An ETag computed from ``parts`` and the latest of ``modified`` as Last-Modified"""
+
+    def __init__(self, *parts, modified=()):
+        self.etag = hashlib.md5(repr(parts).encode()).hexdigest()
+        stamps = [
+            value if isinstance(value, datetime) else datetime.fromtimestamp(value, dt_timezone.utc)
+            for value in modified if value
+        ]
+        self.last_modified = max(stamps) if stamps else None
+
+
+def _is_ajax(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def _request_etag(request, etag, csrf_token):
+    # The same URL serves HTML and JSON; a rotated CSRF cookie must not reuse old forms
+    return hashlib.md5('|'.join([
+        etag, request.get_full_path(), str(_is_ajax(request)), csrf_token,
+    ]).encode()).hexdigest()
+
+
+def _validators(request, compute, args, kwargs):
+    if not hasattr(request, '_conditional_validators'):
+        validators = None
+        signed_in_page = request.user.is_authenticated and not _is_ajax(request)
+        if request.method in ('GET', 'HEAD') and not signed_in_page and not len(get_messages(request)):
+            validators = compute(request, *args, **kwargs)
+        if validators is not None:
+            validators.page_etag = validators.etag
+            validators.etag = _request_etag(
+                request, validators.etag, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            )
+        request._conditional_validators = validators
+    return request._conditional_validators
+
+
+def _retag_for_new_csrf_cookie(request, response):
+    # A page that just issued a CSRF cookie is tagged as the browser will ask for it next time
+    issued = request.META.get('CSRF_COOKIE')
+    if issued and issued != request.COOKIES.get(settings.CSRF_COOKIE_NAME):
+        response['ETag'] = quote_etag(_request_etag(request, request._conditional_validators.page_etag, issued))
+
+
+def conditional_page(compute, on_not_modified=None):
+    """
+    Send validators from ``compute(request, *args, **kwargs)`` (a
+    ``Validators``, or None to skip) and answer matching conditional requests
+    with a 304 without calling the view. ``on_not_modified`` runs on a 304
+    for side effects the view would have had, such as counting a view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_shared():
+                return view(request, *args, **kwargs)
+
+            def etag(request, *args, **kwargs):
+                validators = _validators(request, compute, args, kwargs)
+                return validators.etag if validators else None
+
+            def last_modified(request, *args, **kwargs):
+                validators = _validators(request, compute, args, kwargs)
+                return validators.last_modified if validators else None
+
+            def fresh_view(request, *args, **kwargs):
+                validators = getattr(request, '_conditional_validators', None)
+                if validators is not None and replica_may_lag([validators.last_modified]):
+                    use_primary()
+                return view(request, *args, **kwargs)
+
+            response = condition(etag_func=etag, last_modified_func=last_modified)(fresh_view)(request, *args, **kwargs)
+            validators = request._conditional_validators
+            if validators is not None:
+                if response.status_code == 200 and response.has_header('ETag'):
+                    if getattr(response, 'is_rendered', True):
+                        _retag_for_new_csrf_cookie(request, response)
+                    else:
+                        response.add_post_render_callback(lambda r: _retag_for_new_csrf_cookie(request, r))
+                # Stored, but checked with us before every reuse
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ['Cookie', 'X-Requested-With'])
+                if response.status_code == 304 and on_not_modified:
+                    on_not_modified(request, *args, **kwargs)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,161 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_URL is set, ``DATABASES['replica']`` is a read replica
+of the primary. ``ReplicaRoutingMiddleware`` sends the ORM reads of GET and
+HEAD requests for the views named in READ_REPLICA_VIEWS (browse, store, blog
+and analytics pages) to it. Management commands and other code opt in with
+``with replica_reads():``. Everything else, every write, and every read
+inside a transaction or after a write in the same request goes to the
+primary.
+
+For read-your-writes across requests, a request that changes data (POST and
+friends) sets a short-lived cookie. For READ_REPLICA_PIN_SECONDS afterwards
+that visitor's requests read from the primary too, so the replica's lag never
+hides what they just did. Sessions are always read from the primary.
+
+Pages that are cached or answered with a 304 are keyed by collection
+versions, which move as soon as a write commits on the primary. A page that
+rendered from a lagging replica would be stored, and validated, under the new
+versions with the old content. The page cache and ``conditional_page``
+therefore switch a request to the primary (``use_primary``) when one of the
+page's versions is younger than READ_REPLICA_MAX_LAG_SECONDS
+(``replica_may_lag``). Once a collection has been quiet for longer than that,
+its pages come from the replica again.
+
+Locally, two SQLite files can act as primary and replica
+(``DATABASE_REPLICA_URL=sqlite:////path/to/replica.sqlite3``, migrated with
+``migrate --database=replica``).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import Resolver404, resolve
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE = 'db_pin'
+# Read from the primary whatever the view: reading a session a moment after it
+# was written must not find the replica's older copy
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Send reads in this block to the replica, until something writes"""
+    state = RoutingState(enabled and replica_configured())
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+def replica_may_lag(stamps):
+    """
+    Whether this request reads from the replica and one of ``stamps`` (times
+    of a change, as epoch seconds or datetimes) is recent enough that the
+    replica may not have the change yet
+    """
+    state = _routing.get()
+    if state is None or not state.replica or state.wrote:
+        return False
+    horizon = time.time() - getattr(settings, 'READ_REPLICA_MAX_LAG_SECONDS', 10)
+    return any(
+        (stamp.timestamp() if isinstance(stamp, datetime) else stamp) > horizon
+        for stamp in stamps if stamp
+    )
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary"""
+    state = _routing.get()
+    if state is not None:
+        state.replica = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is None
+            or not state.replica
+            or state.wrote
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A real replica gets its schema from replication; a local SQLite one
+        # is migrated like the primary
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _reads_from_replica(self, request):
+        if request.method not in ('GET', 'HEAD') or PIN_COOKIE in request.COOKIES:
+            return False
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            return False
+        return view_name in getattr(settings, 'READ_REPLICA_VIEWS', ())
+
+    def _pin(self, request, response, state):
+        if state.wrote and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'READ_REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self._reads_from_replica(request)) as state:
+            response = self.get_response(request)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        with replica_reads(self._reads_from_replica(request)) as state:
+            response = await self.get_response(request)
+        return self._pin(request, response, state)
@@ -0,0 +1,185 @@
+"""
+Full-page cache for anonymous browsing.
+
+``cache_anonymous_page`` stores the response of an anonymous GET under its
+path and its normalized query string. Empty parameters and tracking
+parameters (``utm_*``, ``fbclid``...) are dropped and the rest sorted, so
+``?q=&sort_by=newest&category=2`` and ``?category=2&sort_by=newest`` share an
+entry. Signed-in visitors, requests with flash messages waiting and responses
+that wrote to the session are never cached.
+
+Each entry is tagged with what it shows. The decorator gives the page's own
+tags (``listings``, ``stores``, ``blog``, ``store:<id>``...) and the view adds
+the objects it rendered with ``tag_page`` (``listing:<id>``,
+``category:<id>``). Tags are the collections of ``homabay_souq.conditional``:
+the entry keeps their versions and counts as a miss once any of them moves,
+so a save that bumps ``store:7`` purges that store's page and no other. The
+decorator's tags are versioned before the view runs, so a write committed
+while the page renders retires the entry straight away. A page whose
+versions are younger than the read replica's lag renders from the primary;
+tags added by the view that are that young keep a replica render out of the
+cache (see ``homabay_souq.db_router``). Counts such as the
+home page's totals of users and orders are not tagged and may lag by up to
+PAGE_CACHE_TIMEOUT.
+
+Entries and the versions they are checked against must be seen by every
+process, so the cache is only used with a shared backend (see
+``homabay_souq.cache.is_shared``); with per-process locmem a purge in one
+worker would leave the others serving, and a CDN keeping, stale pages.
+
+Pages keep their CSRF token out of the cache. The token is swapped for a
+placeholder when stored and for the visitor's own token when served. The tags
+are also sent as ``Surrogate-Key`` so a CDN can purge by tag in the same way;
+pages without a form additionally get ``Surrogate-Control`` for the CDN's TTL.
+"""
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+
+from .cache import is_shared, namespace
+from .conditional import collection_versions
+from .db_router import replica_may_lag, use_primary
+
+PAGES = namespace('page')
+CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+TRACKING_PARAMETERS = ('fbclid', 'gclid', 'mc_cid', 'mc_eid')
+KEPT_HEADERS = ('Content-Type', 'Content-Language')
+
+
+def normalized_query(query_dict):
+    """The query string with blank and tracking parameters dropped and the rest sorted"""
+    pairs = sorted(
+        (name, value)
+        for name, values in query_dict.lists()
+        if not name.startswith('utm_') and name not in TRACKING_PARAMETERS
+        for value in values if value != ''
+    )
+    return urlencode(pairs)
+
+
+def page_key(request):
+    variant = '|'.join([request.path, normalized_query(request.GET), str(_is_ajax(request))])
+    return hashlib.md5(variant.encode()).hexdigest()
+
+
+def tag_page(request, *tags):
+    """Add ``tags`` to the tags of the page being rendered for ``request``"""
+    page_tags = getattr(request, '_page_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(tags)
+
+
+def _is_ajax(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def _cacheable_request(request):
+    return (
+        getattr(settings, 'PAGE_CACHE_ENABLED', True)
+        and is_shared()
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def _surrogate_headers(response, tags, shareable):
+    response['Surrogate-Key'] = ' '.join(sorted(tag.replace(':', '-') for tag in tags))
+    if shareable:
+        response['Surrogate-Control'] = f"max-age={getattr(settings, 'PAGE_CACHE_SURROGATE_MAX_AGE', 300)}"
+        patch_cache_control(response, public=True)
+
+
+def _serve(request, entry):
+    content = entry['content']
+    if entry['csrf']:
+        # get_token also has the CSRF middleware send this visitor their cookie
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content, status=entry['status'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response['X-Page-Cache'] = 'hit'
+    _surrogate_headers(response, entry['versions'], not entry['csrf'])
+    return response
+
+
+def _store(request, response, key, version, versions):
+    content = response.content.decode(response.charset)
+    match = CSRF_INPUT.search(content)
+    if match:
+        content = content.replace(match.group(1), CSRF_PLACEHOLDER)
+    entry = {
+        'status': response.status_code,
+        'content': content,
+        'headers': {header: response[header] for header in KEPT_HEADERS if response.has_header(header)},
+        'csrf': bool(match),
+        'versions': versions,
+    }
+    PAGES.set(key, entry, getattr(settings, 'PAGE_CACHE_TIMEOUT', 300), version=version)
+    response['X-Page-Cache'] = 'miss'
+    _surrogate_headers(response, versions, not match)
+
+
+def _page_tags(tags, request, args, kwargs):
+    page_tags = []
+    for tag in tags:
+        if callable(tag):
+            found = tag(request, *args, **kwargs)
+            if found is None:
+                return None
+            page_tags.extend(found)
+        else:
+            page_tags.append(tag)
+    return page_tags
+
+
+def cache_anonymous_page(*tags):
+    """
+    Serve anonymous GETs of the decorated view from the page cache, tagged
+    with ``tags`` and whatever the view adds with ``tag_page``. A tag may be
+    a function of the view's arguments returning a list of tags, or None when
+    the page should not be cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request)
+            version, found = PAGES.lookup([key])
+            entry = found.get(key)
+            if entry is not None and collection_versions(*entry['versions']) == entry['versions']:
+                return _serve(request, entry)
+
+            page_tags = _page_tags(tags, request, args, kwargs)
+            if page_tags is None:
+                return view(request, *args, **kwargs)
+            versions = collection_versions(*page_tags)
+            if replica_may_lag(versions.values()):
+                use_primary()
+            request._page_cache_tags = set(page_tags)
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            session = getattr(request, 'session', None)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not (session is not None and session.modified)
+            ):
+                added = collection_versions(*(request._page_cache_tags - set(versions)))
+                if not replica_may_lag(added.values()):
+                    _store(request, response, key, version, {**versions, **added})
+            return response
+        return wrapper
+    return decorator
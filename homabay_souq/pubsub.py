@@ -0,0 +1,208 @@
+"""
+Lightweight publish/subscribe used to push live updates to ASGI consumers.
+
+Writers (views, signal handlers, management commands) call ``publish`` from
+ordinary synchronous code; async consumers (the SSE stream, chat sockets)
+``subscribe`` to one or more channels and await messages.
+
+The backend is chosen with ``settings.REALTIME_BROKER``:
+
+* ``homabay_souq.pubsub.LocalBroker`` (default) fans messages out inside the
+  current process. Good for tests, ``runserver`` and single-worker deploys.
+* ``homabay_souq.pubsub.RedisBroker`` relays messages through Redis pub/sub so
+  every worker process sees them. Requires the ``redis`` package and
+  ``REALTIME_BROKER['LOCATION']`` (a ``redis://`` URL).
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'homabay_souq.pubsub.LocalBroker'
+DEFAULT_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """
+    A consumer's view of one or more channels.
+
+    Messages are buffered in a bounded queue owned by the subscriber's event
+    loop. When a slow consumer falls behind, the oldest message is dropped and
+    ``overflowed`` is set so the consumer can resynchronise from the database.
+    """
+
+    def __init__(self, broker, channels, maxsize=DEFAULT_QUEUE_SIZE):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self.closed = False
+
+    def _deliver(self, message):
+        if self.closed:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.overflowed = True
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Wait for the next message; returns None if ``timeout`` elapses"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalBroker:
+    """In-process broker; also the local stand-in for cross-process backends"""
+
+    def __init__(self, location='', queue_size=DEFAULT_QUEUE_SIZE, **options):
+        self.location = location
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        """Send ``message`` (a JSON-serialisable dict) to every subscriber of ``channel``"""
+        return self._fan_out(channel, message)
+
+    def _fan_out(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, message)
+                delivered += 1
+            except RuntimeError:
+                # The subscriber's event loop has gone away; forget it
+                self._unsubscribe(subscription)
+        return delivered
+
+    def subscribe(self, *channels, maxsize=None):
+        """Subscribe to ``channels``; must be called from a running event loop"""
+        subscription = Subscription(self, channels, maxsize or self.queue_size)
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+class RedisBroker(LocalBroker):
+    """
+    Cross-process broker built on Redis pub/sub.
+
+    Publishes go to Redis; a single listener thread per process receives every
+    message under ``prefix`` and hands it to the in-process fan-out.
+    """
+
+    def __init__(self, location='', prefix='homabay_souq', **options):
+        super().__init__(location, **options)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the 'redis' package")
+        if not location:
+            raise ImproperlyConfigured("RedisBroker requires REALTIME_BROKER['LOCATION']")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(location)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, channel, message):
+        self._client.publish(f'{self.prefix}:{channel}', json.dumps(message))
+
+    def subscribe(self, *channels, maxsize=None):
+        self._ensure_listener()
+        return super().subscribe(*channels, maxsize=maxsize)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='redis-broker-listener')
+                self._listener.daemon = True
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.prefix}:*')
+        offset = len(self.prefix) + 1
+        for raw in pubsub.listen():
+            try:
+                channel = raw['channel']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                self._fan_out(channel[offset:], json.loads(raw['data']))
+            except Exception as e:
+                logger.error(f"Dropped malformed realtime message: {str(e)}")
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by ``settings.REALTIME_BROKER``"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = getattr(settings, 'REALTIME_BROKER', {})
+                backend = import_string(config.get('BACKEND', DEFAULT_BROKER))
+                _broker = backend(config.get('LOCATION', ''), **config.get('OPTIONS', {}))
+    return _broker
+
+
+def reset_broker():
+    """Drop the cached broker (used by tests that override REALTIME_BROKER)"""
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def publish(channel, message):
+    """Publish through the configured broker, never letting a push failure break a write"""
+    try:
+        return get_broker().publish(channel, message)
+    except Exception as e:
+        logger.error(f"Realtime publish to {channel} failed: {str(e)}")
+        return 0
@@ -113,6 +113,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'homabay_souq.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'homabay_souq.urls'
@@ -162,6 +163,68 @@ else:
         }
     }
 
+# Read replica (homabay_souq.db_router): GETs of the views below read from it, and
+# a visitor who just changed something reads from the primary for the pin window.
+# Locally a second SQLite file can stand in: sqlite:////path/to/replica.sqlite3
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL', '')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL, conn_max_age=DATABASES['default'].get('CONN_MAX_AGE', 0),
+    )
+DATABASE_ROUTERS = ['homabay_souq.db_router.ReplicaRouter']
+READ_REPLICA_VIEWS = [
+    'home', 'all-listings', 'listing-detail',
+    'storefront:store_list', 'storefront:store_detail', 'storefront:product_detail',
+    'storefront:seller_analytics', 'storefront:store_analytics',
+    'blog:post-list', 'blog:post-detail',
+]
+READ_REPLICA_PIN_SECONDS = int(os.environ.get('READ_REPLICA_PIN_SECONDS', '10'))
+# Worst expected replica lag: cached and 304-validated pages of collections changed more recently render from the primary
+READ_REPLICA_MAX_LAG_SECONDS = int(os.environ.get('READ_REPLICA_MAX_LAG_SECONDS', '10'))
+
+# Postgres connection pooling: "native" uses Django's pool (needs psycopg 3 with
+# psycopg[pool]); "pgbouncer" suits a transaction-pooling PgBouncer in front
+DATABASE_POOL = os.environ.get('DATABASE_POOL', '')
+for database in DATABASES.values():
+    if 'postgresql' not in database['ENGINE']:
+        continue
+    database['CONN_HEALTH_CHECKS'] = True
+    if DATABASE_POOL == 'native':
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', '10')),
+        }
+    elif DATABASE_POOL == 'pgbouncer':
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Cache backend (homabay_souq.cache): locmem is per process; use file for several
+# gunicorn workers on one host, or redis (needs the redis package) with a redis:// CACHE_LOCATION
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'homabay-souq'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='homabay'),
+        'OPTIONS': {} if CACHE_BACKEND == 'redis' else {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+# Whether every process sees the same cache. Conditional GETs and the page cache
+# compare versions kept in it, so they stay off with per-process locmem (set this
+# to True when the site runs as a single process)
+CACHE_SHARED = config('CACHE_SHARED', default=CACHE_BACKEND != 'locmem', cast=bool)
+# Per-namespace hit/miss/latency counts are folded into the shared cache this often
+CACHE_STATS_FLUSH_SECONDS = int(os.environ.get('CACHE_STATS_FLUSH_SECONDS', '60'))
+# How long concurrent misses wait for the one caller computing the value
+CACHE_SINGLE_FLIGHT_WAIT_SECONDS = int(os.environ.get('CACHE_SINGLE_FLIGHT_WAIT_SECONDS', '10'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -370,6 +433,91 @@ STORE_FREE_LISTING_LIMIT = int(os.environ.get('STORE_FREE_LISTING_LIMIT', '5'))
 # Maximum image upload size in megabytes
 MAX_IMAGE_UPLOAD_SIZE_MB = int(os.environ.get('MAX_IMAGE_UPLOAD_SIZE_MB', '10'))
 MAX_IMAGE_UPLOAD_SIZE = MAX_IMAGE_UPLOAD_SIZE_MB * 1024 * 1024
+# JPEG/WebP quality of the resized copies made on upload (listings.renditions)
+IMAGE_RENDITION_QUALITY = int(os.environ.get('IMAGE_RENDITION_QUALITY', '80'))
+# Make renditions on a background thread after the upload commits
+IMAGE_RENDITIONS_IN_BACKGROUND = config('IMAGE_RENDITIONS_IN_BACKGROUND', default=True, cast=bool)
+# Listing gallery photos are staged on local disk and uploaded by this many
+# threads after the form is saved (listings.gallery); blank staging root = system temp dir
+GALLERY_UPLOAD_WORKERS = int(os.environ.get('GALLERY_UPLOAD_WORKERS', '4'))
+GALLERY_STAGING_ROOT = os.environ.get('GALLERY_STAGING_ROOT', '')
+GALLERY_BACKGROUND_UPLOADS = config('GALLERY_BACKGROUND_UPLOADS', default=True, cast=bool)
+# Let browsers upload gallery photos straight to Cloudinary with signed requests
+GALLERY_DIRECT_UPLOADS = config('GALLERY_DIRECT_UPLOADS', default=False, cast=bool)
+# Cached listing card / store tile markup (listings.fragments); aggregates shown
+# on tiles, such as product counts, may lag by up to this many seconds
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', '600'))
+# Collection versions behind conditional GETs (homabay_souq.conditional) expire
+# after this long, so a process that missed a bump cannot answer 304s for ever
+COLLECTION_VERSION_TIMEOUT = int(os.environ.get('COLLECTION_VERSION_TIMEOUT', '3600'))
+# Full-page cache of anonymous browse pages (homabay_souq.page_cache); saves purge
+# pages by tag, untagged counts lag by up to the timeout. Only used when CACHE_SHARED
+PAGE_CACHE_ENABLED = config('PAGE_CACHE_ENABLED', default=True, cast=bool)
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '300'))
+# How long a CDN may keep pages without forms (Surrogate-Control)
+PAGE_CACHE_SURROGATE_MAX_AGE = int(os.environ.get('PAGE_CACHE_SURROGATE_MAX_AGE', '300'))
+
+# Live updates (SSE stream at /notifications/stream/, served under ASGI)
+# LocalBroker fans out within one process; use homabay_souq.pubsub.RedisBroker
+# with a redis:// LOCATION when running several workers.
+REALTIME_BROKER = {
+    'BACKEND': config('REALTIME_BROKER_BACKEND', default='homabay_souq.pubsub.LocalBroker'),
+    'LOCATION': config('REALTIME_BROKER_URL', default=''),
+}
+REALTIME_HEARTBEAT_SECONDS = int(os.environ.get('REALTIME_HEARTBEAT_SECONDS', '20'))
+REALTIME_POLL_TIMEOUT_SECONDS = int(os.environ.get('REALTIME_POLL_TIMEOUT_SECONDS', '25'))
+# Chat sockets: events buffered per socket before it is told to resync,
+# and a token bucket on how fast one socket may post messages
+CHAT_SOCKET_QUEUE_SIZE = int(os.environ.get('CHAT_SOCKET_QUEUE_SIZE', '50'))
+CHAT_SOCKET_MESSAGE_BURST = int(os.environ.get('CHAT_SOCKET_MESSAGE_BURST', '5'))
+CHAT_SOCKET_MESSAGES_PER_SECOND = float(os.environ.get('CHAT_SOCKET_MESSAGES_PER_SECOND', '1'))
+CHAT_MESSAGE_MAX_LENGTH = int(os.environ.get('CHAT_MESSAGE_MAX_LENGTH', '5000'))
+# Messages returned per conversation history page (and per delta-sync poll)
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE', '50'))
+
+# Analytics / payment monitor result cache (storefront.analytics_cache):
+# how long a stale result may still be served while it is recomputed
+ANALYTICS_CACHE_MAX_STALE_SECONDS = int(os.environ.get('ANALYTICS_CACHE_MAX_STALE_SECONDS', '86400'))
+ANALYTICS_CACHE_BACKGROUND_REFRESH = config('ANALYTICS_CACHE_BACKGROUND_REFRESH', default=True, cast=bool)
+
+# Payment monitoring: per-minute outcome buckets are kept this long (hourly ones
+# are kept indefinitely); MRR falls back to this price for unbilled subscriptions
+PAYMENT_MINUTE_BUCKET_RETENTION_HOURS = int(os.environ.get('PAYMENT_MINUTE_BUCKET_RETENTION_HOURS', '24'))
+SUBSCRIPTION_MONTHLY_PRICE = int(os.environ.get('SUBSCRIPTION_MONTHLY_PRICE', '999'))
+
+# Subscription renewals (`manage.py process_subscriptions`): STK pushes are sent
+# by this many threads, no faster than this rate, for due subscriptions read in
+# chunks; a reservation unconfirmed after the timeout is treated as a crashed run
+RENEWAL_DISPATCH_WORKERS = int(os.environ.get('RENEWAL_DISPATCH_WORKERS', '8'))
+RENEWAL_REQUESTS_PER_SECOND = float(os.environ.get('RENEWAL_REQUESTS_PER_SECOND', '5'))
+RENEWAL_CHUNK_SIZE = int(os.environ.get('RENEWAL_CHUNK_SIZE', '200'))
+RENEWAL_RESERVATION_TIMEOUT_MINUTES = int(os.environ.get('RENEWAL_RESERVATION_TIMEOUT_MINUTES', '30'))
+
+# Subscriptions moved per UPDATE (and per audit record) by the nightly lifecycle job
+SUBSCRIPTION_TRANSITION_BATCH_SIZE = int(os.environ.get('SUBSCRIPTION_TRANSITION_BATCH_SIZE', '1000'))
+
+# Media migration to Cloudinary (`manage.py migrate_media`): files are uploaded
+# by this many threads, for rows read and checkpointed in chunks of this size
+MEDIA_MIGRATION_WORKERS = int(os.environ.get('MEDIA_MIGRATION_WORKERS', '8'))
+MEDIA_MIGRATION_CHUNK_SIZE = int(os.environ.get('MEDIA_MIGRATION_CHUNK_SIZE', '100'))
+
+# Admin alerts (evaluated by `manage.py evaluate_alerts`): an active alert is
+# re-sent at most once per cooldown; rate rules need this many attempts first
+ALERT_COOLDOWN_MINUTES = int(os.environ.get('ALERT_COOLDOWN_MINUTES', '60'))
+ALERT_MIN_PAYMENT_ATTEMPTS = int(os.environ.get('ALERT_MIN_PAYMENT_ATTEMPTS', '5'))
+ALERT_EMAIL_BATCH_SIZE = int(os.environ.get('ALERT_EMAIL_BATCH_SIZE', '50'))
+
+# Notification retention (applied by `manage.py prune_notifications`)
+# Read notifications older than this are folded into per-type summary rows
+NOTIFICATION_COMPACT_AFTER_DAYS = int(os.environ.get('NOTIFICATION_COMPACT_AFTER_DAYS', '30'))
+# Anything older than this is deleted outright
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '180'))
+# Hard cap on non-summary notifications kept per user
+NOTIFICATION_MAX_PER_USER = int(os.environ.get('NOTIFICATION_MAX_PER_USER', '500'))
+# Rows removed per DELETE statement
+NOTIFICATION_DELETE_BATCH_SIZE = int(os.environ.get('NOTIFICATION_DELETE_BATCH_SIZE', '500'))
+# Finish a large "clear all" on a background thread (prune_notifications resumes it if interrupted)
+NOTIFICATION_CLEAR_IN_BACKGROUND = config('NOTIFICATION_CLEAR_IN_BACKGROUND', default=True, cast=bool)
 
 
 
@@ -384,4 +532,10 @@ MPESA_ENVIRONMENT = os.environ.get('MPESA_ENVIRONMENT', 'sandbox')  # or 'produc
 
 # How many remaining sellers (with unshipped items) should trigger reminder notifications
 SELLER_SHIPMENT_REMINDER_THRESHOLD = int(os.environ.get('SELLER_SHIPMENT_REMINDER_THRESHOLD', '2'))
+# Send order notifications, SMS and delivery requests from a background thread after commit
+ORDER_SIDE_EFFECTS_IN_BACKGROUND = config('ORDER_SIDE_EFFECTS_IN_BACKGROUND', default=True, cast=bool)
+# Days after an order is fully shipped before its escrow is released without the buyer confirming
+ESCROW_AUTO_RELEASE_DAYS = int(os.environ.get('ESCROW_AUTO_RELEASE_DAYS', '7'))
+# Escrows released per batch (one UPDATE each) by manage.py release_escrow
+ESCROW_RELEASE_BATCH_SIZE = int(os.environ.get('ESCROW_RELEASE_BATCH_SIZE', '500'))
 
@@ -0,0 +1,71 @@
+"""
+Unique slug allocation shared by listings, stores and blog posts.
+
+``allocate_slug`` slugifies a title and, when that slug is taken, finds the
+next free ``-<n>`` suffix with a single aggregate query, instead of probing ``title-1``, ``title-2`` and
+so on one query at a time. Two concurrent saves can still pick the same slug,
+so models save through ``save_with_unique_slug``. It saves inside a savepoint
+and, if the slug was taken in the meantime, allocates a new one and tries
+again.
+"""
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, IntegerField, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+# Room kept at the end of the field for a "-<n>" suffix
+SUFFIX_LENGTH = 8
+SAVE_ATTEMPTS = 5
+
+
+def slug_base(model, value, field='slug'):
+    max_length = model._meta.get_field(field).max_length
+    base = slugify(value)[:max_length - SUFFIX_LENGTH].strip('-')
+    return base or model._meta.model_name
+
+
+def allocate_slug(model, value, field='slug', exclude_pk=None):
+    """
+    Return ``value`` slugified if that is free, otherwise with the lowest
+    suffix above any already in use
+    """
+    base = slug_base(model, value, field)
+    taken = model._default_manager.filter(**{f'{field}__regex': rf'^{re.escape(base)}(-[0-9]+)?$'})
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+
+    # "iphone-12" may be the slug of an "iPhone 12" rather than a suffixed
+    # "iphone", so suffixes only matter once the bare slug is taken
+    bare = Q(**{field: base})
+    found = taken.aggregate(
+        base_taken=Count('pk', filter=bare),
+        highest=Max(Cast(Substr(field, len(base) + 2), IntegerField()), filter=~bare),
+    )
+    if not found['base_taken']:
+        return base
+    return f'{base}-{(found["highest"] or 0) + 1}'
+
+
+def _slug_taken(instance, field):
+    return type(instance)._default_manager.filter(
+        **{field: getattr(instance, field)}
+    ).exclude(pk=instance.pk).exists()
+
+
+def save_with_unique_slug(instance, value, save, *args, field='slug', **kwargs):
+    """
+    Give ``instance`` a free slug derived from ``value`` and call ``save``
+    (normally the parent class's ``save``) with the remaining arguments.
+    Retries with a fresh slug when a concurrent save took it first.
+    """
+    for attempt in range(SAVE_ATTEMPTS):
+        setattr(instance, field, allocate_slug(type(instance), value, field, exclude_pk=instance.pk))
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except (IntegrityError, ValidationError):
+            if attempt == SAVE_ATTEMPTS - 1 or not _slug_taken(instance, field):
+                raise
@@ -25,14 +25,15 @@ class DisputeManager:
             raise ValidationError("Invalid dispute reason")
 
         with transaction.atomic():
+            # Only funds still held can be disputed; the escrow may have been
+            # released by the buyer or the auto-release sweeper meanwhile
+            if not Escrow.objects.filter(order_id=order.pk, status='held').update(status='disputed'):
+                raise ValidationError("Funds for this order have already been released")
+
             # Update order status
             order.status = 'disputed'
             order.save()
 
-            # Update escrow status
-            order.escrow.status = 'disputed'
-            order.escrow.save()
-
             # Create activity log
             Activity.objects.create(
                 user=order.user,
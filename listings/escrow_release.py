@@ -0,0 +1,135 @@
+"""
+Automatic escrow release, run by ``manage.py release_escrow``.
+
+An escrow becomes due once its order is fully shipped and
+ESCROW_AUTO_RELEASE_DAYS pass without the buyer confirming delivery or
+opening a dispute (see ``listings.fulfilment``). The sweeper releases held
+escrows whose ``auto_release_date`` has passed in batches of at most
+ESCROW_RELEASE_BATCH_SIZE, oldest first, off the (status, auto_release_date)
+index. Each batch costs a fixed handful of statements:
+
+* one locking read of the batch; on PostgreSQL it skips rows another sweeper
+  holds, so overlapping runs split the work;
+* one UPDATE releasing the escrows, re-filtered on ``status='held'``;
+* one UPDATE moving their shipped orders to ``delivered``, and one copying
+  that onto the seller-order index;
+* one grouped query for every seller's share;
+* one ``bulk_create`` each for the payout ledger, the activity log and the
+  sellers' notifications.
+
+Each run is recorded as an ``EscrowReleaseRun``, checkpointed after every
+batch, with the escrows released, the time taken and how long they had been
+due.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.utils import create_notifications
+
+from .fulfilment import order_payouts
+from .models import Activity, Escrow, EscrowPayout, EscrowReleaseRun, Order
+from .order_index import sync_orders_status
+
+logger = logging.getLogger(__name__)
+
+
+def due_escrows(now):
+    return Escrow.objects.filter(status='held', auto_release_date__lte=now)
+
+
+def _release_batch(now, batch_size, run):
+    """Release up to ``batch_size`` due escrows; returns how many were read"""
+    with transaction.atomic():
+        rows = list(
+            due_escrows(now).select_for_update(skip_locked=True, of=('self',))
+            .order_by('auto_release_date', 'pk')
+            .values_list('pk', 'order_id', 'order__user_id', 'auto_release_date')[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        released_at = timezone.now()
+        ids = [row[0] for row in rows]
+        released = Escrow.objects.filter(pk__in=ids, status='held').update(status='released', released_at=released_at)
+        if released != len(rows):
+            # Without row locks (SQLite) an escrow can change between the read and the UPDATE
+            kept = set(Escrow.objects.filter(
+                pk__in=ids, status='released', released_at=released_at
+            ).values_list('pk', flat=True))
+            rows = [row for row in rows if row[0] in kept]
+        escrow_by_order = {order_id: escrow_id for escrow_id, order_id, _, _ in rows}
+        order_ids = list(escrow_by_order)
+        # The release stands in for the buyer's confirmation, so the orders
+        # stop offering it (and disputes) just as a confirmed delivery would
+        Order.objects.filter(pk__in=order_ids, status='shipped').update(
+            status='delivered', delivered_at=released_at, updated_at=released_at
+        )
+        sync_orders_status(order_ids)
+        payouts = order_payouts(order_ids)
+
+        EscrowPayout.objects.bulk_create([
+            EscrowPayout(escrow_id=escrow_by_order[order_id], seller_id=seller_id, amount=amount, reason='auto_release')
+            for (order_id, seller_id), amount in payouts.items()
+        ])
+        Activity.objects.bulk_create([
+            *(
+                Activity(user_id=buyer_id, action=f"Escrow released for Order #{order_id}")
+                for _, order_id, buyer_id, _ in rows
+            ),
+            *(
+                Activity(user_id=seller_id, action=f"Escrow auto-released for Order #{order_id}: KSh {amount}")
+                for (order_id, seller_id), amount in payouts.items()
+            ),
+        ])
+        create_notifications(
+            Notification(
+                recipient_id=seller_id,
+                notification_type='payment_received',
+                title='Funds released',
+                message=f'KSh {amount} for Order #{order_id} has been released to you.',
+                related_object_id=order_id,
+                related_content_type='order',
+                action_url=reverse('order_detail', args=[order_id]),
+                action_text='View Order',
+            )
+            for (order_id, seller_id), amount in payouts.items()
+        )
+
+        lags = [(released_at - due_at).total_seconds() for _, _, _, due_at in rows]
+        run.released += len(rows)
+        run.batches += 1
+        run.payouts += len(payouts)
+        run.total_lag_seconds += sum(lags)
+        run.max_lag_seconds = max([run.max_lag_seconds, *lags])
+        run.save(update_fields=['released', 'batches', 'payouts', 'total_lag_seconds', 'max_lag_seconds'])
+    return len(ids)
+
+
+def release_due_escrows(now=None, batch_size=None, max_batches=None):
+    """
+    Release every held escrow due by ``now``, ``batch_size`` at a time and at
+    most ``max_batches`` batches. Returns the ``EscrowReleaseRun``.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'ESCROW_RELEASE_BATCH_SIZE', 500)
+    run = EscrowReleaseRun.objects.create()
+    while max_batches is None or run.batches < max_batches:
+        if not _release_batch(now, batch_size, run):
+            break
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    logger.info(f"Escrow release run {run.pk}: {run.released} released in {run.batches} batches")
+    return run
+
+
+def release_backlog(now=None):
+    """How many escrows are due and still held, and how long the oldest has waited"""
+    now = now or timezone.now()
+    due = due_escrows(now)
+    oldest = due.order_by('auto_release_date').values_list('auto_release_date', flat=True).first()
+    return due.count(), (now - oldest) if oldest else None
@@ -0,0 +1,83 @@
+"""
+Cached markup for listing cards and store tiles.
+
+A card's user-independent parts (image, title, price, category, location and
+so on) are rendered once and cached under the object's id and its
+``date_updated``/``updated_at`` stamp, so any save of the object retires its
+cached markup. Each fragment name (e.g. ``browse-body``) identifies one piece
+of markup at one rendition size. Parts that depend on who is looking
+(favourite buttons, cart forms, CSRF tokens) stay outside the cache.
+
+Listing cards and store tiles are two namespaces of ``homabay_souq.cache``.
+Before the loop, ``{% prefetch_fragments %}`` fetches every card on the page
+with one ``get_many``, and the namespace's version comes back in the same
+round-trip. Cards then render from the prefetched markup and only misses are
+rendered and stored. Saving or deleting a category or store bumps the listing
+fragment namespace, because card markup shows their names.
+Aggregates shown on store tiles (product counts, ratings) may lag by up to
+FRAGMENT_CACHE_TIMEOUT.
+"""
+from django.conf import settings
+
+from homabay_souq.cache import namespace
+
+LISTING_FRAGMENTS = 'listing'
+STORE_FRAGMENTS = 'store'
+
+
+def fragments(group):
+    return namespace(f'fragment:{group}')
+
+
+def _timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+
+
+def _stamp(obj):
+    updated = getattr(obj, 'date_updated', None) or getattr(obj, 'updated_at', None)
+    return f'{updated.timestamp():.6f}' if updated else '0'
+
+
+def fragment_group(obj):
+    return STORE_FRAGMENTS if obj._meta.model_name == 'store' else LISTING_FRAGMENTS
+
+
+def fragment_key(name, obj):
+    return f'{name}:{obj._meta.model_name}:{obj.pk}:{_stamp(obj)}'
+
+
+def bump_fragments(group):
+    """Retire every cached fragment in ``group`` once the current transaction commits"""
+    fragments(group).bump_on_commit()
+
+
+class PrefetchedFragments:
+    """The cached markup of one page's cards, fetched in one round-trip"""
+
+    def __init__(self):
+        self.found = {}
+        self.fetched = set()
+        self.versions = {}
+
+    def fetch(self, names, objects):
+        by_group = {}
+        for obj in objects:
+            by_group.setdefault(fragment_group(obj), []).extend(fragment_key(name, obj) for name in names)
+        for group, keys in by_group.items():
+            self.versions[group], found = fragments(group).lookup(keys)
+            self.found.update(found)
+            self.fetched.update(keys)
+
+    def get(self, name, obj):
+        """The cached markup of ``name`` for ``obj``, or None"""
+        key = fragment_key(name, obj)
+        if key not in self.fetched:
+            # Not prefetched: fall back to a lookup of its own
+            self.fetch([name], [obj])
+        return self.found.get(key)
+
+    def set(self, name, obj, html):
+        key = fragment_key(name, obj)
+        group = fragment_group(obj)
+        self.found[key] = html
+        fragments(group).set(key, html, _timeout(), version=self.versions.get(group))
@@ -0,0 +1,277 @@
+"""
+Order fulfilment as set-based writes.
+
+Shipping a seller's items is one UPDATE over the order's items. The sellers
+who still have items to ship come from one grouped query. The order's status,
+its seller-order index rows and the activity log then follow in a few more
+statements, however many items and sellers the order has. The last shipment
+also schedules the escrow's automatic release (see
+``listings.escrow_release``). Confirming delivery releases the escrow with
+one UPDATE guarded on it still being held, so an escrow is only ever paid
+out once. Each seller's payout comes from one aggregate, and the payout
+ledger and activity rows go in with one insert each.
+
+Notifications, SMS and the delivery request are side effects. They go out
+once the transaction commits, so a rolled-back shipment never tells anyone
+about it. They run on a background thread unless
+ORDER_SIDE_EFFECTS_IN_BACKGROUND is off, so a slow SMS gateway or delivery
+API never holds up the seller's request.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from homabay_souq.background import after_commit as run_after_commit
+from notifications.utils import (
+    NotificationService, create_notification, notify_delivery_assigned,
+    notify_delivery_confirmed, notify_order_shipped,
+)
+
+from .models import Activity, Escrow, EscrowPayout, Order, OrderItem
+from .order_index import sync_seller_orders
+from .order_presentation import SHIPPABLE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+class Shipment:
+    """The outcome of ``ship_items``"""
+
+    def __init__(self, order, shipped_items, remaining_seller_ids):
+        self.order = order
+        self.shipped_items = shipped_items
+        self.remaining_seller_ids = remaining_seller_ids
+
+    @property
+    def complete(self):
+        return not self.remaining_seller_ids
+
+
+def after_commit(func, *args):
+    """Run ``func(*args)`` once the current transaction commits (see the module docstring)"""
+    run_after_commit(_run, func, *args, setting='ORDER_SIDE_EFFECTS_IN_BACKGROUND')
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        logger.error(f"Order side effect {func.__name__} failed: {str(e)}")
+
+
+def order_seller_ids(order):
+    """The distinct sellers of ``order``'s items, from one query"""
+    return set(
+        OrderItem.objects.filter(order=order, listing__seller_id__isnull=False)
+        .values_list('listing__seller_id', flat=True).distinct()
+    )
+
+
+def order_payouts(order_ids):
+    """``{(order_id, seller_id): amount}`` for the orders from one grouped query"""
+    rows = OrderItem.objects.filter(order_id__in=order_ids, listing__seller_id__isnull=False).values(
+        'order_id', seller_id=F('listing__seller_id')
+    ).annotate(
+        amount=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by()
+    return {(row['order_id'], row['seller_id']): row['amount'] for row in rows}
+
+
+def seller_payouts(order):
+    """``{seller_id: amount}`` for ``order``"""
+    return {seller_id: amount for (_, seller_id), amount in order_payouts([order.pk]).items()}
+
+
+def ship_items(order, seller, tracking_number=None):
+    """
+    Mark every unshipped item of ``seller`` in ``order`` as shipped and move
+    the order to ``partially_shipped`` or, once nobody has items left to
+    ship, ``shipped``. Returns a ``Shipment``.
+    """
+    now = timezone.now()
+    changes = {'shipped': True, 'shipped_at': now}
+    if tracking_number:
+        changes['tracking_number'] = tracking_number
+
+    with transaction.atomic():
+        # Sellers shipping at the same moment queue here, so exactly one of
+        # them sees no remaining sellers and completes the order
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        if locked.status not in SHIPPABLE_STATUSES:
+            raise ValidationError("Can only mark items shipped for paid orders")
+
+        shipped_items = OrderItem.objects.filter(
+            order_id=order.pk, listing__seller=seller, shipped=False
+        ).update(**changes)
+        if not shipped_items:
+            raise ValidationError("No unshipped items found for this seller")
+
+        remaining_seller_ids = set(
+            OrderItem.objects.filter(order_id=order.pk, shipped=False)
+            .values_list('listing__seller_id', flat=True).distinct()
+        )
+        order.status = 'partially_shipped' if remaining_seller_ids else 'shipped'
+        if not remaining_seller_ids:
+            order.shipped_at = now
+            # Released automatically unless the buyer confirms or disputes first
+            Escrow.objects.filter(order_id=order.pk, status='held', auto_release_date__isnull=True).update(
+                auto_release_date=now + timedelta(days=getattr(settings, 'ESCROW_AUTO_RELEASE_DAYS', 7))
+            )
+        if order.status != locked.status or not remaining_seller_ids:
+            order.save(update_fields=['status', 'shipped_at', 'updated_at'])
+        # The UPDATE above bypassed the item signals that keep the index
+        sync_seller_orders([order.pk])
+
+        Activity.objects.create(
+            user=seller,
+            action=f"Order #{order.pk} items marked as shipped (seller: {seller.username})"
+        )
+        after_commit(
+            announce_shipment, order.pk, seller.pk, tracking_number,
+            sorted(seller_id for seller_id in remaining_seller_ids if seller_id is not None),
+        )
+    return Shipment(order, shipped_items, remaining_seller_ids)
+
+
+def create_delivery_request(order):
+    """Create delivery request in the delivery system"""
+    try:
+        try:
+            from integrations.delivery import DeliverySystemIntegration
+        except ImportError:
+            logger.error("DeliverySystemIntegration could not be imported. Delivery integration is unavailable.")
+            return None
+
+        delivery_integration = DeliverySystemIntegration()
+        return delivery_integration.create_delivery_from_order(order)
+
+    except Exception as e:
+        logger.error(f"Delivery system integration failed: {str(e)}")
+        return None
+
+
+def announce_shipment(order_id, seller_id, tracking_number, remaining_seller_ids):
+    """
+    Runs after commit: tell the buyer about a shipment, and either book the
+    delivery of a fully shipped order or remind the sellers still to ship
+    """
+    order = Order.objects.select_related('user').get(pk=order_id)
+    seller = User.objects.get(pk=seller_id)
+
+    if remaining_seller_ids:
+        notify_order_shipped(order.user, seller, order, tracking_number)
+        remind_sellers_to_ship(order, seller, remaining_seller_ids)
+        return
+
+    # Consolidated delivery request for the whole order
+    delivery_response = create_delivery_request(order)
+    if delivery_response and delivery_response.get('success'):
+        delivery_tracking = delivery_response.get('tracking_number')
+        if delivery_tracking:
+            Order.objects.filter(pk=order.pk).update(tracking_number=delivery_tracking)
+            order.tracking_number = delivery_tracking
+        notify_order_shipped(order.user, seller, order, delivery_tracking)
+        driver_info = delivery_response.get('driver', {})
+        if driver_info:
+            notify_delivery_assigned(order, driver_info.get('name', 'Delivery Partner'), driver_info.get('estimated_delivery', 'Soon'))
+    else:
+        # Delivery integration gave no tracking number
+        notify_order_shipped(order.user, seller, order, None)
+
+
+def remind_sellers_to_ship(order, sender, seller_ids):
+    """Nudge the last few sellers of an order, up to SELLER_SHIPMENT_REMINDER_THRESHOLD of them"""
+    if not 0 < len(seller_ids) <= getattr(settings, 'SELLER_SHIPMENT_REMINDER_THRESHOLD', 2):
+        return
+    ns = NotificationService()
+    for seller in User.objects.filter(pk__in=seller_ids):
+        try:
+            ns.send_sms(
+                getattr(seller, 'phone_number', ''),
+                f"Order #{order.id} has most sellers shipped. Please mark your items as shipped so the buyer can receive their order."
+            )
+        except Exception:
+            logger.exception("Failed to send shipment reminder SMS")
+        try:
+            create_notification(
+                recipient=seller,
+                notification_type='system',
+                title='Action required: Ship items',
+                message=f'Order #{order.id} still has unshipped items assigned to you. Please mark them as shipped.',
+                sender=sender,
+                related_object_id=order.id,
+                related_content_type='order',
+                action_url=reverse('order_detail', args=[order.id]),
+                action_text='View Order'
+            )
+        except Exception:
+            logger.exception("Failed to create in-app shipment reminder")
+
+
+def confirm_delivery(order, buyer):
+    """
+    The buyer confirms a shipped order arrived: mark it delivered and release
+    its escrow to the sellers. Returns ``{seller_id: amount}`` released.
+    """
+    if order.status != 'shipped':
+        raise ValidationError("Can only confirm delivery for shipped orders")
+    if order.user_id != buyer.pk:
+        raise ValidationError("Only the buyer can confirm delivery")
+
+    now = timezone.now()
+    with transaction.atomic():
+        # The auto-release sweeper may have delivered the order since it was read
+        if Order.objects.select_for_update().filter(pk=order.pk).values_list('status', flat=True).first() != 'shipped':
+            raise ValidationError("Can only confirm delivery for shipped orders")
+        order.status = 'delivered'
+        order.delivered_at = now
+        order.save(update_fields=['status', 'delivered_at', 'updated_at'])
+        payouts = release_escrow(order, now)
+        Activity.objects.bulk_create([
+            Activity(user=buyer, action=f"Order #{order.pk} delivered and confirmed"),
+            *(
+                Activity(user_id=seller_id, action=f"Delivery confirmed and funds released for Order #{order.pk}")
+                for seller_id in payouts
+            ),
+        ])
+        after_commit(announce_delivery, order.pk, sorted(payouts))
+    return payouts
+
+
+def release_escrow(order, released_at=None):
+    """
+    Release ``order``'s escrow to its sellers and record their payouts in
+    the ledger; returns ``{seller_id: amount}``. An escrow that is no longer
+    held (already released, disputed or refunded) pays nothing and returns
+    ``{}``.
+    """
+    escrow_id = Escrow.objects.filter(order_id=order.pk, status='held').values_list('pk', flat=True).first()
+    if escrow_id is None or not Escrow.objects.filter(pk=escrow_id, status='held').update(
+        status='released', released_at=released_at or timezone.now()
+    ):
+        return {}
+
+    payouts = seller_payouts(order)
+    for seller_id, amount in payouts.items():
+        # In a real system, you'd actually transfer funds here
+        logger.info(f"Releasing KSh {amount} to seller {seller_id} for order #{order.pk}")
+    EscrowPayout.objects.bulk_create([
+        EscrowPayout(escrow_id=escrow_id, seller_id=seller_id, amount=amount, reason='delivery_confirmed')
+        for seller_id, amount in payouts.items()
+    ])
+    return payouts
+
+
+def announce_delivery(order_id, seller_ids):
+    """Runs after commit: tell each seller the delivery was confirmed and their funds released"""
+    order = Order.objects.select_related('user').get(pk=order_id)
+    for seller in User.objects.filter(pk__in=seller_ids):
+        notify_delivery_confirmed(seller, order.user, order)
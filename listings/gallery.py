@@ -0,0 +1,241 @@
+"""
+Deferred gallery uploads for listings.
+
+The listing forms used to push every gallery photo to storage inside the
+request, which with Cloudinary is one blocking HTTPS upload per photo. Now the
+request only validates the files and copies them to local disk under
+GALLERY_STAGING_ROOT, marks the listing's gallery as not ready and returns.
+Once the transaction commits, a background thread uploads the staged files
+through a pool of GALLERY_UPLOAD_WORKERS threads, makes their renditions,
+creates the ``ListingImage`` rows and marks the gallery ready again.
+
+Upload workers only talk to storage; every database write happens on the
+thread that runs ``process_gallery``. A file whose upload fails stays staged
+(and the gallery not ready) unless storage rejected it outright; files left
+behind that way, or by a worker process that died, are picked up by
+``manage.py process_gallery_uploads``.
+
+With Cloudinary configured, browsers can instead upload straight to
+Cloudinary with a signed request (``direct_upload_params``) and hand back the
+results, which ``attach_direct_uploads`` verifies and attaches.
+"""
+import logging
+import mimetypes
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+
+from homabay_souq.background import after_commit
+from homabay_souq.conditional import bump_collection
+
+from .models import Listing, ListingImage
+from .renditions import make_renditions, save_renditions, source_name, strip_metadata
+
+logger = logging.getLogger(__name__)
+
+DIRECT_UPLOAD_FOLDER = 'homabay_souq/listings/gallery'
+# Incoming transformation for direct uploads: Cloudinary re-encodes the photo
+# upright before storing it, which drops its EXIF and other metadata
+DIRECT_UPLOAD_TRANSFORMATION = 'a_exif'
+
+
+def staging_root():
+    return getattr(settings, 'GALLERY_STAGING_ROOT', '') or os.path.join(tempfile.gettempdir(), 'homabay_souq_gallery')
+
+
+def staging_dir(listing_id):
+    return os.path.join(staging_root(), str(listing_id))
+
+
+def staged_files(listing_id):
+    directory = staging_dir(listing_id)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+
+def _original_name(path):
+    # Staged as "<time_ns>-<index>-<original name>"
+    return os.path.basename(path).split('-', 2)[-1]
+
+
+def validate_upload(upload):
+    """Return why ``upload`` cannot be a gallery image, or None"""
+    content_type = getattr(upload, 'content_type', '')
+    size = getattr(upload, 'size', None)
+    if content_type and not content_type.startswith('image/'):
+        return 'Invalid file type'
+    if size is not None and size > getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024):
+        return 'File too large'
+    return None
+
+
+def stage_uploads(listing, files):
+    """
+    Validate ``files`` and copy the good ones to the listing's staging
+    directory. Returns ``(staged_paths, failed)`` where ``failed`` is a list of
+    ``{'name', 'error'}`` dicts.
+    """
+    directory = staging_dir(listing.pk)
+    os.makedirs(directory, exist_ok=True)
+    staged, failed = [], []
+    stamp = time.time_ns()
+    for index, upload in enumerate(files):
+        name = os.path.basename(getattr(upload, 'name', '') or 'image')
+        error = validate_upload(upload)
+        if error:
+            failed.append({'name': name, 'error': error})
+            continue
+        path = os.path.join(directory, f'{stamp}-{index:03d}-{name}')
+        with open(path, 'wb') as out:
+            for chunk in upload.chunks():
+                out.write(chunk)
+        staged.append(path)
+    return staged, failed
+
+
+def queue_gallery_uploads(listing, files):
+    """
+    Stage ``files`` for ``listing`` and upload them once the current
+    transaction commits. Returns the files that were rejected, as
+    ``stage_uploads`` does.
+    """
+    staged, failed = stage_uploads(listing, files)
+    if staged:
+        Listing.objects.filter(pk=listing.pk).update(gallery_ready=False)
+        listing.gallery_ready = False
+        after_commit(process_gallery, listing.pk, staged, setting='GALLERY_BACKGROUND_UPLOADS')
+    return failed
+
+
+def _upload(listing_id, path, order):
+    """Runs on a worker thread: store one staged file and make its renditions, no database access"""
+    image = ListingImage(listing_id=listing_id, order=order)
+    with open(path, 'rb') as f:
+        image.image = strip_metadata(UploadedFile(
+            file=f,
+            name=_original_name(path),
+            content_type=mimetypes.guess_type(path)[0],
+            size=os.path.getsize(path),
+        ))
+        # pre_save is what uploads the file, for ImageField and CloudinaryField alike
+        ListingImage._meta.get_field('image').pre_save(image, add=True)
+    return image, make_renditions(image.image)
+
+
+def _is_permanent(error):
+    """Whether retrying an upload cannot help: the staged file is gone or storage rejected it"""
+    if isinstance(error, FileNotFoundError):
+        return True
+    try:
+        from cloudinary.exceptions import BadRequest
+    except ImportError:
+        return False
+    return isinstance(error, BadRequest)
+
+
+def process_gallery(listing_id, paths):
+    """
+    Upload the staged ``paths`` for a listing in parallel and create their
+    ``ListingImage`` rows. Staged files are removed once uploaded or rejected
+    for good; others stay staged for the next run. Returns the number of
+    images created.
+    """
+    paths = sorted(paths)
+    if not Listing.objects.filter(pk=listing_id).exists():
+        _discard(paths)
+        return 0
+
+    first_order = ListingImage.objects.filter(listing_id=listing_id).count()
+    created = 0
+    with ThreadPoolExecutor(max_workers=getattr(settings, 'GALLERY_UPLOAD_WORKERS', 4)) as pool:
+        futures = [
+            pool.submit(_upload, listing_id, path, first_order + index)
+            for index, path in enumerate(paths)
+        ]
+        for path, future in zip(paths, futures):
+            try:
+                image, renditions = future.result()
+            except Exception as e:
+                if not _is_permanent(e):
+                    logger.warning(
+                        f"Could not upload gallery image {_original_name(path)} for listing {listing_id}, "
+                        f"will retry: {str(e)}"
+                    )
+                    continue
+                logger.error(f"Gallery image {_original_name(path)} for listing {listing_id} was rejected: {str(e)}")
+            else:
+                source = source_name(image.image)
+                # Renditions were made on the worker; don't make them again on save
+                image._rendition_sources = {'image': source}
+                image.save()
+                if renditions:
+                    save_renditions(source, renditions)
+                created += 1
+            _discard([path])
+
+    if not staged_files(listing_id):
+        Listing.objects.filter(pk=listing_id).update(gallery_ready=True)
+        bump_collection('listings', f'listing:{listing_id}')
+    return created
+
+
+def _discard(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def direct_uploads_enabled():
+    return bool(getattr(settings, 'CLOUDINARY_CLOUD_NAME', '')) and getattr(settings, 'GALLERY_DIRECT_UPLOADS', False)
+
+
+def direct_upload_params():
+    """Signed parameters for a browser to upload one gallery photo straight to Cloudinary"""
+    import cloudinary
+    import cloudinary.utils
+
+    config = cloudinary.config()
+    params = {'folder': DIRECT_UPLOAD_FOLDER, 'transformation': DIRECT_UPLOAD_TRANSFORMATION, 'timestamp': int(time.time())}
+    params['signature'] = cloudinary.utils.api_sign_request(params, config.api_secret)
+    return {
+        **params,
+        'api_key': config.api_key,
+        'upload_url': f'https://api.cloudinary.com/v1_1/{config.cloud_name}/image/upload',
+    }
+
+
+def attach_direct_uploads(listing, uploads):
+    """
+    Attach photos a browser uploaded to Cloudinary itself. ``uploads`` are the
+    upload responses' ``public_id``, ``version``, ``format`` and ``signature``;
+    anything unsigned or outside the gallery folder is ignored. Returns the
+    number attached.
+    """
+    import cloudinary.utils
+    from cloudinary import CloudinaryResource
+
+    order = ListingImage.objects.filter(listing=listing).count()
+    attached = 0
+    for upload in uploads:
+        public_id = str(upload.get('public_id', ''))
+        version = upload.get('version')
+        if not public_id.startswith(f'{DIRECT_UPLOAD_FOLDER}/'):
+            continue
+        if not cloudinary.utils.verify_api_response_signature(public_id, version, upload.get('signature')):
+            continue
+        # Saving generates the renditions through the usual post_save handler
+        ListingImage.objects.create(
+            listing=listing,
+            image=CloudinaryResource(public_id, format=upload.get('format'), version=version),
+            order=order + attached,
+        )
+        attached += 1
+    return attached
@@ -0,0 +1,28 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from listings.gallery import process_gallery, staged_files, staging_root
+
+
+class Command(BaseCommand):
+    help = 'Upload gallery photos left staged by a worker that stopped before finishing them. Run periodically (e.g. cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=10,
+            help='Only pick up files staged at least this many minutes ago (default 10), so in-flight uploads are left alone'
+        )
+
+    def handle(self, *args, **options):
+        root = staging_root()
+        cutoff = time.time() - options['older_than'] * 60
+        listings = images = 0
+        for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            if not name.isdigit():
+                continue
+            paths = [path for path in staged_files(name) if os.path.getmtime(path) <= cutoff]
+            if paths:
+                images += process_gallery(int(name), paths)
+                listings += 1
+        self.stdout.write(self.style.SUCCESS(f'Uploaded {images} staged images for {listings} listings.'))
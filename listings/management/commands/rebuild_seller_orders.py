@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from listings.order_index import rebuild_seller_orders
+
+
+class Command(BaseCommand):
+    help = 'Recompute the SellerOrder index from order items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Orders recomputed per batch')
+
+    def handle(self, *args, **options):
+        orders = rebuild_seller_orders(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the seller-order index for {orders} orders."))
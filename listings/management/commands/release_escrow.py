@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from listings.escrow_release import release_backlog, release_due_escrows
+
+
+class Command(BaseCommand):
+    help = 'Release held escrows whose automatic release date has passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Escrows released per batch (default: ESCROW_RELEASE_BATCH_SIZE)')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        due, oldest = release_backlog()
+        self.stdout.write(
+            f"Backlog: {due} escrows due" + (f", oldest due {oldest.total_seconds():.0f}s ago" if oldest else "")
+        )
+
+        run = release_due_escrows(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        throughput = run.throughput()
+        mean_lag = run.mean_lag_seconds()
+        self.stdout.write(
+            f"Released: {run.released} escrows in {run.batches} batches, {run.payouts} seller payouts"
+            + (f" ({throughput:.1f} escrows/s)" if throughput else "")
+        )
+        if mean_lag is not None:
+            self.stdout.write(f"Lag: {mean_lag:.0f}s mean, {run.max_lag_seconds:.0f}s max past the release date")
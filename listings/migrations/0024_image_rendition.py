@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0023_alter_listing_image_alter_listingimage_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=255)),
+                ('size', models.CharField(choices=[('thumb', 'Thumbnail'), ('card', 'Card'), ('detail', 'Detail')], max_length=10)),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=4)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('url', models.CharField(max_length=500)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('bytes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('source', 'size', 'format')},
+            },
+        ),
+    ]
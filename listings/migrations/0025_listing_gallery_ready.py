@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0024_image_rendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='gallery_ready',
+            field=models.BooleanField(default=True),
+        ),
+    ]
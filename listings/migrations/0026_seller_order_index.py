@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+
+def backfill_seller_orders(apps, schema_editor):
+    Order = apps.get_model('listings', 'Order')
+    OrderItem = apps.get_model('listings', 'OrderItem')
+    SellerOrder = apps.get_model('listings', 'SellerOrder')
+
+    orders = dict(
+        (pk, (status, created_at))
+        for pk, status, created_at in Order.objects.values_list('pk', 'status', 'created_at').iterator()
+    )
+    shares = list(OrderItem.objects.filter(listing__seller_id__isnull=False).values(
+        'order_id', seller_id=F('listing__seller_id')
+    ).annotate(
+        item_count=Count('id'),
+        shipped_count=Count('id', filter=Q(shipped=True)),
+        subtotal=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by())
+    sellers_per_order = {}
+    for share in shares:
+        sellers_per_order[share['order_id']] = sellers_per_order.get(share['order_id'], 0) + 1
+
+    SellerOrder.objects.bulk_create([
+        SellerOrder(
+            order_id=share['order_id'],
+            seller_id=share['seller_id'],
+            status=orders[share['order_id']][0],
+            created_at=orders[share['order_id']][1],
+            item_count=share['item_count'],
+            shipped_count=share['shipped_count'],
+            subtotal=share['subtotal'] or 0,
+            shipped=share['shipped_count'] == share['item_count'],
+            sole_seller=sellers_per_order[share['order_id']] == 1,
+        )
+        for share in shares
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0025_listing_gallery_ready'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending Payment'), ('paid', 'Paid'), ('partially_shipped', 'Partially Shipped'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('disputed', 'Disputed')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('shipped_count', models.PositiveIntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('shipped', models.BooleanField(default=False)),
+                ('sole_seller', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='listings_or_user_id_c7bff5_idx'),
+        ),
+        migrations.AddField(
+            model_name='sellerorder',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_orders', to='listings.order'),
+        ),
+        migrations.AddField(
+            model_name='sellerorder',
+            name='seller',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sold_orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='sellerorder',
+            index=models.Index(fields=['seller', '-created_at', '-order'], name='listings_se_seller__3972a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sellerorder',
+            index=models.Index(fields=['seller', 'status', '-created_at', '-order'], name='listings_se_seller__721a85_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sellerorder',
+            unique_together={('order', 'seller')},
+        ),
+        migrations.RunPython(backfill_seller_orders, migrations.RunPython.noop),
+    ]
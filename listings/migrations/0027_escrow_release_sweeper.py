@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0026_seller_order_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscrowPayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reason', models.CharField(choices=[('delivery_confirmed', 'Delivery Confirmed'), ('auto_release', 'Automatic Release')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EscrowReleaseRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('released', models.PositiveIntegerField(default=0)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('payouts', models.PositiveIntegerField(default=0)),
+                ('total_lag_seconds', models.FloatField(default=0)),
+                ('max_lag_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='escrow',
+            index=models.Index(fields=['status', 'auto_release_date'], name='listings_es_status_9b9db1_idx'),
+        ),
+        migrations.AddField(
+            model_name='escrowpayout',
+            name='escrow',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='listings.escrow'),
+        ),
+        migrations.AddField(
+            model_name='escrowpayout',
+            name='seller',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escrow_payouts', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
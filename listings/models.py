@@ -12,6 +12,8 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from homabay_souq.slugs import save_with_unique_slug
+
 
 User = get_user_model()
 
@@ -68,6 +70,39 @@ class ListingImage(models.Model):
         return '/static/images/listing_placeholder.svg'
     
     
+class ImageRendition(models.Model):
+    """
+    One resized, metadata-free copy of an uploaded image (see ``listings.renditions``).
+
+    ``source`` is the original's storage name or Cloudinary public id, so any
+    image field can have renditions without a column of its own.
+    """
+    SIZE_CHOICES = [
+        ('thumb', 'Thumbnail'),
+        ('card', 'Card'),
+        ('detail', 'Detail'),
+    ]
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    source = models.CharField(max_length=255, db_index=True)
+    size = models.CharField(max_length=10, choices=SIZE_CHOICES)
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    name = models.CharField(max_length=255, blank=True)
+    url = models.CharField(max_length=500)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    bytes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('source', 'size', 'format')
+
+    def __str__(self):
+        return f"{self.source} ({self.size}, {self.format}, {self.width}x{self.height})"
+
 class Listing(models.Model):
     HOMABAY_LOCATIONS = [
         ('HB_Town', 'Homa Bay Town'),
@@ -119,6 +154,8 @@ class Listing(models.Model):
     is_sold = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # False while gallery photos are still being uploaded in the background (listings.gallery)
+    gallery_ready = models.BooleanField(default=True)
     favorited_by = models.ManyToManyField(User, related_name='favorited_listings', blank=True)
     
     # Product specifications
@@ -190,16 +227,9 @@ class Listing(models.Model):
             import os
             os.makedirs(os.path.join(settings.MEDIA_ROOT, 'listing_images'), exist_ok=True)
         
-        # Generate slug if not provided
+        # Generate a unique slug if not provided
         if not self.slug:
-            from django.utils.text import slugify
-            self.slug = slugify(self.title)
-            # Ensure uniqueness
-            original_slug = self.slug
-            counter = 1
-            while Listing.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
+            return save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
         
         super().save(*args, **kwargs)
 
@@ -350,6 +380,12 @@ class Order(models.Model):
     paid_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # A buyer's orders, newest first, paged by (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
@@ -404,6 +440,33 @@ class OrderItem(models.Model):
         return self.quantity * self.price
 
 
+class SellerOrder(models.Model):
+    """
+    One seller's share of an order: their items, subtotal and shipment state,
+    with the order's status and date copied in so seller pages read a single
+    index range. Kept in step by ``listings.order_index``.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='seller_orders')
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sold_orders')
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS)
+    created_at = models.DateTimeField()
+    item_count = models.PositiveIntegerField(default=0)
+    shipped_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Every item of this seller has shipped
+    shipped = models.BooleanField(default=False)
+    # No other seller has items in the order
+    sole_seller = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('order', 'seller')
+        indexes = [
+            models.Index(fields=['seller', '-created_at', '-order']),
+            models.Index(fields=['seller', 'status', '-created_at', '-order']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} - seller {self.seller_id}"
 
 
 class Payment(models.Model):
@@ -549,6 +612,12 @@ class Escrow(models.Model):
     auto_release_date = models.DateTimeField(null=True, blank=True)
     dispute_resolved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # The auto-release sweeper reads held escrows by due date
+            models.Index(fields=['status', 'auto_release_date']),
+        ]
+
     def schedule_auto_release(self, days=7):
         """Automatically release funds after X days if no dispute"""
         from django.utils import timezone
@@ -596,6 +665,54 @@ class Escrow(models.Model):
             action=f"Escrow refunded for Order #{self.order.id}"
         )
 
+class EscrowPayout(models.Model):
+    """Ledger of what each seller was paid out of a released escrow"""
+    REASONS = [
+        ('delivery_confirmed', 'Delivery Confirmed'),
+        ('auto_release', 'Automatic Release'),
+    ]
+
+    escrow = models.ForeignKey(Escrow, on_delete=models.CASCADE, related_name='payouts')
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='escrow_payouts')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    reason = models.CharField(max_length=20, choices=REASONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"KSh {self.amount} to seller {self.seller_id} from escrow {self.escrow_id}"
+
+
+class EscrowReleaseRun(models.Model):
+    """One pass of ``manage.py release_escrow`` over the escrows due for automatic release"""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    released = models.PositiveIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    payouts = models.PositiveIntegerField(default=0)
+    # How long released escrows had been due, for the run's mean and worst lag
+    total_lag_seconds = models.FloatField(default=0)
+    max_lag_seconds = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Escrow release run {self.started_at:%Y-%m-%d %H:%M}: {self.released} released"
+
+    def throughput(self):
+        """Escrows released per second, once the run has finished"""
+        if not self.finished_at:
+            return None
+        seconds = (self.finished_at - self.started_at).total_seconds()
+        return self.released / seconds if seconds > 0 else None
+
+    def mean_lag_seconds(self):
+        return self.total_lag_seconds / self.released if self.released else None
+
+
 class Review(models.Model):
     listing = models.ForeignKey(
         Listing,
@@ -0,0 +1,201 @@
+"""
+The seller-order index.
+
+``SellerOrder`` holds one row per (order, seller) with the seller's item
+count, subtotal and shipment state, and the order's status and creation time.
+Rows are recomputed from the order's items whenever an item is saved or
+deleted, and take the order's status whenever it changes (see
+``listings.signals``). Bulk ``update()`` calls bypass those signals, so code
+that changes items that way calls ``sync_seller_orders`` itself.
+
+A seller's orders are then one index range on (seller, created_at), and the
+order pages page through them by keyset on ``(created_at, order_id)`` instead
+of joining every order to its items and listings.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum
+
+from .models import Order, OrderItem, SellerOrder
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_PAGE_SIZE = 10
+SHARE_FIELDS = ['status', 'created_at', 'item_count', 'shipped_count', 'subtotal', 'shipped', 'sole_seller']
+
+
+def seller_shares(order_ids):
+    """``{(order_id, seller_id): totals}`` from one grouped query over the orders' items"""
+    rows = OrderItem.objects.filter(
+        order_id__in=order_ids, listing__seller_id__isnull=False
+    ).values('order_id', seller_id=F('listing__seller_id')).annotate(
+        item_count=Count('id'),
+        shipped_count=Count('id', filter=Q(shipped=True)),
+        subtotal=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by()
+    return {(row['order_id'], row['seller_id']): row for row in rows}
+
+
+def sync_seller_orders(order_ids):
+    """Recompute the index rows of ``order_ids`` from their items"""
+    order_ids = set(order_ids)
+    if not order_ids:
+        return
+    shares = seller_shares(order_ids)
+    orders = {
+        pk: (status, created_at)
+        for pk, status, created_at in Order.objects.filter(pk__in=order_ids).values_list('pk', 'status', 'created_at')
+    }
+    sellers_per_order = {}
+    for order_id, _ in shares:
+        sellers_per_order[order_id] = sellers_per_order.get(order_id, 0) + 1
+
+    rows = []
+    for (order_id, seller_id), share in shares.items():
+        if order_id not in orders:
+            continue
+        status, created_at = orders[order_id]
+        rows.append(SellerOrder(
+            order_id=order_id,
+            seller_id=seller_id,
+            status=status,
+            created_at=created_at,
+            item_count=share['item_count'],
+            shipped_count=share['shipped_count'],
+            subtotal=share['subtotal'] or Decimal('0'),
+            shipped=share['shipped_count'] == share['item_count'],
+            sole_seller=sellers_per_order[order_id] == 1,
+        ))
+
+    with transaction.atomic():
+        stale = [
+            pk for pk, order_id, seller_id in SellerOrder.objects.filter(
+                order_id__in=order_ids
+            ).values_list('pk', 'order_id', 'seller_id')
+            if (order_id, seller_id) not in shares
+        ]
+        if stale:
+            SellerOrder.objects.filter(pk__in=stale).delete()
+        if rows:
+            SellerOrder.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['order', 'seller'],
+                update_fields=SHARE_FIELDS,
+            )
+
+
+def sync_order_status(order):
+    """Copy ``order``'s status onto its index rows"""
+    SellerOrder.objects.filter(order_id=order.pk).exclude(status=order.status).update(status=order.status)
+
+
+def sync_orders_status(order_ids):
+    """``sync_order_status`` for orders whose status changed in a bulk UPDATE"""
+    SellerOrder.objects.filter(order_id__in=order_ids).exclude(status=F('order__status')).update(
+        status=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('status')[:1])
+    )
+
+
+def rebuild_seller_orders(batch_size=500):
+    """Recompute the whole index, ``batch_size`` orders at a time. Returns the number of orders."""
+    synced = 0
+    last_id = 0
+    while True:
+        ids = list(Order.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return synced
+        sync_seller_orders(ids)
+        synced += len(ids)
+        last_id = ids[-1]
+
+
+def encode_cursor(created_at, order_id):
+    delta = created_at - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return f'{micros}_{order_id}'
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, order_id)`` or None for a malformed cursor"""
+    try:
+        micros, order_id = (int(part) for part in cursor.split('_'))
+    except (AttributeError, ValueError):
+        return None
+    return EPOCH + timedelta(microseconds=micros), order_id
+
+
+def _before(position, created_field, id_field):
+    created_at, order_id = position
+    return Q(**{f'{created_field}__lt': created_at}) | Q(**{created_field: created_at, f'{id_field}__lt': order_id})
+
+
+def _seller_rows(user, status=None, sole_seller=None):
+    rows = SellerOrder.objects.filter(seller=user)
+    if status:
+        rows = rows.filter(status=status)
+    if sole_seller is not None:
+        rows = rows.filter(sole_seller=sole_seller)
+    return rows
+
+
+def _buyer_orders(user, status=None):
+    orders = Order.objects.filter(user=user)
+    if status:
+        orders = orders.filter(status=status)
+    return orders
+
+
+def get_order_page(user, role=None, status=None, cursor=None, limit=DEFAULT_PAGE_SIZE, sole_seller=None):
+    """
+    One page of the orders ``user`` bought (``role='buyer'``), sold in
+    (``role='seller'``) or either, newest first, optionally with one
+    ``status``. ``sole_seller=True`` keeps only sales with no other seller.
+
+    Each side is a keyset range over its own index; for both roles the two
+    ranges are merged on ``(created_at, id)``. Sales carry their index row as
+    ``order.seller_order``. Returns ``(orders, next_cursor)``.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    entries = {}
+
+    if role != 'seller':
+        buyer_orders = _buyer_orders(user, status).select_related('user').order_by('-created_at', '-id')
+        if position:
+            buyer_orders = buyer_orders.filter(_before(position, 'created_at', 'id'))
+        for order in buyer_orders[:limit + 1]:
+            entries[order.pk] = (order.created_at, order, None)
+
+    if role != 'buyer':
+        rows = _seller_rows(user, status, sole_seller).order_by('-created_at', '-order_id')
+        if position:
+            rows = rows.filter(_before(position, 'created_at', 'order_id'))
+        for row in rows[:limit + 1]:
+            created_at, order, _ = entries.get(row.order_id, (row.created_at, None, None))
+            entries[row.order_id] = (created_at, order, row)
+
+    ranked = sorted(entries.items(), key=lambda entry: (entry[1][0], entry[0]), reverse=True)
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+
+    missing = [order_id for order_id, (_, order, _) in ranked if order is None]
+    loaded = Order.objects.select_related('user').in_bulk(missing) if missing else {}
+    orders = []
+    for order_id, (_, order, row) in ranked:
+        order = order or loaded.get(order_id)
+        if order is None:
+            continue
+        order.seller_order = row
+        orders.append(order)
+
+    next_cursor = None
+    if has_more:
+        last_id, (last_created_at, _, _) = ranked[-1]
+        next_cursor = encode_cursor(last_created_at, last_id)
+    return orders, next_cursor
+
+
+def order_counts(user, status=None):
+    """``(bought, sold)`` order counts for ``user``, each from its own index"""
+    return _buyer_orders(user, status).count(), _seller_rows(user, status).count()
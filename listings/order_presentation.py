@@ -0,0 +1,76 @@
+"""
+What the order pages show for an order.
+
+``present_orders`` loads everything the order list, seller orders and order
+detail pages read for a batch of orders in a fixed number of queries: the
+buyer, the items with their listings and sellers, the payment and the escrow.
+It then works out in memory what the viewing user is to each order and what
+they can do with it. Templates read those attributes instead of filtering
+``order_items`` per row, so a page costs the same number of queries whatever
+its orders and items.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import OrderItem
+
+SHIPPABLE_STATUSES = ('paid', 'partially_shipped')
+DISPUTABLE_STATUSES = ('shipped', 'delivered')
+
+
+class OrderActions:
+    """The actions the viewing user can take on one order"""
+
+    def __init__(self, order, is_buyer, is_seller, has_unshipped_items):
+        escrow = getattr(order, 'escrow', None)
+        # Released funds (confirmed or auto-released) can no longer be disputed
+        funds_held = escrow is None or escrow.status == 'held'
+        self.can_pay = is_buyer and order.status == 'pending'
+        self.can_ship = is_seller and order.status in SHIPPABLE_STATUSES and has_unshipped_items
+        self.can_confirm = is_buyer and order.status == 'shipped'
+        self.can_dispute = is_buyer and order.status in DISPUTABLE_STATUSES and funds_held
+        self.can_review = is_buyer and order.status == 'delivered'
+
+
+def _present(order, user):
+    items = list(order.order_items.all())
+    subtotals = OrderedDict()
+    for item in items:
+        item.is_mine = item.listing.seller_id == user.pk
+        seller = item.listing.seller
+        subtotals[seller] = subtotals.get(seller, Decimal('0')) + item.get_total_price()
+
+    my_items = [item for item in items if item.is_mine]
+    order.is_buyer = order.user_id == user.pk
+    order.is_seller = bool(my_items)
+    order.items_list = items
+    order.my_items = my_items
+    order.my_subtotal = sum((item.get_total_price() for item in my_items), Decimal('0'))
+    # Sellers who are not the buyer only see their own share of the order
+    order.visible_items = my_items if order.is_seller and not order.is_buyer else items
+    order.seller_subtotals = [(seller, subtotal) for seller, subtotal in subtotals.items() if seller is not None]
+    order.sellers = [seller for seller, _ in order.seller_subtotals]
+    order.actions = OrderActions(order, order.is_buyer, order.is_seller, any(not item.shipped for item in my_items))
+    return order
+
+
+def present_orders(orders, user):
+    """
+    Load and annotate ``orders`` for ``user`` and return them as a list. Each
+    order gets ``is_buyer``, ``is_seller``, ``items_list``, ``my_items``,
+    ``my_subtotal``, ``visible_items``, ``seller_subtotals`` (``[(seller,
+    subtotal)]``), ``sellers`` and ``actions`` (an ``OrderActions``), and each
+    item ``is_mine``.
+    """
+    orders = list(orders)
+    if orders:
+        prefetch_related_objects(
+            orders,
+            'user',
+            Prefetch('order_items', queryset=OrderItem.objects.select_related('listing__seller').order_by('pk')),
+            'payment',
+            'escrow',
+        )
+    return [_present(order, user) for order in orders]
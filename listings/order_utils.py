@@ -1,13 +1,17 @@
 from django.utils import timezone
 from django.db import transaction
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from .models import Order, OrderItem, Activity
 from notifications.utils import (
     notify_order_shipped, notify_delivery_assigned,
     notify_delivery_confirmed, create_notification
 )
+from . import fulfilment
 from .dispute_utils import DisputeManager
 
+User = get_user_model()
+
 class OrderManager:
     """
     Manages order state transitions and validations
@@ -66,71 +70,14 @@ class OrderManager:
         """
         Mark items as shipped for a specific seller
         """
-        if order.status not in ['paid', 'partially_shipped']:
-            raise ValidationError("Can only mark items shipped for paid orders")
-
-        seller_items = order.order_items.filter(
-            listing__seller=seller,
-            shipped=False
-        )
-
-        if not seller_items.exists():
-            raise ValidationError("No unshipped items found for this seller")
-
-        with transaction.atomic():
-            now = timezone.now()
-            
-            # Mark items as shipped
-            for item in seller_items:
-                item.shipped = True
-                item.shipped_at = now
-                if tracking_number:
-                    item.tracking_number = tracking_number
-                item.save()
-
-            # Update order status
-            unshipped_items = order.order_items.filter(shipped=False)
-            new_status = 'shipped' if not unshipped_items.exists() else 'partially_shipped'
-            
-            # Update order status if changed
-            if order.status != new_status:
-                OrderManager.update_order_status(
-                    order, 
-                    new_status,
-                    actor=seller,
-                    notes={'tracking_number': tracking_number}
-                )
+        return fulfilment.ship_items(order, seller, tracking_number)
 
     @staticmethod
     def confirm_delivery(order, confirming_user):
         """
         Confirm order delivery and release funds
         """
-        if order.status != 'shipped':
-            raise ValidationError("Can only confirm delivery for shipped orders")
-
-        if confirming_user != order.user:
-            raise ValidationError("Only the buyer can confirm delivery")
-
-        with transaction.atomic():
-            OrderManager.update_order_status(
-                order,
-                'delivered',
-                actor=confirming_user
-            )
-
-            # Release escrow
-            order.escrow.status = 'released'
-            order.escrow.released_at = timezone.now()
-            order.escrow.save()
-
-            # Notify sellers
-            for item in order.order_items.all():
-                notify_delivery_confirmed(
-                    item.listing.seller,
-                    confirming_user,
-                    order
-                )
+        return fulfilment.confirm_delivery(order, confirming_user)
 
     @staticmethod
     def create_dispute(order, reason, description, evidence_files=None):
@@ -160,9 +107,9 @@ class OrderManager:
 
         elif new_status == 'delivered':
             # Notify all sellers
-            for item in order.order_items.all():
+            for seller in User.objects.filter(pk__in=fulfilment.order_seller_ids(order)):
                 notify_delivery_confirmed(
-                    item.listing.seller,
+                    seller,
                     order.user,
                     order
                 )
@@ -170,7 +117,7 @@ class OrderManager:
         elif new_status == 'disputed':
             # Notify all parties
             recipients = [order.user] + list(
-                set(item.listing.seller for item in order.order_items.all())
+                User.objects.filter(pk__in=fulfilment.order_seller_ids(order))
             )
             for recipient in recipients:
                 create_notification(
@@ -18,9 +18,12 @@ def mark_order_shipped(request, order_id):
             return redirect('seller_orders')
 
         tracking_number = request.POST.get('tracking_number')
-        OrderManager.mark_items_shipped(order, request.user, tracking_number)
+        shipment = OrderManager.mark_items_shipped(order, request.user, tracking_number)
 
-        messages.success(request, f"Your items for Order #{order.id} have been marked as shipped.")
+        if shipment.complete:
+            messages.success(request, f"Order #{order.id} marked as shipped. Delivery is being arranged.")
+        else:
+            messages.success(request, f"Your items for Order #{order.id} have been marked as shipped.")
         
     except Exception as e:
         messages.error(request, str(e))
@@ -0,0 +1,246 @@
+"""
+Resized copies ("renditions") of uploaded listing, gallery, store and blog images.
+
+Before an upload reaches storage, ``strip_metadata`` turns it upright and
+re-encodes it without its EXIF and other metadata, so the original that is
+served as a fallback and for zooming carries no GPS position or camera
+details either. Photos browsers upload straight to Cloudinary get the same
+treatment from an incoming transformation (see ``listings.gallery``).
+
+When a field in IMAGE_FIELDS gets a new file, a rendition is made for every
+size in RENDITION_WIDTHS, in WebP and JPEG. This happens after the saving
+transaction commits, on a background thread unless
+IMAGE_RENDITIONS_IN_BACKGROUND is off, so the upload request never waits for
+it:
+
+* with local storage, Pillow turns the image upright, drops its EXIF and other
+  metadata and saves the copies under ``renditions/`` next to the original;
+* with Cloudinary, the same sizes are requested as eager transformations of
+  the uploaded asset (Cloudinary strips metadata from derived images).
+
+Regenerating replaces the files of the previous renditions rather than
+piling up suffixed copies next to them. Each copy is recorded as an
+``ImageRendition`` with its URL, dimensions and
+size in bytes. The ``{% responsive_image %}`` tag in ``image_tags`` turns them
+into ``srcset``/``sizes`` markup. Images without renditions (not made yet,
+uploaded before this existed, or not decodable) fall back to the original
+URL.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+
+from homabay_souq.background import after_commit
+from homabay_souq.cache import namespace
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of each rendition; images are never scaled up
+RENDITION_WIDTHS = {'thumb': 160, 'card': 480, 'detail': 1200}
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+IMAGE_FIELDS = [
+    ('listings.Listing', 'image'),
+    ('listings.ListingImage', 'image'),
+    ('storefront.Store', 'logo'),
+    ('storefront.Store', 'cover_image'),
+    ('blog.BlogPost', 'image'),
+]
+RENDITIONS = namespace('renditions', timeout=60 * 60 * 24)
+# Formats re-encoded on upload; others (animated GIFs...) are stored as sent
+STRIPPED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+
+def source_name(value):
+    """What identifies an uploaded file: its Cloudinary public id or its storage name"""
+    if not value:
+        return ''
+    return getattr(value, 'public_id', None) or getattr(value, 'name', None) or str(value)
+
+
+def _cache_key(source):
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def _quality():
+    return getattr(settings, 'IMAGE_RENDITION_QUALITY', 80)
+
+
+def _clear_metadata(image):
+    from PIL import ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    # Saving only writes metadata that is passed in explicitly; clear what
+    # Pillow carried over so nothing (GPS position, camera, ICC) leaks through
+    image.info = {}
+    return image
+
+
+def strip_metadata(upload):
+    """
+    A copy of the uploaded image ``upload``, turned upright and re-encoded in
+    its own format without EXIF or other metadata. Returns ``upload`` itself
+    when it is not a still JPEG, PNG or WebP or cannot be decoded.
+    """
+    from PIL import Image
+
+    try:
+        upload.seek(0)
+        with Image.open(upload) as original:
+            pil_format = original.format
+            if pil_format not in STRIPPED_FORMATS or getattr(original, 'is_animated', False):
+                upload.seek(0)
+                return upload
+            original.load()
+            image = _clear_metadata(original)
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **({} if pil_format == 'PNG' else {'quality': 95}))
+    except Exception as e:
+        logger.warning(f"Could not strip metadata from {getattr(upload, 'name', 'upload')}: {str(e)}")
+        upload.seek(0)
+        return upload
+    return SimpleUploadedFile(
+        os.path.basename(upload.name or 'image'), buffer.getvalue(), content_type=getattr(upload, 'content_type', None),
+    )
+
+
+def _render_local(value, source):
+    from PIL import Image
+
+    with value.storage.open(value.name, 'rb') as f:
+        original = Image.open(f)
+        original.load()
+    original = _clear_metadata(original)
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if original.mode in ('LA', 'P', 'PA') else 'RGB')
+
+    from .models import ImageRendition
+
+    stem = os.path.splitext(value.name)[0]
+    rows = []
+    for size, width in RENDITION_WIDTHS.items():
+        resized = original.copy()
+        resized.thumbnail((width, width), Image.Resampling.LANCZOS)
+        for fmt, pil_format in FORMATS.items():
+            image = resized
+            if pil_format == 'JPEG' and image.mode == 'RGBA':
+                # JPEG has no alpha channel: flatten onto white
+                image = Image.new('RGB', resized.size, (255, 255, 255))
+                image.paste(resized, mask=resized.split()[-1])
+            buffer = BytesIO()
+            image.save(buffer, pil_format, quality=_quality(), optimize=True)
+            name = f'renditions/{stem}/{size}.{fmt}'
+            # Overwrite the previous rendition instead of saving a suffixed copy
+            value.storage.delete(name)
+            name = value.storage.save(name, ContentFile(buffer.getvalue()))
+            rows.append(ImageRendition(
+                source=source, size=size, format=fmt, name=name, url=value.storage.url(name),
+                width=image.width, height=image.height, bytes=buffer.tell(),
+            ))
+    return rows
+
+
+def _render_cloudinary(value, source):
+    import cloudinary.uploader
+
+    from .models import ImageRendition
+
+    specs = [(size, width, fmt) for size, width in RENDITION_WIDTHS.items() for fmt in FORMATS]
+    result = cloudinary.uploader.explicit(
+        value.public_id,
+        type=getattr(value, 'type', None) or 'upload',
+        eager=[
+            {'width': width, 'height': width, 'crop': 'limit', 'quality': 'auto',
+             'format': 'jpg' if fmt == 'jpeg' else fmt}
+            for _, width, fmt in specs
+        ],
+    )
+    return [
+        ImageRendition(
+            source=source, size=size, format=fmt, url=derived['secure_url'],
+            width=derived.get('width') or width, height=derived.get('height') or width,
+            bytes=derived.get('bytes') or 0,
+        )
+        for (size, width, fmt), derived in zip(specs, result.get('eager', []))
+    ]
+
+
+def make_renditions(value):
+    """
+    Make every rendition of the uploaded file ``value`` (a field value from
+    one of IMAGE_FIELDS) and return the unsaved ``ImageRendition`` rows, or an
+    empty list if the file could not be processed. Touches storage only, not
+    the database, so it is safe on worker threads.
+    """
+    source = source_name(value)
+    if not source:
+        return []
+    try:
+        if getattr(value, 'public_id', None):
+            return _render_cloudinary(value, source)
+        return _render_local(value, source)
+    except Exception as e:
+        logger.warning(f"Could not create renditions of {source}: {str(e)}")
+        return []
+
+
+def save_renditions(source, rows):
+    """Replace the recorded renditions of ``source`` with ``rows``, and the old ones' files"""
+    from .models import ImageRendition
+
+    old = ImageRendition.objects.filter(source=source)
+    kept = {row.name for row in rows}
+    for name in old.exclude(name='').values_list('name', flat=True):
+        if name not in kept:
+            default_storage.delete(name)
+    with transaction.atomic():
+        old.delete()
+        ImageRendition.objects.bulk_create(rows)
+    RENDITIONS.delete(_cache_key(source))
+
+
+def generate_renditions(value):
+    """Make and record every rendition of ``value``; returns the rows"""
+    rows = make_renditions(value)
+    if rows:
+        save_renditions(source_name(value), rows)
+    return rows
+
+
+def queue_renditions(value, on_ready=None):
+    """
+    Make and record the renditions of ``value`` once the current transaction
+    commits, then call ``on_ready()`` if they were made
+    """
+    after_commit(_render, value, on_ready, setting='IMAGE_RENDITIONS_IN_BACKGROUND')
+
+
+def _render(value, on_ready):
+    if generate_renditions(value) and on_ready:
+        on_ready()
+
+
+def renditions_for(value):
+    """``{(size, format): {'url', 'width', 'height'}}`` for an uploaded file, cached"""
+    from .models import ImageRendition
+
+    source = source_name(value)
+    if not source:
+        return {}
+    key = _cache_key(source)
+    found = RENDITIONS.get(key)
+    if found is None:
+        found = {
+            (row.size, row.format): {'url': row.url, 'width': row.width, 'height': row.height}
+            for row in ImageRendition.objects.filter(source=source)
+        }
+        RENDITIONS.set(key, found)
+    return found
@@ -1,12 +1,146 @@
 # listings/signals.py
-from django.db.models.signals import post_save
+from functools import partial
+
+from django.core.files import File
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Cart
+from django.utils import timezone
+from homabay_souq.conditional import bump_collection
+
+from .fragments import LISTING_FRAGMENTS, bump_fragments
+from .models import Cart, Order, OrderItem
+from .order_index import sync_order_status, sync_seller_orders
+from .renditions import IMAGE_FIELDS, queue_renditions, source_name, strip_metadata
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
 def create_user_cart(sender, instance, created, **kwargs):
     if created:
-        Cart.objects.create(user=instance)
\ No newline at end of file
+        Cart.objects.create(user=instance)
+
+
+def _image_fields(model):
+    return [field for label, field in IMAGE_FIELDS if label == model._meta.label]
+
+
+def remember_image_sources(sender, instance, **kwargs):
+    # Deferred fields stay deferred; a new instance has nothing rendered yet
+    instance._rendition_sources = {
+        field: source_name(instance.__dict__[field])
+        for field in _image_fields(sender)
+        if instance.pk is not None and field in instance.__dict__
+    }
+
+
+def strip_new_images(sender, instance, **kwargs):
+    """Drop the metadata of images uploaded in this save before storage sees them"""
+    for field in _image_fields(sender):
+        value = instance.__dict__.get(field)
+        if isinstance(value, FieldFile):
+            if value and not value._committed:
+                value.file = strip_metadata(value.file)
+        elif isinstance(value, File):
+            # Not wrapped yet, or a CloudinaryField, which holds the upload until it sends it
+            instance.__dict__[field] = strip_metadata(value)
+
+
+def render_new_images(sender, instance, **kwargs):
+    """Queue renditions for every image field whose file changed in this save"""
+    remembered = getattr(instance, '_rendition_sources', {})
+    for field in _image_fields(sender):
+        if field not in instance.__dict__:
+            continue
+        value = getattr(instance, field)
+        source = source_name(value)
+        if source and source != remembered.get(field):
+            queue_renditions(value, partial(renditions_ready, sender, instance))
+        remembered[field] = source
+    instance._rendition_sources = remembered
+
+
+def renditions_ready(sender, instance):
+    """
+    Retire the cached card markup, pages and validators that were rendered
+    with ``instance``'s original image while its renditions were being made
+    """
+    stamp = next((f.name for f in sender._meta.concrete_fields if f.name in ('date_updated', 'updated_at')), None)
+    if stamp:
+        sender._default_manager.filter(pk=instance.pk).update(**{stamp: timezone.now()})
+    label = sender._meta.label
+    if label in COLLECTIONS:
+        bump_model_collection(sender, instance)
+    elif label == 'blog.BlogPost':
+        bump_collection('blog')
+
+
+for label in dict.fromkeys(label for label, _ in IMAGE_FIELDS):
+    post_init.connect(remember_image_sources, sender=label, dispatch_uid=f'remember_image_sources:{label}')
+    pre_save.connect(strip_new_images, sender=label, dispatch_uid=f'strip_new_images:{label}')
+    post_save.connect(render_new_images, sender=label, dispatch_uid=f'render_new_images:{label}')
+
+
+def retire_listing_fragments(sender, **kwargs):
+    # Card markup shows category and store names
+    bump_fragments(LISTING_FRAGMENTS)
+
+
+for sender in ('listings.Category', 'storefront.Store'):
+    post_save.connect(retire_listing_fragments, sender=sender, dispatch_uid=f'retire_listing_fragments:save:{sender}')
+    post_delete.connect(retire_listing_fragments, sender=sender, dispatch_uid=f'retire_listing_fragments:delete:{sender}')
+
+
+# Collections behind the conditional GET validators of public pages
+COLLECTIONS = {
+    'listings.Listing': 'listings',
+    'listings.ListingImage': 'listings',
+    'listings.Category': 'listings',
+    'listings.FAQ': 'listings',
+    'listings.Review': 'reviews',
+    'reviews.Review': 'reviews',
+    'storefront.Store': 'stores',
+}
+
+
+# Per-object collections, which tag the anonymous page cache's entries
+OBJECT_COLLECTIONS = {
+    'listings.Listing': lambda obj: [f'listing:{obj.pk}', f'store:{obj.store_id}', f'category:{obj.category_id}'],
+    'listings.ListingImage': lambda obj: [f'listing:{obj.listing_id}'],
+    'listings.Category': lambda obj: [f'category:{obj.pk}'],
+    'listings.FAQ': lambda obj: [f'listing:{obj.listing_id}'],
+    'listings.Review': lambda obj: [f'listing:{obj.listing_id}'],
+    'storefront.Store': lambda obj: [f'store:{obj.pk}'],
+}
+
+
+def bump_model_collection(sender, instance, **kwargs):
+    label = sender._meta.label
+    objects = OBJECT_COLLECTIONS.get(label, lambda obj: [])(instance)
+    bump_collection(COLLECTIONS[label], *(name for name in objects if not name.endswith(':None')))
+
+
+for sender in COLLECTIONS:
+    post_save.connect(bump_model_collection, sender=sender, dispatch_uid=f'bump_model_collection:save:{sender}')
+    post_delete.connect(bump_model_collection, sender=sender, dispatch_uid=f'bump_model_collection:delete:{sender}')
+
+
+@receiver(post_init, sender=Order)
+def remember_indexed_status(sender, instance, **kwargs):
+    if 'status' in instance.__dict__:
+        instance._indexed_status = instance.status if instance.pk is not None else None
+
+
+@receiver(post_save, sender=Order)
+def index_order_status(sender, instance, created, **kwargs):
+    """Copy a changed order status onto the order's seller-order rows"""
+    if not created and instance.status != getattr(instance, '_indexed_status', None):
+        sync_order_status(instance)
+    instance._indexed_status = instance.status
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def index_order_items(sender, instance, **kwargs):
+    sync_seller_orders([instance.order_id])
@@ -34,11 +34,6 @@ def get_item(value, key):
     except (KeyError, IndexError, AttributeError, TypeError):
         return 0
 
-@register.filter
-def user_is_seller(order_items, user):
-    """Check if user is seller of any item in order"""
-    return order_items.filter(listing__seller=user).exists()
-
 @register.filter
 def mod(value, arg):
     """Returns the modulo of value and arg"""
@@ -0,0 +1,62 @@
+from django import template
+
+from listings.fragments import PrefetchedFragments
+
+register = template.Library()
+
+RENDER_CONTEXT_KEY = 'prefetched_fragments'
+
+
+def _prefetched(context):
+    if RENDER_CONTEXT_KEY not in context.render_context:
+        context.render_context[RENDER_CONTEXT_KEY] = PrefetchedFragments()
+    return context.render_context[RENDER_CONTEXT_KEY]
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_fragments(context, objects, *names, via=None):
+    """
+    Fetch the cached ``names`` fragments of every object in ``objects`` with
+    one cache round-trip, ahead of the loop that renders them. ``via`` names
+    an attribute holding the object, e.g. ``via='listing'`` for favourites.
+
+        {% prefetch_fragments listings 'browse-image' 'browse-body' %}
+    """
+    objects = [getattr(obj, via) if via else obj for obj in objects]
+    _prefetched(context).fetch(names, [obj for obj in objects if obj is not None and obj.pk is not None])
+    return ''
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, obj):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        obj = self.obj.resolve(context)
+        if obj is None or getattr(obj, 'pk', None) is None:
+            return self.nodelist.render(context)
+        prefetched = _prefetched(context)
+        html = prefetched.get(name, obj)
+        if html is None:
+            html = self.nodelist.render(context)
+            prefetched.set(name, obj, html)
+        return html
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    Cache the enclosed markup for ``obj`` until it is saved again. The markup
+    must not depend on the user (no CSRF tokens, favourites or cart state).
+
+        {% fragment 'browse-body' listing %}...{% endfragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and an object")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
@@ -0,0 +1,72 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from listings.renditions import FORMATS, RENDITION_WIDTHS, renditions_for
+
+register = template.Library()
+
+# How wide each size is displayed, for the browser to pick from the srcset
+DEFAULT_SIZES = {
+    'thumb': '80px',
+    'card': '(max-width: 576px) 50vw, 240px',
+    'detail': '(max-width: 992px) 100vw, 600px',
+}
+
+
+def _srcset(renditions, fmt, largest):
+    entries = []
+    for size in RENDITION_WIDTHS:
+        rendition = renditions.get((size, fmt))
+        if rendition:
+            entries.append(f"{rendition['url']} {rendition['width']}w")
+        if size == largest:
+            break
+    return ', '.join(entries)
+
+
+@register.simple_tag
+def responsive_image(image, size='card', fallback='', sizes=None, **attrs):
+    """
+    Render an uploaded image at ``size`` ('thumb', 'card' or 'detail') as a
+    ``<picture>`` with WebP and JPEG ``srcset``s up to that size, plus the
+    rendition's width and height so the page does not shift as it loads.
+
+    Images without renditions are rendered as a plain ``<img>`` of the
+    original, or of ``fallback`` (e.g. ``listing.get_image_url``).
+    Other keyword arguments (``alt``, ``class``, ...) become ``<img>`` attributes.
+
+        {% responsive_image listing.image 'card' fallback=listing.get_image_url alt=listing.title class="item-image" %}
+    """
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    renditions = renditions_for(image)
+    main = renditions.get((size, 'jpeg'))
+    if not main:
+        url = fallback
+        if not url and image:
+            try:
+                url = image.url
+            except Exception:
+                url = ''
+        return format_html(
+            '<img src="{}"{}>', url,
+            format_html_join('', ' {}="{}"', attrs.items()),
+        )
+
+    sizes = sizes or DEFAULT_SIZES.get(size, '100vw')
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, _srcset(renditions, fmt, size), sizes) for fmt in FORMATS if fmt != 'jpeg' and (size, fmt) in renditions),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        sources, main['url'], _srcset(renditions, 'jpeg', size), sizes, main['width'], main['height'],
+        format_html_join('', ' {}="{}"', attrs.items()),
+    )
+
+
+@register.filter
+def rendition_url(image, size='detail'):
+    """URL of the JPEG rendition of ``image`` at ``size``, or '' when there is none"""
+    rendition = renditions_for(image).get((size, 'jpeg'))
+    return rendition['url'] if rendition else ''
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import BlogPost
+from chats.models import Conversation, Message
+from listings.models import Category, Listing
+from storefront.models import Store
+
+User = get_user_model()
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+@override_settings(CACHE_SHARED=True)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.store = Store.objects.create(owner=self.seller, name='Shop', slug='shop')
+        self.category = Category.objects.create(name='Phones')
+        self.listing = Listing.objects.create(
+            title='Phone', price=Decimal('100.00'), description='Test', seller=self.seller,
+            store=self.store, category=self.category, stock=3,
+        )
+
+    def revalidate(self, url, response, **extra):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **extra)
+
+    def test_listing_page_is_not_modified_until_it_changes(self):
+        url = reverse('listing-detail', args=[self.listing.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        # Answered before the view runs: no listing, review or seller queries
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.price = Decimal('90.00')
+            self.listing.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_per_process_cache_sends_every_page_in_full(self):
+        url = reverse('listing-detail', args=[self.listing.pk])
+        first = self.client.get(url)
+        self.assertFalse(first.has_header('ETag'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"x"').status_code, 200)
+
+    def test_related_collections_change_the_validators(self):
+        url = reverse('storefront:product_detail', args=['shop', self.listing.slug])
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Listing.objects.create(
+                title='Charger', price=Decimal('5.00'), description='Test', seller=self.seller,
+                store=self.store, category=self.category, stock=3,
+            )
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_signed_in_pages_are_always_sent_in_full(self):
+        self.client.force_login(self.seller)
+        url = reverse('storefront:store_detail', args=['shop'])
+        response = self.client.get(url)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"anything"').status_code, 200)
+
+    def test_browse_json_is_validated_for_everyone(self):
+        self.client.force_login(self.seller)
+        url = reverse('all-listings')
+        first = self.client.get(url, **AJAX)
+        self.assertEqual(first.json()['total_count'], 1)
+        self.assertEqual(self.revalidate(url, first, **AJAX).status_code, 304)
+        # The HTML at the same URL is a different representation
+        self.assertNotIn('ETag', self.client.get(url))
+
+    def test_inbox_json_changes_with_new_messages(self):
+        buyer = User.objects.create_user(username='buyer', password='testpass123')
+        conversation = Conversation.objects.create()
+        with self.captureOnCommitCallbacks(execute=True):
+            conversation.participants.add(buyer, self.seller)
+        self.client.force_login(buyer)
+        url = reverse('inbox')
+        first = self.client.get(url, **AJAX)
+        self.assertEqual(self.revalidate(url, first, **AJAX).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(conversation=conversation, sender=self.seller, content='Hello')
+        second = self.revalidate(url, first, **AJAX)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['conversations'][0]['unread_count'], 1)
+
+    def test_not_modified_blog_post_still_counts_the_view(self):
+        post = BlogPost.objects.create(title='Market day', content='Text', author=self.seller, status='published')
+        url = reverse('blog:post-detail', args=[post.slug])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        # Counting the first view did not retire the validators
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 2)
@@ -0,0 +1,143 @@
+import time
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from homabay_souq.conditional import VERSIONS, Validators, conditional_page
+from homabay_souq.db_router import (
+    PIN_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, replica_configured, replica_reads,
+)
+from homabay_souq.page_cache import cache_anonymous_page, tag_page
+from listings.models import Category, Listing
+
+User = get_user_model()
+
+
+@mock.patch('homabay_souq.db_router.replica_configured', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_go_to_the_replica_only_inside_replica_reads(self, configured):
+        self.assertEqual(self.router.db_for_read(Listing), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Listing), 'replica')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+        self.assertEqual(self.router.db_for_read(Listing), 'default')
+
+    def test_a_write_sends_the_rest_of_the_block_to_the_primary(self, configured):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Listing), 'default')
+            self.assertEqual(self.router.db_for_read(Listing), 'default')
+
+
+@mock.patch('homabay_souq.db_router.replica_configured', return_value=True)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def run_request(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(Listing)
+            if write:
+                self.router.db_for_write(Listing)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen['read'], response
+
+    def test_whitelisted_views_read_from_the_replica(self, configured):
+        factory = RequestFactory()
+        self.assertEqual(self.run_request(factory.get(reverse('all-listings')))[0], 'replica')
+        self.assertEqual(self.run_request(factory.get(reverse('view_cart')))[0], 'default')
+
+    def test_writes_pin_the_visitor_to_the_primary(self, configured):
+        factory = RequestFactory()
+        _, response = self.run_request(factory.post(reverse('view_cart')), write=True)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.READ_REPLICA_PIN_SECONDS)
+
+        pinned = factory.get(reverse('all-listings'))
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.run_request(pinned)[0], 'default')
+
+
+@mock.patch('homabay_souq.db_router.replica_configured', return_value=True)
+@override_settings(CACHE_SHARED=True, PAGE_CACHE_ENABLED=True, READ_REPLICA_MAX_LAG_SECONDS=10)
+class ReplicaLagTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def setUp(self):
+        cache.clear()
+        self.reads = []
+
+    def record_read(self, request):
+        self.reads.append(self.router.db_for_read(Listing))
+        return HttpResponse('page')
+
+    def get(self, view):
+        request = RequestFactory().get(reverse('all-listings'))
+        request.user = AnonymousUser()
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_cached_pages_of_just_changed_collections_render_from_the_primary(self, configured):
+        view = cache_anonymous_page('listings')(self.record_read)
+        VERSIONS.set('listings', time.time() - 1, None)
+        self.assertEqual(self.get(view)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.get(view)['X-Page-Cache'], 'hit')
+        self.assertEqual(self.reads, ['default'])
+
+        VERSIONS.set('listings', time.time() - 60, None)
+        self.get(view)
+        self.assertEqual(self.reads, ['default', 'replica'])
+
+    def test_replica_renders_of_just_changed_view_tags_are_not_cached(self, configured):
+        def view(request):
+            VERSIONS.set('listing:1', time.time(), None)
+            tag_page(request, 'listing:1')
+            return self.record_read(request)
+
+        view = cache_anonymous_page('listings')(view)
+        VERSIONS.set('listings', time.time() - 60, None)
+        self.get(view)
+        self.get(view)
+        self.assertEqual(self.reads, ['replica', 'replica'])
+
+    def test_validated_pages_of_just_changed_collections_render_from_the_primary(self, configured):
+        version = time.time() - 1
+        view = conditional_page(lambda request: Validators(version, modified=[version]))(self.record_read)
+        self.assertTrue(self.get(view).has_header('ETag'))
+
+        version = time.time() - 60
+        self.get(view)
+        self.assertEqual(self.reads, ['default', 'replica'])
+
+
+@unittest.skipUnless(replica_configured(), 'needs DATABASE_REPLICA_URL, e.g. a second SQLite file')
+@override_settings(PAGE_CACHE_ENABLED=False)
+class ReplicaIntegrationTests(TransactionTestCase):
+    databases = {'default', 'replica'} if replica_configured() else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create_user(username='seller', password='testpass123')
+        Listing.objects.create(
+            title='Primary only phone', price=Decimal('100.00'), description='Test', seller=seller,
+            category=Category.objects.create(name='Phones'), stock=3,
+        )
+
+    def test_browse_reads_the_replica_until_the_visitor_writes(self):
+        # The test replica is a separate, unreplicated database
+        self.assertFalse(Listing.objects.using('replica').exists())
+        self.assertNotContains(self.client.get(reverse('all-listings')), 'Primary only phone')
+
+        self.client.cookies[PIN_COOKIE] = '1'
+        self.assertContains(self.client.get(reverse('all-listings')), 'Primary only phone')
@@ -0,0 +1,162 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from listings.dispute_utils import DisputeManager
+from listings.escrow_release import release_backlog, release_due_escrows
+from listings.fulfilment import confirm_delivery, ship_items
+from listings.models import (
+    Activity, Category, Escrow, EscrowPayout, EscrowReleaseRun, Listing, Order, OrderItem, SellerOrder,
+)
+from listings.order_presentation import present_orders
+from notifications.models import Notification
+from storefront.models import Store
+
+User = get_user_model()
+
+
+@override_settings(ORDER_SIDE_EFFECTS_IN_BACKGROUND=False)
+class EscrowReleaseTestCase(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.category = Category.objects.create(name='Phones')
+        self.listings = []
+        for index in range(2):
+            seller = User.objects.create_user(username=f'seller{index}', email=f'seller{index}@test.com', password='testpass123')
+            store = Store.objects.create(name=f'Store {index}', owner=seller, slug=f'store-{index}')
+            self.listings.append(Listing.objects.create(
+                title=f'Item {index}', description='Test', price=Decimal('50.00'),
+                seller=seller, store=store, category=self.category, stock=10,
+            ))
+        self.now = timezone.now()
+
+    def _escrow(self, due_in_days, status='held', listings=None):
+        order = Order.objects.create(user=self.buyer, total_price=Decimal('0'), status='shipped')
+        for listing in listings or self.listings:
+            OrderItem.objects.create(order=order, listing=listing, quantity=2, price=listing.price)
+        return Escrow.objects.create(
+            order=order, amount=Decimal('200.00'), status=status,
+            auto_release_date=self.now + timedelta(days=due_in_days),
+        )
+
+    def test_releases_only_due_held_escrows(self):
+        due = self._escrow(-2)
+        later = self._escrow(3)
+        disputed = self._escrow(-2, status='disputed')
+        unscheduled = Escrow.objects.create(
+            order=Order.objects.create(user=self.buyer, total_price=Decimal('0')), amount=Decimal('0'),
+        )
+
+        run = release_due_escrows(self.now)
+
+        self.assertEqual(run.released, 1)
+        self.assertEqual(run.payouts, 2)
+        self.assertIsNotNone(run.finished_at)
+        self.assertGreaterEqual(run.max_lag_seconds, timedelta(days=2).total_seconds())
+        self.assertEqual(run.mean_lag_seconds(), run.max_lag_seconds)
+        statuses = dict(Escrow.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {
+            due.pk: 'released', later.pk: 'held', disputed.pk: 'disputed', unscheduled.pk: 'held',
+        })
+        self.assertEqual(
+            set(EscrowPayout.objects.values_list('escrow_id', 'seller_id', 'amount', 'reason')),
+            {(due.pk, listing.seller_id, Decimal('100.00'), 'auto_release') for listing in self.listings},
+        )
+        self.assertEqual(Activity.objects.filter(action__contains=f'Order #{due.order_id}').count(), 3)
+        self.assertEqual(
+            set(Notification.objects.filter(title='Funds released').values_list('recipient_id', flat=True)),
+            {listing.seller_id for listing in self.listings},
+        )
+
+        self.assertEqual(release_due_escrows(self.now).released, 0)
+
+    def test_auto_released_order_is_delivered_and_paid_once(self):
+        escrow = self._escrow(-1)
+        order = escrow.order
+        release_due_escrows(self.now)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+        self.assertIsNotNone(order.delivered_at)
+        self.assertEqual(set(SellerOrder.objects.filter(order=order).values_list('status', flat=True)), {'delivered'})
+        [presented] = present_orders(Order.objects.filter(pk=order.pk), self.buyer)
+        self.assertFalse(presented.actions.can_confirm)
+        self.assertFalse(presented.actions.can_dispute)
+
+        # A buyer holding the page from before the release
+        order.status = 'shipped'
+        with self.assertRaises(ValidationError):
+            confirm_delivery(order, self.buyer)
+        with self.assertRaises(ValidationError):
+            DisputeManager.create_dispute(order, 'item_not_received', 'Never arrived')
+        self.assertEqual(Escrow.objects.get(pk=escrow.pk).status, 'released')
+        self.assertEqual(
+            sorted(EscrowPayout.objects.values_list('seller_id', flat=True)),
+            sorted(listing.seller_id for listing in self.listings),
+        )
+
+    def test_confirmation_pays_only_held_escrows(self):
+        escrow = self._escrow(3, status='disputed')
+        self.assertEqual(confirm_delivery(escrow.order, self.buyer), {})
+        self.assertEqual(Escrow.objects.get(pk=escrow.pk).status, 'disputed')
+        self.assertFalse(EscrowPayout.objects.exists())
+
+    def test_batches_cost_the_same_whatever_their_size(self):
+        for _ in range(2):
+            self._escrow(-1, listings=self.listings[:1])
+        with CaptureQueriesContext(connection) as small:
+            release_due_escrows(self.now, batch_size=10)
+
+        for _ in range(6):
+            self._escrow(-1)
+        with CaptureQueriesContext(connection) as large:
+            release_due_escrows(self.now, batch_size=10)
+        self.assertEqual(len(large), len(small))
+
+    def test_runs_in_bounded_batches(self):
+        for days in range(5):
+            self._escrow(-days - 1)
+
+        run = release_due_escrows(self.now, batch_size=2, max_batches=2)
+        self.assertEqual((run.released, run.batches), (4, 2))
+        self.assertEqual(release_backlog(self.now)[0], 1)
+        # Oldest first, so the one left is the most recently due
+        self.assertEqual(Escrow.objects.get(status='held').auto_release_date, self.now - timedelta(days=1))
+
+        run = release_due_escrows(self.now, batch_size=2)
+        self.assertEqual((run.released, run.batches), (1, 1))
+        self.assertEqual(release_backlog(self.now), (0, None))
+        self.assertEqual(EscrowReleaseRun.objects.count(), 2)
+
+    def test_last_shipment_schedules_auto_release(self):
+        order = Order.objects.create(user=self.buyer, total_price=Decimal('0'), status='paid')
+        for listing in self.listings:
+            OrderItem.objects.create(order=order, listing=listing, quantity=1, price=listing.price)
+        escrow = Escrow.objects.create(order=order, amount=Decimal('100.00'))
+
+        ship_items(order, self.listings[0].seller)
+        escrow.refresh_from_db()
+        self.assertIsNone(escrow.auto_release_date)
+
+        with override_settings(ESCROW_AUTO_RELEASE_DAYS=3):
+            ship_items(order, self.listings[1].seller)
+        escrow.refresh_from_db()
+        self.assertAlmostEqual(
+            escrow.auto_release_date, order.shipped_at + timedelta(days=3), delta=timedelta(seconds=1),
+        )
+
+    def test_command_reports_backlog_and_run(self):
+        self._escrow(-1)
+        out = StringIO()
+        call_command('release_escrow', stdout=out)
+        self.assertIn('Backlog: 1 escrows due', out.getvalue())
+        self.assertIn('Released: 1 escrows in 1 batches, 2 seller payouts', out.getvalue())
+        self.assertEqual(Escrow.objects.get().status, 'released')
@@ -0,0 +1,105 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from homabay_souq.cache import get_cache
+from listings.fragments import PrefetchedFragments
+from listings.models import Category, Listing
+from storefront.models import Store
+
+User = get_user_model()
+
+
+# The whole anonymous page would otherwise be served before any fragment is looked at
+@override_settings(PAGE_CACHE_ENABLED=False)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.store = Store.objects.create(owner=self.seller, name='Lakeside Shop', slug='lakeside')
+        self.category = Category.objects.create(name='Phones')
+        self.listings = [
+            Listing.objects.create(
+                title=f'Phone {n}', price=Decimal('100.00'), description='Test', seller=self.seller,
+                store=self.store, category=self.category, stock=3,
+            )
+            for n in range(4)
+        ]
+
+    def render_browse(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('all-listings'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def test_cards_render_from_cache_on_the_next_request(self):
+        first, cold_queries = self.render_browse()
+        second, warm_queries = self.render_browse()
+        self.assertEqual(first.count('Lakeside Shop'), second.count('Lakeside Shop'))
+        self.assertIn('Phone 3', second)
+        # Category and store lookups per card are skipped on a hit
+        self.assertLess(warm_queries, cold_queries)
+
+    def test_page_is_fetched_with_one_round_trip(self):
+        self.render_browse()
+        fragments = get_cache()
+        with patch.object(fragments, 'get_many', wraps=fragments.get_many) as get_many, \
+                patch.object(fragments, 'set_many') as cache_set:
+            self.render_browse()
+        fragment_calls = [call for call in get_many.call_args_list if call.args[0][0].startswith('fragment:')]
+        self.assertEqual(len(fragment_calls), 1)
+        # Every card and the version came back in that call; nothing was re-rendered
+        self.assertEqual(len(fragment_calls[0].args[0]), 3 * len(self.listings) + 1)
+        cache_set.assert_not_called()
+
+    def test_saving_a_listing_retires_its_card(self):
+        self.render_browse()
+        listing = self.listings[0]
+        listing.title = 'Renamed phone'
+        listing.save()
+        html, _ = self.render_browse()
+        self.assertIn('Renamed phone', html)
+
+    def test_renaming_a_category_or_store_retires_every_card(self):
+        self.render_browse()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Mobiles'
+            self.category.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.name = 'Shoreline Shop'
+            self.store.save()
+        html, _ = self.render_browse()
+        self.assertIn('Mobiles', html)
+        self.assertIn('Shoreline Shop', html)
+        self.assertNotIn('Lakeside Shop', html)
+
+    def test_user_specific_markup_is_not_cached(self):
+        self.render_browse()
+        buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.client.force_login(buyer)
+        html, _ = self.render_browse()
+        self.assertIn('Add to Cart', html)
+        self.assertIn('csrfmiddlewaretoken', html)
+
+    def test_store_tiles_are_cached_until_the_store_changes(self):
+        prefetched = PrefetchedFragments()
+        prefetched.fetch(['store-tile'], [self.store])
+        self.assertIsNone(prefetched.get('store-tile', self.store))
+        prefetched.set('store-tile', self.store, '<div>tile</div>')
+
+        again = PrefetchedFragments()
+        again.fetch(['store-tile'], [self.store])
+        self.assertEqual(again.get('store-tile', self.store), '<div>tile</div>')
+
+        self.store.description = 'Now with delivery'
+        self.store.save()
+        response = self.client.get(reverse('storefront:store_list'))
+        self.assertContains(response, 'Lakeside Shop')
+        self.assertNotContains(response, '<div>tile</div>')
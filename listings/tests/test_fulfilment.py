@@ -0,0 +1,113 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from listings.fulfilment import confirm_delivery, ship_items
+from listings.models import Activity, Category, Escrow, EscrowPayout, Listing, Order, OrderItem, SellerOrder
+from notifications.models import Notification
+from storefront.models import Store
+
+User = get_user_model()
+
+
+@override_settings(ORDER_SIDE_EFFECTS_IN_BACKGROUND=False)
+class FulfilmentTestCase(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.category = Category.objects.create(name='Phones')
+
+    def _order(self, seller_count, items_per_seller=1, status='paid'):
+        order = Order.objects.create(user=self.buyer, total_price=Decimal('0'), status=status, phone_number='0712345678')
+        sellers = []
+        for index in range(seller_count):
+            seller = User.objects.create(username=f'seller{order.pk}-{index}', email=f's{order.pk}-{index}@test.com')
+            store = Store.objects.create(name=f'Store {order.pk}-{index}', owner=seller, slug=f'store-{order.pk}-{index}')
+            listing = Listing.objects.create(
+                title=f'Item {index}', description='Test', price=Decimal('50.00'),
+                seller=seller, store=store, category=self.category, stock=10,
+            )
+            for _ in range(items_per_seller):
+                OrderItem.objects.create(order=order, listing=listing, quantity=2, price=listing.price)
+            sellers.append(seller)
+        Escrow.objects.create(order=order, amount=Decimal('0'))
+        return order, sellers
+
+    def _ship_queries(self, order, seller):
+        with self.captureOnCommitCallbacks(execute=False):
+            with CaptureQueriesContext(connection) as queries:
+                ship_items(order, seller, 'TRACK1')
+        return len(queries)
+
+    def test_shipping_costs_the_same_for_any_number_of_sellers_and_items(self):
+        small, small_sellers = self._order(2)
+        large, large_sellers = self._order(20, items_per_seller=3)
+        self.assertEqual(self._ship_queries(large, large_sellers[0]), self._ship_queries(small, small_sellers[0]))
+
+    def test_last_seller_completes_the_order(self):
+        order, sellers = self._order(3, items_per_seller=2)
+        for seller in sellers[:2]:
+            shipment = ship_items(order, seller)
+            self.assertFalse(shipment.complete)
+            self.assertEqual(shipment.shipped_items, 2)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'partially_shipped')
+
+        shipment = ship_items(order, sellers[2], 'TRACK9')
+        self.assertTrue(shipment.complete)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'shipped')
+        self.assertIsNotNone(order.shipped_at)
+        self.assertEqual(
+            set(SellerOrder.objects.filter(order=order).values_list('shipped', 'status')),
+            {(True, 'shipped')},
+        )
+        self.assertEqual(set(order.order_items.filter(listing__seller=sellers[2]).values_list('tracking_number', flat=True)), {'TRACK9'})
+
+        with self.assertRaises(ValidationError):
+            ship_items(order, sellers[0])
+
+    def test_side_effects_wait_for_commit(self):
+        order, sellers = self._order(3)
+        with patch('listings.fulfilment.notify_order_shipped') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                ship_items(order, sellers[0], 'TRACK1')
+                notify.assert_not_called()
+        notify.assert_called_once()
+        # Two sellers left, within the reminder threshold
+        self.assertEqual(
+            set(Notification.objects.filter(title='Action required: Ship items').values_list('recipient_id', flat=True)),
+            {sellers[1].pk, sellers[2].pk},
+        )
+
+        with patch('listings.fulfilment.create_delivery_request', return_value={
+            'success': True, 'tracking_number': 'DLV-1', 'driver': {},
+        }) as delivery, patch('listings.fulfilment.notify_order_shipped'):
+            with self.captureOnCommitCallbacks(execute=True):
+                ship_items(order, sellers[1])
+                ship_items(order, sellers[2])
+        delivery.assert_called_once()
+        order.refresh_from_db()
+        self.assertEqual(order.tracking_number, 'DLV-1')
+
+    def test_confirm_delivery_releases_escrow_per_seller(self):
+        order, sellers = self._order(3, items_per_seller=2, status='shipped')
+        with patch('listings.fulfilment.notify_delivery_confirmed') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                payouts = confirm_delivery(order, self.buyer)
+
+        self.assertEqual(payouts, {seller.pk: Decimal('200.00') for seller in sellers})
+        self.assertEqual(Escrow.objects.get(order=order).status, 'released')
+        self.assertEqual(
+            set(EscrowPayout.objects.values_list('seller_id', 'amount', 'reason')),
+            {(seller.pk, Decimal('200.00'), 'delivery_confirmed') for seller in sellers},
+        )
+        self.assertEqual(Activity.objects.filter(action__contains=f'Order #{order.pk}').count(), 4)
+        self.assertEqual({call.args[0] for call in notify.call_args_list}, set(sellers))
+
+        with self.assertRaises(ValidationError):
+            confirm_delivery(order, self.buyer)
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from listings.gallery import queue_gallery_uploads, staged_files
+from listings.models import Category, ImageRendition, Listing, ListingImage
+from storefront.models import Store
+
+User = get_user_model()
+
+
+def photo(name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (900, 600), (200, 30, 30)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class GalleryUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.staging_root = tempfile.mkdtemp()
+        for path in (self.media_root, self.staging_root):
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            GALLERY_STAGING_ROOT=self.staging_root,
+            GALLERY_BACKGROUND_UPLOADS=False,
+            GALLERY_UPLOAD_WORKERS=3,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.store = Store.objects.create(owner=self.seller, name='Shop', slug='shop')
+        self.category = Category.objects.create(name='Phones')
+        self.listing = Listing.objects.create(
+            title='Phone', price=Decimal('100.00'), description='Test', seller=self.seller,
+            store=self.store, category=self.category, stock=1,
+        )
+
+    def test_product_create_stages_gallery_and_uploads_after_commit(self):
+        self.client.login(username='seller', password='testpass123')
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('storefront:product_create', args=['shop']), {
+                'title': 'Camera', 'description': 'Nice', 'price': '250.00', 'category': self.category.pk,
+                'location': 'HB_Town', 'condition': 'used', 'delivery_option': 'pickup', 'stock': 1,
+                'images': [photo('a.jpg'), photo('b.jpg'), photo('c.jpg')],
+            })
+        self.assertEqual(response.status_code, 302)
+        listing = Listing.objects.get(title='Camera')
+
+        # Nothing uploaded within the request
+        self.assertFalse(listing.gallery_ready)
+        self.assertEqual(listing.images.count(), 0)
+        self.assertEqual(len(staged_files(listing.pk)), 3)
+
+        for callback in callbacks:
+            callback()
+
+        listing.refresh_from_db()
+        self.assertTrue(listing.gallery_ready)
+        images = list(listing.images.order_by('order'))
+        self.assertEqual([image.order for image in images], [0, 1, 2])
+        self.assertEqual([os.path.basename(image.image.name) for image in images], ['a.jpg', 'b.jpg', 'c.jpg'])
+        self.assertEqual(ImageRendition.objects.filter(source=images[0].image.name).count(), 6)
+        self.assertEqual(staged_files(listing.pk), [])
+
+    def test_invalid_files_are_rejected_up_front(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            failed = queue_gallery_uploads(self.listing, [
+                photo(), SimpleUploadedFile('notes.txt', b'hello', content_type='text/plain'),
+            ])
+        self.assertEqual(failed, [{'name': 'notes.txt', 'error': 'Invalid file type'}])
+        self.assertEqual(self.listing.images.count(), 1)
+
+    def test_leftover_staged_files_are_picked_up_by_the_command(self):
+        # The request staged the files but its worker never ran
+        queue_gallery_uploads(self.listing, [photo('left.jpg'), photo('over.jpg')])
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.gallery_ready)
+
+        call_command('process_gallery_uploads', older_than=0, stdout=open(os.devnull, 'w'))
+
+        self.listing.refresh_from_db()
+        self.assertTrue(self.listing.gallery_ready)
+        self.assertEqual(self.listing.images.count(), 2)
+        self.assertEqual(staged_files(self.listing.pk), [])
+
+    def test_failed_uploads_stay_staged_for_the_command(self):
+        with mock.patch('django.core.files.storage.FileSystemStorage.save', side_effect=OSError('storage down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                queue_gallery_uploads(self.listing, [photo('retry.jpg')])
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.gallery_ready)
+        self.assertEqual(len(staged_files(self.listing.pk)), 1)
+
+        call_command('process_gallery_uploads', older_than=0, stdout=open(os.devnull, 'w'))
+        self.listing.refresh_from_db()
+        self.assertTrue(self.listing.gallery_ready)
+        self.assertEqual(self.listing.images.count(), 1)
+
+    def test_direct_uploads_are_off_without_cloudinary(self):
+        self.client.login(username='seller', password='testpass123')
+        response = self.client.get(reverse('gallery-upload-signature', args=[self.listing.pk]))
+        self.assertEqual(response.status_code, 404)
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_login(other)
+        response = self.client.post(reverse('attach-gallery-uploads', args=[self.listing.pk]), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(ListingImage.objects.exists())
@@ -0,0 +1,118 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from listings.models import Category, Listing, Order, OrderItem, SellerOrder
+from listings.order_index import get_order_page, order_counts, rebuild_seller_orders
+from storefront.models import Store
+
+User = get_user_model()
+
+
+class SellerOrderIndexTestCase(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.seller1 = User.objects.create_user(username='seller1', email='seller1@test.com', password='testpass123')
+        self.seller2 = User.objects.create_user(username='seller2', email='seller2@test.com', password='testpass123')
+        self.category = Category.objects.create(name='Phones')
+        self.listing1 = self._listing(self.seller1, Decimal('100.00'))
+        self.listing2 = self._listing(self.seller2, Decimal('150.00'))
+
+    def _listing(self, seller, price):
+        store = Store.objects.create(name=f'{seller.username} store', owner=seller, slug=f'{seller.username}-store')
+        return Listing.objects.create(
+            title=f'{seller.username} item', description='Test', price=price,
+            seller=seller, store=store, category=self.category, stock=10,
+        )
+
+    def _order(self, user=None, status='paid', age_minutes=0):
+        order = Order.objects.create(user=user or self.buyer, total_price=Decimal('0'), status=status)
+        if age_minutes:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=age_minutes))
+            order.refresh_from_db()
+        return order
+
+    def test_items_maintain_seller_rows(self):
+        order = self._order()
+        OrderItem.objects.create(order=order, listing=self.listing1, quantity=2, price=Decimal('100.00'))
+
+        row = SellerOrder.objects.get(order=order, seller=self.seller1)
+        self.assertEqual((row.item_count, row.subtotal, row.status), (1, Decimal('200.00'), 'paid'))
+        self.assertTrue(row.sole_seller)
+        self.assertFalse(row.shipped)
+
+        second = OrderItem.objects.create(order=order, listing=self.listing2, quantity=1, price=Decimal('150.00'))
+        row.refresh_from_db()
+        self.assertFalse(row.sole_seller)
+        self.assertEqual(SellerOrder.objects.get(order=order, seller=self.seller2).subtotal, Decimal('150.00'))
+
+        second.delete()
+        row.refresh_from_db()
+        self.assertTrue(row.sole_seller)
+        self.assertFalse(SellerOrder.objects.filter(order=order, seller=self.seller2).exists())
+
+    def test_shipping_and_status_changes_reach_the_index(self):
+        order = self._order()
+        item = OrderItem.objects.create(order=order, listing=self.listing1, quantity=1, price=Decimal('100.00'))
+        item.shipped = True
+        item.save()
+        order.status = 'shipped'
+        order.save()
+
+        row = SellerOrder.objects.get(order=order, seller=self.seller1)
+        self.assertEqual(row.shipped_count, 1)
+        self.assertTrue(row.shipped)
+        self.assertEqual(row.status, 'shipped')
+
+    def test_rebuild_matches_maintained_rows(self):
+        order = self._order()
+        OrderItem.objects.create(order=order, listing=self.listing1, quantity=1, price=Decimal('100.00'))
+        OrderItem.objects.create(order=order, listing=self.listing2, quantity=3, price=Decimal('150.00'))
+        maintained = set(SellerOrder.objects.values_list('order_id', 'seller_id', 'subtotal', 'sole_seller'))
+
+        SellerOrder.objects.all().delete()
+        self.assertEqual(rebuild_seller_orders(batch_size=1), 1)
+        self.assertEqual(set(SellerOrder.objects.values_list('order_id', 'seller_id', 'subtotal', 'sole_seller')), maintained)
+
+    def test_keyset_pages_merge_purchases_and_sales(self):
+        expected = []
+        for minutes in range(5):
+            sale = self._order(age_minutes=minutes * 2)
+            OrderItem.objects.create(order=sale, listing=self.listing1, quantity=1, price=Decimal('100.00'))
+            purchase = self._order(user=self.seller1, age_minutes=minutes * 2 + 1)
+            OrderItem.objects.create(order=purchase, listing=self.listing2, quantity=1, price=Decimal('150.00'))
+            expected += [sale.pk, purchase.pk]
+
+        seen, cursor = [], None
+        while True:
+            orders, cursor = get_order_page(self.seller1, cursor=cursor, limit=3)
+            seen += [order.pk for order in orders]
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(order_counts(self.seller1), (5, 5))
+
+        sales, _ = get_order_page(self.seller1, role='seller', limit=10)
+        self.assertTrue(all(order.seller_order.seller_id == self.seller1.pk for order in sales))
+        with self.assertNumQueries(2):
+            get_order_page(self.seller1, role='seller', limit=10)
+
+    def test_seller_orders_page_lists_only_sole_seller_orders(self):
+        own = self._order()
+        OrderItem.objects.create(order=own, listing=self.listing1, quantity=1, price=Decimal('100.00'))
+        shared = self._order()
+        OrderItem.objects.create(order=shared, listing=self.listing1, quantity=1, price=Decimal('100.00'))
+        OrderItem.objects.create(order=shared, listing=self.listing2, quantity=1, price=Decimal('150.00'))
+
+        self.client.login(username='seller1', password='testpass123')
+        response = self.client.get(reverse('seller_orders'))
+        self.assertEqual([order.pk for order in response.context['orders']], [own.pk])
+        self.assertEqual(response.context['total_orders_count'], 1)
+
+        response = self.client.get(reverse('order_list'), {'role': 'seller'})
+        self.assertEqual({order.pk for order in response.context['orders']}, {own.pk, shared.pk})
+        self.assertEqual(response.context['seller_orders_count'], 2)
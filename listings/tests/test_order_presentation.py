@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from listings.models import Category, Escrow, Listing, Order, OrderItem, Payment
+from listings.order_presentation import present_orders
+from storefront.models import Store
+
+User = get_user_model()
+
+
+class OrderPresentationTestCase(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.category = Category.objects.create(name='Phones')
+        self.sellers = [
+            User.objects.create_user(username=f'seller{i}', email=f'seller{i}@test.com', password='testpass123')
+            for i in range(3)
+        ]
+        self.listings = []
+        for seller in self.sellers:
+            store = Store.objects.create(name=f'{seller.username} store', owner=seller, slug=f'{seller.username}-store')
+            self.listings.append(Listing.objects.create(
+                title=f'{seller.username} item', description='Test', price=Decimal('100.00'),
+                seller=seller, store=store, category=self.category, stock=10,
+            ))
+
+    def _order(self, listings, status='paid'):
+        order = Order.objects.create(user=self.buyer, total_price=Decimal('0'), status=status)
+        for listing in listings:
+            OrderItem.objects.create(order=order, listing=listing, quantity=2, price=listing.price)
+        Payment.objects.create(order=order, amount=Decimal('0'))
+        Escrow.objects.create(order=order, amount=Decimal('0'))
+        return order
+
+    def _queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_roles_subtotals_and_actions(self):
+        order = self._order(self.listings)
+        seller = self.sellers[1]
+
+        [as_seller] = present_orders(Order.objects.filter(pk=order.pk), seller)
+        self.assertFalse(as_seller.is_buyer)
+        self.assertTrue(as_seller.is_seller)
+        self.assertEqual([item.listing for item in as_seller.visible_items], [self.listings[1]])
+        self.assertEqual(as_seller.my_subtotal, Decimal('200.00'))
+        self.assertTrue(as_seller.actions.can_ship)
+        self.assertFalse(as_seller.actions.can_confirm)
+
+        [as_buyer] = present_orders(Order.objects.filter(pk=order.pk), self.buyer)
+        self.assertTrue(as_buyer.is_buyer)
+        self.assertEqual(len(as_buyer.visible_items), 3)
+        self.assertEqual(as_buyer.seller_subtotals, [(s, Decimal('200.00')) for s in self.sellers])
+        self.assertFalse(as_buyer.actions.can_ship)
+
+        OrderItem.objects.filter(order=order, listing=self.listings[1]).update(shipped=True)
+        [shipped] = present_orders(Order.objects.filter(pk=order.pk), seller)
+        self.assertFalse(shipped.actions.can_ship)
+
+    def test_order_pages_cost_the_same_whatever_the_items(self):
+        self.client.login(username='buyer', password='testpass123')
+        small = self._order(self.listings[:1])
+        detail_small = self._queries(reverse('order_detail', args=[small.pk]))
+        list_small = self._queries(reverse('order_list'))
+
+        large = self._order(self.listings)
+        for _ in range(3):
+            self._order(self.listings)
+        self.assertEqual(self._queries(reverse('order_detail', args=[large.pk])), detail_small)
+        self.assertEqual(self._queries(reverse('order_list')), list_small)
+
+    def test_seller_sees_only_their_items(self):
+        order = self._order(self.listings)
+        self.client.login(username='seller2', password='testpass123')
+
+        response = self.client.get(reverse('order_detail', args=[order.pk]))
+        self.assertEqual([item.listing for item in response.context['order_items']], [self.listings[2]])
+        self.assertEqual(response.context['seller_specific_total'], Decimal('200.00'))
+        self.assertTrue(response.context['can_ship'])
+
+        outsider = User.objects.create_user(username='outsider', email='outsider@test.com', password='testpass123')
+        self.client.force_login(outsider)
+        self.assertRedirects(
+            self.client.get(reverse('order_detail', args=[order.pk])),
+            reverse('order_list'), fetch_redirect_response=False,
+        )
@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from homabay_souq.page_cache import CSRF_PLACEHOLDER, normalized_query
+from listings.models import Category, Listing
+from storefront.models import Store
+
+User = get_user_model()
+
+
+@override_settings(CACHE_SHARED=True)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.store = Store.objects.create(owner=self.seller, name='Lakeside Shop', slug='lakeside')
+        self.other_store = Store.objects.create(
+            owner=User.objects.create_user(username='other', password='testpass123'), name='Hill Shop', slug='hill',
+        )
+        self.category = Category.objects.create(name='Phones')
+        self.listing = Listing.objects.create(
+            title='Phone', price=Decimal('100.00'), description='Test', seller=self.seller,
+            store=self.store, category=self.category, stock=3,
+        )
+
+    def test_normalized_query_ignores_order_blanks_and_tracking(self):
+        self.assertEqual(
+            normalized_query(QueryDict('sort_by=newest&q=&category=2&utm_source=mail&fbclid=x')),
+            'category=2&sort_by=newest',
+        )
+
+    def test_repeat_anonymous_visit_is_served_from_cache(self):
+        url = reverse('all-listings')
+        first = self.client.get(url, {'category': self.category.pk})
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertIn(f'listing-{self.listing.pk}', first['Surrogate-Key'].split())
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'category': self.category.pk, 'q': '', 'utm_source': 'sms'})
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertIn('Phone', second.content.decode())
+
+    def test_cached_forms_carry_the_visitors_own_csrf_token(self):
+        url = reverse('storefront:store_detail', args=['lakeside'])
+        self.client.get(url)
+        self.client.cookies.clear()
+        response = self.client.get(url)
+        html = response.content.decode()
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertNotIn(CSRF_PLACEHOLDER, html)
+        self.assertIn('csrfmiddlewaretoken', html)
+        self.assertIn('csrftoken', response.cookies)
+        # Forms with tokens must not be shared by a CDN
+        self.assertNotIn('Surrogate-Control', response)
+
+    def test_saves_purge_only_the_pages_tagged_with_them(self):
+        this_store = reverse('storefront:store_detail', args=['lakeside'])
+        other_store = reverse('storefront:store_detail', args=['hill'])
+        self.client.get(this_store)
+        self.client.get(other_store)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = 'Renamed phone'
+            self.listing.save()
+
+        response = self.client.get(this_store)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertIn('Renamed phone', response.content.decode())
+        self.assertEqual(self.client.get(other_store)['X-Page-Cache'], 'hit')
+
+    @override_settings(CACHE_SHARED=False)
+    def test_per_process_cache_is_never_used(self):
+        response = self.client.get(reverse('storefront:store_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertNotIn('Surrogate-Key', response)
+
+    def test_signed_in_visitors_bypass_the_cache(self):
+        url = reverse('storefront:store_list')
+        self.client.get(url)
+        self.client.force_login(self.seller)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Page-Cache', response)
@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from listings.models import Category, ImageRendition, Listing
+from listings.renditions import generate_renditions
+
+User = get_user_model()
+
+
+def photo(width=2000, height=1500, orientation=None):
+    """A noisy JPEG, as a phone would upload it, optionally with an EXIF orientation"""
+    image = Image.effect_noise((width, height), 64).convert('RGB')
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif.tobytes())
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_RENDITIONS_IN_BACKGROUND=False)
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.category = Category.objects.create(name='Phones')
+
+    def make_listing(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Listing.objects.create(
+                title='Phone', price=Decimal('100.00'), description='Test', seller=self.seller,
+                category=self.category, stock=1, image=image,
+            )
+
+    def test_renditions_wait_for_commit_and_retire_the_original(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            listing = Listing.objects.create(
+                title='Phone', price=Decimal('100.00'), description='Test', seller=self.seller,
+                category=self.category, stock=1, image=photo(),
+            )
+        self.assertFalse(ImageRendition.objects.exists())
+        html = Template("{% load image_tags %}{% responsive_image listing.image 'card' %}").render(
+            Context({'listing': listing})
+        )
+        self.assertIn(f'src="{listing.image.url}"', html)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(ImageRendition.objects.filter(source=listing.image.name).count(), 6)
+        self.assertGreater(Listing.objects.get(pk=listing.pk).date_updated, listing.date_updated)
+
+    def test_upload_creates_small_metadata_free_renditions(self):
+        upload = photo()
+        listing = self.make_listing(upload)
+
+        renditions = {(r.size, r.format): r for r in ImageRendition.objects.filter(source=listing.image.name)}
+        self.assertEqual(len(renditions), 6)
+        card = renditions[('card', 'jpeg')]
+        self.assertEqual((card.width, card.height), (480, 360))
+        self.assertEqual(renditions[('detail', 'webp')].width, 1200)
+        self.assertLess(card.bytes, upload.size / 10)
+
+        with Image.open(f'{self.media_root}/{card.name}') as stored:
+            self.assertEqual(stored.size, (480, 360))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_original_is_stored_upright_without_metadata(self):
+        listing = self.make_listing(photo(orientation=6))
+        with Image.open(f'{self.media_root}/{listing.image.name}') as stored:
+            self.assertEqual(stored.size, (1500, 2000))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_regenerating_replaces_the_rendition_files(self):
+        listing = self.make_listing(photo())
+        first = set(ImageRendition.objects.values_list('name', flat=True))
+        generate_renditions(listing.image)
+        self.assertEqual(set(ImageRendition.objects.values_list('name', flat=True)), first)
+        directory = os.path.dirname(f'{self.media_root}/{next(iter(first))}')
+        self.assertEqual(len(os.listdir(directory)), 6)
+
+    def test_orientation_is_applied_before_resizing(self):
+        # Orientation 6: the camera was rotated, so the picture is really portrait
+        listing = self.make_listing(photo(orientation=6))
+        thumb = ImageRendition.objects.get(source=listing.image.name, size='thumb', format='jpeg')
+        self.assertEqual((thumb.width, thumb.height), (120, 160))
+
+    def test_small_images_are_not_enlarged(self):
+        listing = self.make_listing(photo(300, 200))
+        detail = ImageRendition.objects.get(source=listing.image.name, size='detail', format='webp')
+        self.assertEqual((detail.width, detail.height), (300, 200))
+
+    def test_renditions_only_made_when_the_file_changes(self):
+        listing = self.make_listing(photo())
+        listing = Listing.objects.get(pk=listing.pk)
+        listing.title = 'Renamed phone'
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.save()
+        self.assertEqual(ImageRendition.objects.count(), 6)
+
+        listing.image = photo(800, 800)
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.save()
+        self.assertEqual(ImageRendition.objects.filter(source=listing.image.name).count(), 6)
+
+    def test_undecodable_upload_is_kept_without_renditions(self):
+        listing = self.make_listing(SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg'))
+        self.assertTrue(listing.image)
+        self.assertFalse(ImageRendition.objects.exists())
+
+    def test_template_tag_emits_srcset_and_dimensions(self):
+        listing = self.make_listing(photo())
+        html = Template(
+            "{% load image_tags %}{% responsive_image listing.image 'card' alt=listing.title class='item-image' %}"
+        ).render(Context({'listing': listing}))
+
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('160w', html)
+        self.assertIn('480w', html)
+        self.assertNotIn('1200w', html)
+        self.assertIn('width="480" height="360"', html)
+        self.assertIn('alt="Phone"', html)
+        self.assertIn('class="item-image"', html)
+
+    def test_template_tag_falls_back_to_the_original(self):
+        listing = self.make_listing(None)
+        html = Template(
+            "{% load image_tags %}{% responsive_image listing.image fallback='/static/placeholder.svg' alt='x' %}"
+        ).render(Context({'listing': listing}))
+        self.assertEqual(html, '<img src="/static/placeholder.svg" alt="x" loading="lazy" decoding="async">')
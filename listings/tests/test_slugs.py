@@ -0,0 +1,84 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from blog.models import BlogPost
+from homabay_souq import slugs
+from listings.models import Category, Listing
+from storefront.models import Store
+
+User = get_user_model()
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.category = Category.objects.create(name='Phones')
+
+    def make_listing(self, title):
+        return Listing.objects.create(
+            title=title, price=Decimal('100.00'), description='Test', seller=self.seller,
+            category=self.category, stock=1,
+        )
+
+    def test_duplicate_titles_get_increasing_suffixes(self):
+        self.assertEqual(self.make_listing('iPhone 12').slug, 'iphone-12')
+        self.assertEqual(self.make_listing('iPhone 12 Pro').slug, 'iphone-12-pro')
+        self.assertEqual(self.make_listing('iPhone 12').slug, 'iphone-12-1')
+        self.assertEqual(self.make_listing('iphone 12!').slug, 'iphone-12-2')
+
+    def test_free_slug_is_used_even_when_numbered_ones_exist(self):
+        self.make_listing('iPhone 12')
+        self.assertEqual(self.make_listing('iPhone').slug, 'iphone')
+        self.assertEqual(self.make_listing('iPhone').slug, 'iphone-13')
+
+    def test_titles_ending_in_digits_do_not_take_the_plain_slug(self):
+        self.assertEqual(self.make_listing('Galaxy 5').slug, 'galaxy-5')
+        self.assertEqual(self.make_listing('Galaxy').slug, 'galaxy')
+        self.assertEqual(self.make_listing('Galaxy 5').slug, 'galaxy-5-1')
+
+    def test_next_suffix_found_with_one_query(self):
+        self.make_listing('iPhone 12')
+        Listing.objects.filter(pk=self.make_listing('iPhone 12').pk).update(slug='iphone-12-7')
+        with self.assertNumQueries(1):
+            self.assertEqual(slugs.allocate_slug(Listing, 'iPhone 12'), 'iphone-12-8')
+
+    def test_long_titles_leave_room_for_a_suffix(self):
+        title = 'A very long listing title that goes well past fifty characters'
+        first = self.make_listing(title)
+        second = self.make_listing(title)
+        max_length = Listing._meta.get_field('slug').max_length
+        self.assertLessEqual(len(second.slug), max_length)
+        self.assertEqual(second.slug, f'{first.slug}-1')
+
+    def test_concurrent_create_retries_with_a_fresh_slug(self):
+        self.make_listing('iPhone 12')
+        real_allocate = slugs.allocate_slug
+        calls = []
+
+        def stale_then_real(*args, **kwargs):
+            calls.append(args)
+            # The first allocation sees the table before the other save committed
+            return 'iphone-12' if len(calls) == 1 else real_allocate(*args, **kwargs)
+
+        with mock.patch('homabay_souq.slugs.allocate_slug', side_effect=stale_then_real):
+            listing = self.make_listing('iPhone 12')
+        self.assertEqual(listing.slug, 'iphone-12-1')
+        self.assertEqual(len(calls), 2)
+
+    def test_stores_and_blog_posts_share_the_allocator(self):
+        first = Store.objects.create(owner=self.seller, name="Mama's Kitchen")
+        self.assertEqual(first.slug, 'mamas-kitchen')
+        other = User.objects.create_user(username='other', password='testpass123')
+        second = Store.objects.create(owner=other, name="Mama's Kitchen")
+        self.assertEqual(second.slug, 'mamas-kitchen-1')
+
+        posts = [BlogPost.objects.create(title='Market Day', content='...', author=self.seller) for _ in range(2)]
+        self.assertEqual([post.slug for post in posts], ['market-day', 'market-day-1'])
+
+    def test_explicit_slug_is_kept(self):
+        self.assertEqual(
+            Store.objects.create(owner=self.seller, name='Shop', slug='custom-slug').slug, 'custom-slug'
+        )
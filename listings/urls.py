@@ -14,6 +14,8 @@ urlpatterns = [
     path('listing/new/', ListingCreateView.as_view(), name='listing-create'),
     path('listing/<int:pk>/update/', ListingUpdateView.as_view(), name='listing-update'),
     path('listing/<int:pk>/delete/', ListingDeleteView.as_view(), name='listing-delete'),
+    path('listing/<int:pk>/gallery/signature/', views.gallery_upload_signature, name='gallery-upload-signature'),
+    path('listing/<int:pk>/gallery/attach/', views.attach_gallery_uploads, name='attach-gallery-uploads'),
     path('cart/add/<int:listing_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/', views.view_cart, name='view_cart'),
     path('cart/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
@@ -3,15 +3,23 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.utils.decorators import method_decorator
 from django.db.models import Q, Count, Avg, F
-from .models import Listing, Category, Favorite, Activity, RecentlyViewed, Review, Order, OrderItem, Cart, CartItem, Payment, Escrow, ListingImage
+from .models import Listing, Category, Favorite, Activity, RecentlyViewed, Review, Order, OrderItem, Cart, CartItem, Payment, Escrow, SellerOrder
 from .forms import ListingForm
+from .gallery import attach_direct_uploads, direct_upload_params, direct_uploads_enabled, queue_gallery_uploads
+from .order_index import get_order_page, order_counts
+from .order_presentation import present_orders
+from .fulfilment import confirm_delivery as fulfil_delivery, ship_items
 from storefront.models import Store
+from homabay_souq.conditional import Validators, collection_versions, conditional_page
+from homabay_souq.page_cache import cache_anonymous_page, tag_page
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.db.models import Q
@@ -19,9 +27,8 @@ from blog.models import BlogPost
 
 
 from notifications.utils import (
-    notify_new_order, notify_order_shipped, notify_order_delivered,
+    notify_new_order, notify_order_delivered,
     notify_payment_received, notify_listing_favorited, notify_new_review,
-    notify_delivery_assigned, notify_delivery_confirmed
 )
 
 
@@ -32,6 +39,7 @@ from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 
+@method_decorator(cache_anonymous_page('listings', 'stores', 'reviews', 'blog'), name='dispatch')
 class ListingListView(ListView):
     model = Listing
     template_name = 'listings/home.html'
@@ -143,8 +151,19 @@ class ListingListView(ListView):
 
         context['blog_posts'] = BlogPost.objects.filter(status="published").order_by('-published_at')[:3]
 
+        tag_page(self.request, *(f'listing:{listing.pk}' for listing in context['listings']))
         return context
 
+def listing_validators(request, pk):
+    """Validators for a listing page: the listing, and the listings and reviews around it"""
+    updated = Listing.objects.filter(pk=pk).values_list('date_updated', flat=True).first()
+    if updated is None:
+        return None
+    versions = collection_versions('listings', 'reviews')
+    return Validators('listing', pk, updated, versions, modified=[updated, *versions.values()])
+
+
+@method_decorator(conditional_page(listing_validators), name='dispatch')
 class ListingDetailView(DetailView):
     model = Listing
     template_name = 'listings/listing_detail.html'
@@ -333,15 +352,8 @@ class ListingCreateView(LoginRequiredMixin, CreateView):
             form.instance.image = self.request.FILES['image']
             form.instance.save()
 
-        # Handle multiple image uploads for gallery
-        images = self.request.FILES.getlist('images')
-        for image in images:
-            # Validate file type and size
-            if image.content_type.startswith('image/') and image.size <= 10 * 1024 * 1024:  # 10MB limit
-                ListingImage.objects.create(
-                    listing=form.instance,
-                    image=image
-                )
+        # Gallery images are validated and staged here, then uploaded in the background
+        failed_images = queue_gallery_uploads(form.instance, self.request.FILES.getlist('images'))
 
         # Create activity log
         Activity.objects.create(
@@ -349,7 +361,11 @@ class ListingCreateView(LoginRequiredMixin, CreateView):
             action=f"Created listing: {form.instance.title}"
         )
 
-        messages.success(self.request, "Listing created successfully!")
+        if failed_images:
+            err_msgs = '; '.join([f"{f['name']}: {f['error']}" for f in failed_images])
+            messages.warning(self.request, f"Listing created but some images were rejected: {err_msgs}")
+        else:
+            messages.success(self.request, "Listing created successfully!")
         return response
 
 class ListingUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
@@ -390,14 +406,8 @@ class ListingUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         
         response = super().form_valid(form)
         
-        # Handle multiple image uploads
-        images = self.request.FILES.getlist('images')
-        for image in images:
-            if image.content_type.startswith('image/') and image.size <= 10 * 1024 * 1024:
-                ListingImage.objects.create(
-                    listing=form.instance,
-                    image=image
-                )
+        # Gallery images are validated and staged here, then uploaded in the background
+        failed_images = queue_gallery_uploads(form.instance, self.request.FILES.getlist('images'))
         
         # Create activity log
         Activity.objects.create(
@@ -405,9 +415,36 @@ class ListingUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             action=f"Updated listing: {form.instance.title}"
         )
         
-        messages.success(self.request, "Listing updated successfully!")
+        if failed_images:
+            err_msgs = '; '.join([f"{f['name']}: {f['error']}" for f in failed_images])
+            messages.warning(self.request, f"Listing updated but some images were rejected: {err_msgs}")
+        else:
+            messages.success(self.request, "Listing updated successfully!")
         return response
         
+@login_required
+def gallery_upload_signature(request, pk):
+    """Signed parameters for uploading one gallery photo straight to Cloudinary"""
+    get_object_or_404(Listing, pk=pk, seller=request.user)
+    if not direct_uploads_enabled():
+        return JsonResponse({'error': 'Direct uploads are not enabled'}, status=404)
+    return JsonResponse(direct_upload_params())
+
+
+@login_required
+@require_POST
+def attach_gallery_uploads(request, pk):
+    """Attach photos uploaded with gallery_upload_signature to the listing"""
+    listing = get_object_or_404(Listing, pk=pk, seller=request.user)
+    if not direct_uploads_enabled():
+        return JsonResponse({'error': 'Direct uploads are not enabled'}, status=404)
+    try:
+        uploads = json.loads(request.body).get('uploads', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    return JsonResponse({'attached': attach_direct_uploads(listing, uploads)})
+
+
 class ListingDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Listing
     success_url = '/'
@@ -417,6 +454,13 @@ class ListingDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return self.request.user == listing.seller
 
 
+def browse_validators(request):
+    versions = collection_versions('listings', 'stores')
+    return Validators('all-listings', versions, modified=versions.values())
+
+
+@conditional_page(browse_validators)
+@cache_anonymous_page('listings', 'stores')
 def all_listings(request):
     # Get all active listings
     listings = Listing.objects.filter(is_active=True).order_by('-date_created')
@@ -470,6 +514,9 @@ def all_listings(request):
     paginator = Paginator(listings, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    tag_page(request, *(f'listing:{listing.pk}' for listing in page_obj))
+    if category_id and category_id.isdigit():
+        tag_page(request, f'category:{category_id}')
     
     # For AJAX requests, return JSON
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -1228,42 +1275,23 @@ def mpesa_debug_info(request):
 @login_required
 def order_list(request):
     """Show orders where user is either buyer or seller"""
-    # Get filter parameters
     status_filter = request.GET.get('status')
     role_filter = request.GET.get('role')
-    
-    # Base queries
-    buyer_orders = Order.objects.filter(user=request.user)
-    seller_orders = Order.objects.filter(order_items__listing__seller=request.user)
-    
-    # Apply status filter if provided
-    if status_filter and status_filter != 'all':
-        buyer_orders = buyer_orders.filter(status=status_filter)
-        seller_orders = seller_orders.filter(status=status_filter)
-    
-    # Apply role filter if provided
-    if role_filter == 'buyer':
-        all_orders = buyer_orders.distinct()
-    elif role_filter == 'seller':
-        all_orders = seller_orders.distinct()
-    else:
-        # Combine using union (proper way to combine distinct queries)
-        all_orders = buyer_orders.union(seller_orders).order_by('-created_at')
-    
-    # Ensure proper ordering
-    all_orders = all_orders.order_by('-created_at')
-    
-    # Get counts for display
-    buyer_orders_count = buyer_orders.count()
-    seller_orders_count = seller_orders.distinct().count()
-    
-    # Paginate
-    paginator = Paginator(all_orders, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
+    status = status_filter if status_filter and status_filter != 'all' else None
+
+    # Keyset pages over the buyer's orders and the seller-order index
+    orders, next_cursor = get_order_page(
+        request.user,
+        role=role_filter if role_filter in ('buyer', 'seller') else None,
+        status=status,
+        cursor=request.GET.get('cursor'),
+    )
+    buyer_orders_count, seller_orders_count = order_counts(request.user, status)
+
     context = {
-        'orders': page_obj,
+        'orders': present_orders(orders, request.user),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
         'status_filter': status_filter,
         'role_filter': role_filter,
         'buyer_orders_count': buyer_orders_count,
@@ -1276,36 +1304,30 @@ def order_list(request):
 @login_required
 def order_detail(request, order_id):
     """Order detail view that works for both buyers and sellers"""
-    order = get_object_or_404(Order, id=order_id)
-    
+    order = get_object_or_404(Order.objects.select_related('user'), id=order_id)
+    # Items, listings, sellers, payment and escrow in a fixed number of queries
+    order = present_orders([order], request.user)[0]
+
     # Check if user has permission to view this order
-    if order.user != request.user and not order.order_items.filter(listing__seller=request.user).exists():
+    if not order.is_buyer and not order.is_seller:
         messages.error(request, "You don't have permission to view this order.")
         return redirect('order_list')
-    
-    # Determine user's role in this order
-    is_buyer = order.user == request.user
-    is_seller = order.order_items.filter(listing__seller=request.user).exists()
-    
-    # Get items relevant to the user - FIXED FOR MULTI-SELLER
-    if is_seller and not is_buyer:
-        # Show only items that belong to this seller
-        order_items = order.order_items.filter(listing__seller=request.user)
-        seller_specific_total = sum(float(item.get_total_price()) for item in order_items)
+
+    # Sellers who are not the buyer see only their own items and total
+    if order.is_seller and not order.is_buyer:
+        seller_specific_total = order.my_subtotal
     else:
-        # Show all items for buyer or user who is both buyer and seller
-        order_items = order.order_items.all()
         seller_specific_total = order.total_price
-    
+
     context = {
         'order': order,
-        'order_items': order_items,
-        'is_buyer': is_buyer,
-        'is_seller': is_seller,
+        'order_items': order.visible_items,
+        'is_buyer': order.is_buyer,
+        'is_seller': order.is_seller,
         'seller_specific_total': seller_specific_total,  # Add this for seller view
-        'can_ship': is_seller and order.status == 'paid',
-        'can_confirm': is_buyer and order.status == 'shipped',
-        'can_dispute': is_buyer and order.status in ['shipped', 'delivered'],
+        'can_ship': order.actions.can_ship,
+        'can_confirm': order.actions.can_confirm,
+        'can_dispute': order.actions.can_dispute,
     }
     
     return render(request, 'listings/order_detail.html', context) # Seller views
@@ -1313,13 +1335,28 @@ def order_detail(request, order_id):
 @login_required
 def seller_orders(request):
     # By request: show only orders that contain items exclusively from this seller
-    # i.e. total order_items == order_items belonging to this seller
-    orders = Order.objects.annotate(
-        total_items=Count('order_items'),
-        seller_items=Count('order_items', filter=Q(order_items__listing__seller=request.user))
-    ).filter(total_items=F('seller_items')).order_by('-created_at')
+    status = request.GET.get('status') or None
+    orders, next_cursor = get_order_page(
+        request.user,
+        role='seller',
+        status=status,
+        cursor=request.GET.get('cursor'),
+        sole_seller=True,
+    )
+    counts = SellerOrder.objects.filter(seller=request.user, sole_seller=True).aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        disputed=Count('id', filter=Q(status='disputed')),
+    )
 
-    return render(request, 'listings/seller_orders.html', {'orders': orders})
+    return render(request, 'listings/seller_orders.html', {
+        'orders': present_orders(orders, request.user),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'total_orders_count': counts['total'],
+        'pending_orders_count': counts['pending'],
+        'disputed_orders_count': counts['disputed'],
+    })
 
 @login_required
 def mark_order_shipped(request, order_id):
@@ -1335,132 +1372,20 @@ def mark_order_shipped(request, order_id):
         messages.warning(request, "Only paid orders can be marked as shipped.")
         return redirect('seller_orders')
 
-    # Mark only the items that belong to this seller as shipped
-    seller_items = order.order_items.filter(listing__seller=request.user, shipped=False)
-    if not seller_items.exists():
+    # One UPDATE for this seller's items; notifications, reminders and the
+    # delivery request go out after commit
+    try:
+        shipment = ship_items(order, request.user, request.POST.get('tracking_number') or None)
+    except ValidationError:
         messages.info(request, "There are no unshipped items for this order belonging to you.")
         return redirect('seller_orders')
 
-    from django.utils import timezone
-    now = timezone.now()
-
-    for item in seller_items:
-        item.shipped = True
-        item.shipped_at = now
-        # Allow seller to provide a tracking number via POST (optional)
-        tracking_number = request.POST.get('tracking_number') or ''
-        if tracking_number:
-            item.tracking_number = tracking_number
-        item.save()
-
-    # If any items remain unshipped by other sellers, mark order as partially_shipped
-    remaining = order.order_items.filter(shipped=False)
-    if remaining.exists():
-        order.status = 'partially_shipped'
-        order.save()
-
-        # Notify buyer about the partial shipment by this seller
-        # Use the first tracking number if provided
-        first_tracking = seller_items.filter(tracking_number__isnull=False).first()
-        notify_order_shipped(order.user, request.user, order, first_tracking.tracking_number if first_tracking else None)
-
-        messages.success(request, f"Your items for Order #{order.id} have been marked as shipped. Waiting on other sellers to complete their shipments.")
-
-        # Remind remaining sellers when only a few are left
-        try:
-            from notifications.utils import NotificationService, create_notification
-            from django.conf import settings
-        except Exception:
-            NotificationService = None
-
-        remaining_sellers = set(item.listing.seller for item in remaining)
-        REMINDER_THRESHOLD = getattr(settings, 'SELLER_SHIPMENT_REMINDER_THRESHOLD', 2)
-
-        if NotificationService and 0 < len(remaining_sellers) <= REMINDER_THRESHOLD:
-            ns = NotificationService()
-            for seller in remaining_sellers:
-                # SMS reminder if configured
-                try:
-                    sms_msg = f"Order #{order.id} has most sellers shipped. Please mark your items as shipped so the buyer can receive their order."
-                    ns.send_sms(getattr(seller, 'phone_number', ''), sms_msg)
-                except Exception:
-                    logger.exception("Failed to send shipment reminder SMS")
-
-                # In-app/system notification
-                try:
-                    create_notification(
-                        recipient=seller,
-                        notification_type='system',
-                        title='Action required: Ship items',
-                        message=f'Order #{order.id} still has unshipped items assigned to you. Please mark them as shipped.',
-                        sender=request.user,
-                        related_object_id=order.id,
-                        related_content_type='order',
-                        action_url=reverse('order_detail', args=[order.id]),
-                        action_text='View Order'
-                    )
-                except Exception:
-                    logger.exception("Failed to create in-app shipment reminder")
-
-        # Activity log
-        Activity.objects.create(
-            user=request.user,
-            action=f"Order #{order.id} items marked as shipped (seller: {request.user.username})"
-        )
-
-        return redirect('seller_orders')
-
-    # If no remaining items, finalize order as shipped
-    order.status = 'shipped'
-    order.shipped_at = now
-    order.save()
-
-    # Consolidated delivery request for whole order (for single-seller orders this behaves as before)
-    delivery_response = _create_delivery_request(order)
-
-    tracking_number = None
-    if delivery_response and delivery_response.get('success'):
-        tracking_number = delivery_response.get('tracking_number')
-        driver_info = delivery_response.get('driver', {})
-
-        order.tracking_number = tracking_number or order.tracking_number
-        order.save()
-
-        # Notify buyer
-        notify_order_shipped(order.user, request.user, order, tracking_number)
-
-        if driver_info:
-            notify_delivery_assigned(order, driver_info.get('name', 'Delivery Partner'), driver_info.get('estimated_delivery', 'Soon'))
-
-        messages.success(request, f"Order #{order.id} marked as shipped. Tracking: {tracking_number}")
+    if shipment.complete:
+        messages.success(request, f"Order #{order.id} marked as shipped. Delivery is being arranged.")
     else:
-        # Notify buyer that order is shipped but delivery integration lacked tracking
-        notify_order_shipped(order.user, request.user, order, None)
-        messages.success(request, f"Order #{order.id} marked as shipped. Delivery system may not have provided tracking.")
-
-    Activity.objects.create(
-        user=request.user,
-        action=f"Order #{order.id} marked as shipped by {request.user.username}"
-    )
-
+        messages.success(request, f"Your items for Order #{order.id} have been marked as shipped. Waiting on other sellers to complete their shipments.")
     return redirect('seller_orders')
 
-def _create_delivery_request(order):
-    """Create delivery request in the delivery system"""
-    try:
-        try:
-            from integrations.delivery import DeliverySystemIntegration
-        except ImportError:
-            logger.error("DeliverySystemIntegration could not be imported. Delivery integration is unavailable.")
-            return None
-
-        delivery_integration = DeliverySystemIntegration()
-        return delivery_integration.create_delivery_from_order(order)
-        
-    except Exception as e:
-        logger.error(f"Delivery system integration failed: {str(e)}")
-        return None
-
 # Update confirm_delivery to notify seller
 @login_required
 def confirm_delivery(request, order_id):
@@ -1471,59 +1396,17 @@ def confirm_delivery(request, order_id):
         messages.warning(request, "This order has not been shipped yet or has already been delivered.")
         return redirect('order_detail', order_id=order.id)
     
-    # Update order status
-    order.status = 'delivered'
-    order.delivered_at = timezone.now()
-    order.save()
-    
-    # Release escrow funds to all sellers
-    _release_escrow_to_sellers(order)
-    
-    # Notify sellers about delivery confirmation and fund release
-    _notify_sellers_delivery_confirmed(order)
-    
-    # Create activity log
-    Activity.objects.create(
-        user=request.user,
-        action=f"Order #{order.id} delivered and confirmed"
-    )
+    # Marks the order delivered, releases escrow to all sellers and notifies
+    # them once committed
+    try:
+        fulfil_delivery(order, request.user)
+    except ValidationError:
+        messages.warning(request, "This order has not been shipped yet or has already been delivered.")
+        return redirect('order_detail', order_id=order.id)
     
     messages.success(request, "Thank you for confirming delivery! Funds have been released to the seller(s).")
     return redirect('order_detail', order_id=order.id)
 
-def _release_escrow_to_sellers(order):
-    """Release escrow funds to all sellers in the order"""
-    # Group order items by seller to handle multiple sellers
-    from collections import defaultdict
-    seller_amounts = defaultdict(float)
-    
-    for order_item in order.order_items.all():
-        seller = order_item.listing.seller
-        seller_amounts[seller] += float(order_item.get_total_price())
-    
-    # Release funds to each seller
-    for seller, amount in seller_amounts.items():
-        # In a real system, you'd actually transfer funds here
-        # For now, we'll just mark the escrow as released
-        logger.info(f"Releasing KSh {amount} to seller {seller.username} for order #{order.id}")
-    
-    # Update escrow status
-    order.escrow.status = 'released'
-    order.escrow.released_at = timezone.now()
-    order.escrow.save()
-
-def _notify_sellers_delivery_confirmed(order):
-    """Notify all sellers that delivery was confirmed and funds released"""
-    sellers = set(item.listing.seller for item in order.order_items.all())
-    
-    for seller in sellers:
-        notify_delivery_confirmed(seller, order.user, order)
-        
-        # Create activity log for seller
-        Activity.objects.create(
-            user=seller,
-            action=f"Delivery confirmed and funds released for Order #{order.id}"
-        )
 @login_required
 def create_dispute(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
@@ -1532,11 +1415,12 @@ def create_dispute(request, order_id):
         messages.warning(request, "You can only dispute orders that have been shipped or delivered.")
         return redirect('order_detail', order_id=order.id)
     
-    order.status = 'disputed'
-    order.save()
-    
-    order.escrow.status = 'disputed'
-    order.escrow.save()
+    with transaction.atomic():
+        if not Escrow.objects.filter(order_id=order.pk, status='held').update(status='disputed'):
+            messages.warning(request, "Funds for this order have already been released.")
+            return redirect('order_detail', order_id=order.id)
+        order.status = 'disputed'
+        order.save()
     
     # Create activity log
     Activity.objects.create(
@@ -4,7 +4,7 @@ from .models import Notification, NotificationPreference
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ['recipient', 'notification_type', 'title', 'is_read', 'created_at']
-    list_filter = ['notification_type', 'is_read', 'created_at']
+    list_filter = ['notification_type', 'is_read', 'is_summary', 'created_at']
     search_fields = ['recipient__username', 'title', 'message']
     readonly_fields = ['created_at']
     date_hierarchy = 'created_at'
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from notifications.retention import get_retention_settings, run_retention
+
+
+class Command(BaseCommand):
+    help = 'Finish interrupted clears, compact old read notifications, expire stale ones and enforce the per-user cap. Run periodically (e.g. nightly cron).'
+
+    def add_arguments(self, parser):
+        defaults = get_retention_settings()
+        parser.add_argument('--compact-after-days', type=int, default=defaults['compact_after_days'],
+                            help='Fold read notifications older than this into summary rows')
+        parser.add_argument('--retention-days', type=int, default=defaults['retention_days'],
+                            help='Delete notifications older than this')
+        parser.add_argument('--max-per-user', type=int, default=defaults['max_per_user'],
+                            help='Maximum non-summary notifications kept per user')
+        parser.add_argument('--batch-size', type=int, default=defaults['batch_size'],
+                            help='Rows removed per DELETE statement')
+
+    def handle(self, *args, **options):
+        stats = run_retention(
+            compact_after_days=options['compact_after_days'],
+            retention_days=options['retention_days'],
+            max_per_user=options['max_per_user'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished clearing {stats['cleared']}, compacted {stats['compacted']}, "
+            f"expired {stats['expired']}, trimmed {stats['capped']} notifications over the per-user cap."
+        ))
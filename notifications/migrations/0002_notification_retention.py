@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='is_summary',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='summary_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at'], name='notificatio_recipie_a972ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_summary', 'is_read', 'created_at'], name='notificatio_is_summ_8da1d4_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingNotificationClear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('up_to_id', models.PositiveBigIntegerField()),
+                ('requested_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_notification_clear', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -40,6 +40,10 @@ class Notification(models.Model):
     
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Retention: old read notifications are folded into one summary row per type
+    is_summary = models.BooleanField(default=False)
+    summary_count = models.PositiveIntegerField(default=0)
     
     # For action buttons/links
     action_url = models.CharField(max_length=500, blank=True)
@@ -49,6 +53,8 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', 'is_read', 'created_at']),
+            models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['is_summary', 'is_read', 'created_at']),
         ]
 
     def __str__(self):
@@ -78,6 +84,20 @@ class Notification(models.Model):
         return reverse('notification-detail', kwargs={'pk': self.pk})
 
 
+class PendingNotificationClear(models.Model):
+    """
+    A "clear all" still being carried out: every notification of ``user`` up
+    to ``up_to_id`` goes. Deleted once done; ``manage.py prune_notifications``
+    finishes any that a restarted worker left behind.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='pending_notification_clear')
+    up_to_id = models.PositiveBigIntegerField()
+    requested_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Clear notifications of {self.user.username} up to {self.up_to_id}"
+
+
 class NotificationPreference(models.Model):
     user = models.OneToOneField(
         User,
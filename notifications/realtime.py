@@ -0,0 +1,52 @@
+from django.db import transaction
+
+from homabay_souq.pubsub import publish
+from .models import Notification
+
+
+def user_channel(user_id):
+    """Broker channel carrying every live event for one user"""
+    return f'user.{user_id}'
+
+
+def push_to_user(user_id, event, data):
+    """Publish an event to a user's open tabs once the current transaction commits"""
+    message = {'event': event, 'data': data}
+    transaction.on_commit(lambda: publish(user_channel(user_id), message))
+
+
+def push_counter(user_id, name, delta=None, value=None):
+    """
+    Push a change to one of the badge counters ('notifications' or 'messages').
+
+    Pass ``delta`` for increments/decrements or ``value`` to set it outright.
+    """
+    data = {'name': name}
+    if value is not None:
+        data['value'] = value
+    else:
+        data['delta'] = delta
+    push_to_user(user_id, 'counter', data)
+
+
+def notification_payload(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'is_read': notification.is_read,
+        'time_since': notification.time_since,
+        'action_url': notification.action_url,
+        'action_text': notification.action_text,
+    }
+
+
+def get_counters(user):
+    """Current unread counts, read from the database (used for stream snapshots)"""
+    from chats.inbox import total_unread
+
+    return {
+        'notifications': Notification.objects.filter(recipient=user, is_read=False).count(),
+        'messages': total_unread(user),
+    }
@@ -0,0 +1,227 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from homabay_souq.background import after_commit
+
+from .models import Notification, PendingNotificationClear
+
+logger = logging.getLogger(__name__)
+
+
+def get_retention_settings():
+    """Return the retention knobs, falling back to conservative defaults"""
+    return {
+        'compact_after_days': getattr(settings, 'NOTIFICATION_COMPACT_AFTER_DAYS', 30),
+        'retention_days': getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 180),
+        'max_per_user': getattr(settings, 'NOTIFICATION_MAX_PER_USER', 500),
+        'batch_size': getattr(settings, 'NOTIFICATION_DELETE_BATCH_SIZE', 500),
+    }
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """
+    Delete the rows of ``queryset`` in primary-key chunks.
+
+    Each chunk is its own short DELETE so a huge history never holds a
+    long lock on the notifications table. Returns the number of rows deleted.
+    """
+    batch_size = batch_size or get_retention_settings()['batch_size']
+    pks_query = queryset.order_by().values_list('pk', flat=True)
+    total = 0
+    while True:
+        pks = list(pks_query[:batch_size])
+        if not pks:
+            break
+        deleted, _ = Notification.objects.filter(pk__in=pks).delete()
+        total += deleted
+        if len(pks) < batch_size:
+            break
+    return total
+
+
+def _summary_title(notification_type, count):
+    label = dict(Notification.NOTIFICATION_TYPES).get(notification_type, notification_type.replace('_', ' ').title())
+    noun = 'notification' if count == 1 else 'notifications'
+    return f"{count} older {label} {noun}"
+
+
+def compact_notifications(before, batch_size=None):
+    """
+    Fold read notifications created before ``before`` into one summary row
+    per (recipient, notification_type), then delete the originals in batches.
+
+    Returns the number of notifications compacted.
+    """
+    batch_size = batch_size or get_retention_settings()['batch_size']
+    candidates = Notification.objects.filter(is_summary=False, is_read=True, created_at__lt=before)
+    groups = (
+        candidates.values('recipient_id', 'notification_type')
+        .annotate(latest=Max('created_at'))
+        .order_by()
+    )
+
+    compacted = 0
+    for group in groups.iterator():
+        group_qs = candidates.filter(
+            recipient_id=group['recipient_id'],
+            notification_type=group['notification_type'],
+        )
+        pks_query = group_qs.order_by().values_list('pk', flat=True)
+        while True:
+            pks = list(pks_query[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                deleted, _ = Notification.objects.filter(pk__in=pks, is_read=True).delete()
+                if deleted:
+                    _add_to_summary(group['recipient_id'], group['notification_type'], deleted, group['latest'])
+            compacted += deleted
+            if len(pks) < batch_size:
+                break
+    return compacted
+
+
+def _add_to_summary(recipient_id, notification_type, count, latest):
+    """Create or grow the summary row for a recipient/type pair"""
+    summary = (
+        Notification.objects.select_for_update()
+        .filter(recipient_id=recipient_id, notification_type=notification_type, is_summary=True)
+        .first()
+    )
+    if summary is None:
+        summary = Notification.objects.create(
+            recipient_id=recipient_id,
+            notification_type=notification_type,
+            title='',
+            message='',
+            is_read=True,
+            is_summary=True,
+        )
+        summary_created = latest
+    else:
+        summary_created = max(summary.created_at, latest)
+
+    total = summary.summary_count + count
+    # created_at is auto_now_add, so position the summary with an UPDATE
+    Notification.objects.filter(pk=summary.pk).update(
+        summary_count=total,
+        title=_summary_title(notification_type, total),
+        message=f"Older notifications up to {latest:%d %b %Y} were combined to keep your history short.",
+        created_at=summary_created,
+    )
+
+
+def expire_notifications(before, batch_size=None):
+    """Delete every notification (summaries included) created before ``before``"""
+    return delete_in_batches(Notification.objects.filter(created_at__lt=before), batch_size)
+
+
+def enforce_user_cap(max_per_user=None, batch_size=None):
+    """
+    Trim each recipient's non-summary history down to ``max_per_user`` rows,
+    dropping the oldest first. Returns the number of notifications deleted.
+    """
+    config = get_retention_settings()
+    max_per_user = max_per_user or config['max_per_user']
+    batch_size = batch_size or config['batch_size']
+
+    over_cap = (
+        Notification.objects.filter(is_summary=False)
+        .values('recipient_id')
+        .annotate(total=Count('id'))
+        .filter(total__gt=max_per_user)
+        .order_by()
+    )
+
+    deleted = 0
+    for row in over_cap.iterator():
+        history = Notification.objects.filter(
+            recipient_id=row['recipient_id'], is_summary=False
+        ).order_by('-created_at', '-id')
+        while True:
+            pks = list(history.values_list('pk', flat=True)[max_per_user:max_per_user + batch_size])
+            if not pks:
+                break
+            batch_deleted, _ = Notification.objects.filter(pk__in=pks).delete()
+            deleted += batch_deleted
+    return deleted
+
+
+def run_retention(now=None, compact_after_days=None, retention_days=None,
+                  max_per_user=None, batch_size=None):
+    """
+    Finish any interrupted "clear all", then apply the full retention policy:
+    compaction, then the age cap, then the per-user count cap. Returns a dict
+    of how many rows each step touched.
+    """
+    config = get_retention_settings()
+    now = now or timezone.now()
+    compact_after_days = compact_after_days or config['compact_after_days']
+    retention_days = retention_days or config['retention_days']
+
+    stats = {
+        'cleared': resume_pending_clears(batch_size),
+        'compacted': compact_notifications(now - timedelta(days=compact_after_days), batch_size),
+        'expired': expire_notifications(now - timedelta(days=retention_days), batch_size),
+        'capped': enforce_user_cap(max_per_user, batch_size),
+    }
+    logger.info(f"Notification retention run: {stats}")
+    return stats
+
+
+def finish_clear(user_id, batch_size=None):
+    """
+    Delete what is left of a user's pending "clear all" and drop its marker.
+    Returns the number of notifications deleted.
+    """
+    pending = PendingNotificationClear.objects.filter(user_id=user_id).first()
+    if pending is None:
+        return 0
+    deleted = delete_in_batches(
+        Notification.objects.filter(recipient_id=user_id, pk__lte=pending.up_to_id), batch_size
+    )
+    # A newer "clear all" may have raised the bound meanwhile; its own job finishes it
+    PendingNotificationClear.objects.filter(pk=pending.pk, up_to_id=pending.up_to_id).delete()
+    return deleted
+
+
+def resume_pending_clears(batch_size=None):
+    """Finish every pending "clear all"; returns the number of notifications deleted"""
+    user_ids = list(PendingNotificationClear.objects.values_list('user_id', flat=True))
+    return sum(finish_clear(user_id, batch_size) for user_id in user_ids)
+
+
+def _clear_remaining(user_id, batch_size):
+    deleted = finish_clear(user_id, batch_size)
+    logger.info(f"Background clear removed {deleted} notifications for user {user_id}")
+
+
+def clear_all_for_user(user, batch_size=None):
+    """
+    Clear a user's notifications without one unbounded DELETE.
+
+    Only notifications that exist now are cleared; any that arrive while the
+    clear runs are kept. The first batch is removed inline so small histories
+    disappear at once. Anything left over is recorded as a
+    ``PendingNotificationClear`` and handed to a background thread once the
+    request's transaction commits; ``prune_notifications`` finishes it if the
+    thread does not. Returns ``(deleted_now, has_more)``.
+    """
+    batch_size = batch_size or get_retention_settings()['batch_size']
+    up_to = Notification.objects.filter(recipient=user).aggregate(up_to=Max('pk'))['up_to']
+    if up_to is None:
+        return 0, False
+    user_notifications = Notification.objects.filter(recipient=user, pk__lte=up_to)
+    pks = list(user_notifications.order_by().values_list('pk', flat=True)[:batch_size + 1])
+    has_more = len(pks) > batch_size
+    deleted, _ = Notification.objects.filter(pk__in=pks[:batch_size]).delete()
+
+    if has_more:
+        PendingNotificationClear.objects.update_or_create(user=user, defaults={'up_to_id': up_to})
+        after_commit(_clear_remaining, user.pk, batch_size, setting='NOTIFICATION_CLEAR_IN_BACKGROUND')
+    return deleted, has_more
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Notification
+from .realtime import notification_payload, push_counter, push_to_user
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    """Stream freshly created notifications to the recipient's open tabs"""
+    if not created or instance.is_summary:
+        return
+    push_to_user(instance.recipient_id, 'notification', notification_payload(instance))
+    if not instance.is_read:
+        push_counter(instance.recipient_id, 'notifications', delta=1)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chats.models import Conversation, Message
+from homabay_souq.pubsub import LocalBroker, get_broker, publish
+from notifications.models import Notification
+from notifications.realtime import user_channel
+from notifications.views import _EventStream
+
+User = get_user_model()
+
+
+class LocalBrokerTests(TestCase):
+    async def test_publish_reaches_subscribers_of_the_channel_only(self):
+        broker = LocalBroker()
+        with broker.subscribe('user.1') as mine, broker.subscribe('user.2') as theirs:
+            self.assertEqual(broker.publish('user.1', {'event': 'ping'}), 1)
+            self.assertEqual(await mine.get(timeout=1), {'event': 'ping'})
+            self.assertIsNone(await theirs.get(timeout=0.01))
+        self.assertEqual(broker.subscriber_count('user.1'), 0)
+
+    async def test_slow_subscriber_drops_oldest_and_flags_overflow(self):
+        broker = LocalBroker(queue_size=2)
+        with broker.subscribe('user.1') as subscription:
+            for i in range(3):
+                broker.publish('user.1', {'n': i})
+            await asyncio.sleep(0)
+            self.assertEqual(await subscription.get(timeout=1), {'n': 1})
+            self.assertTrue(subscription.overflowed)
+
+
+class LiveUpdatePublishingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.other = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+
+    @override_settings(CACHE_SHARED=True)
+    def test_notification_and_message_writes_publish_after_commit(self):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.user, self.other)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Notification.objects.create(
+                recipient=self.user, notification_type='system', title='Hi', message='Hello'
+            )
+            Message.objects.create(conversation=conversation, sender=self.other, content='Still available?')
+
+        # notification event + notification counter + chat fan-out + inbox versions + message counter
+        self.assertEqual(len(callbacks), 5)
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        Notification.objects.create(recipient=self.user, notification_type='system', title='Hi', message='Hello')
+
+    def test_stream_requires_login(self):
+        response = self.client.get(reverse('notification-stream'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_poll_snapshot_returns_counters(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notification-stream'), {'transport': 'poll'})
+        self.assertEqual(response.json()['counters'], {'notifications': 1, 'messages': 0})
+
+    @override_settings(REALTIME_POLL_TIMEOUT_SECONDS=2)
+    async def test_long_poll_returns_published_events(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, publish, user_channel(self.user.pk), {'event': 'counter', 'data': {'name': 'messages', 'delta': 1}})
+
+        response = await self.async_client.get(reverse('notification-stream'), {'transport': 'poll', 'wait': '1'})
+
+        self.assertEqual(response.json()['events'], [{'event': 'counter', 'data': {'name': 'messages', 'delta': 1}}])
+
+    async def test_sse_stream_sends_snapshot_then_events(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('notification-stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = response.streaming_content
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        snapshot = (await anext(chunks)).decode()
+        self.assertIn('event: counters', snapshot)
+        self.assertEqual(json.loads(snapshot.split('data: ')[1]), {'notifications': 1, 'messages': 0})
+
+        get_broker().publish(user_channel(self.user.pk), {'event': 'counter', 'data': {'name': 'notifications', 'value': 0}})
+        self.assertIn(b'event: counter\n', await anext(chunks))
+        await chunks.aclose()
+        response.close()
+        self.assertEqual(get_broker().subscriber_count(user_channel(self.user.pk)), 0)
+
+    async def test_overflow_resync_drops_queued_counter_deltas(self):
+        broker = LocalBroker(queue_size=2)
+        stream = _EventStream(self.user, broker.subscribe('user'), {'notifications': 1, 'messages': 0})
+        events = stream._events()
+        await anext(events)
+        await anext(events)
+
+        for message in (
+            {'event': 'counter', 'data': {'name': 'notifications', 'delta': 1}},
+            {'event': 'counter', 'data': {'name': 'notifications', 'delta': 1}},
+            {'event': 'notification', 'data': {'title': 'Hi'}},
+        ):
+            broker.publish('user', message)
+        await asyncio.sleep(0)
+
+        resync = await anext(events)
+        self.assertIn('event: counters', resync)
+        self.assertEqual(json.loads(resync.split('data: ')[1]), {'notifications': 1, 'messages': 0})
+        self.assertIn('event: notification', await anext(events))
+        self.assertIsNone(stream.subscription.get_nowait())
+        await events.aclose()
+
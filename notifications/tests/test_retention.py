@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from notifications.models import Notification, PendingNotificationClear
+from notifications.retention import (
+    clear_all_for_user, compact_notifications, enforce_user_cap, run_retention,
+)
+
+User = get_user_model()
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.now = timezone.now()
+
+    def _notify(self, days_ago=0, is_read=True, notification_type='order_shipped'):
+        notification = Notification.objects.create(
+            recipient=self.user,
+            notification_type=notification_type,
+            title='Shipped',
+            message='Your order shipped',
+            is_read=is_read,
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return notification
+
+    def test_compaction_folds_old_read_rows_into_one_summary_per_type(self):
+        for _ in range(3):
+            self._notify(days_ago=40)
+        self._notify(days_ago=40, notification_type='favorite')
+        unread = self._notify(days_ago=40, is_read=False)
+        recent = self._notify(days_ago=1)
+
+        compacted = compact_notifications(self.now - timedelta(days=30), batch_size=2)
+
+        self.assertEqual(compacted, 4)
+        summaries = Notification.objects.filter(recipient=self.user, is_summary=True)
+        self.assertEqual(summaries.count(), 2)
+        shipped = summaries.get(notification_type='order_shipped')
+        self.assertEqual(shipped.summary_count, 3)
+        self.assertTrue(shipped.is_read)
+        self.assertIn('3 older', shipped.title)
+        self.assertTrue(Notification.objects.filter(pk=unread.pk).exists())
+        self.assertTrue(Notification.objects.filter(pk=recent.pk).exists())
+
+    def test_compaction_grows_existing_summary(self):
+        self._notify(days_ago=40)
+        compact_notifications(self.now - timedelta(days=30))
+        self._notify(days_ago=35)
+        self._notify(days_ago=35)
+        compact_notifications(self.now - timedelta(days=30))
+
+        summary = Notification.objects.get(recipient=self.user, is_summary=True)
+        self.assertEqual(summary.summary_count, 3)
+
+    def test_user_cap_drops_oldest_first(self):
+        for days_ago in range(6):
+            self._notify(days_ago=days_ago, is_read=False)
+
+        deleted = enforce_user_cap(max_per_user=4, batch_size=1)
+
+        self.assertEqual(deleted, 2)
+        remaining = Notification.objects.filter(recipient=self.user)
+        self.assertEqual(remaining.count(), 4)
+        oldest = remaining.order_by('created_at').first()
+        self.assertGreater(oldest.created_at, self.now - timedelta(days=4))
+
+    def test_run_retention_expires_rows_past_the_age_cap(self):
+        self._notify(days_ago=400, is_read=False)
+        self._notify(days_ago=1, is_read=False)
+
+        stats = run_retention(now=self.now, compact_after_days=30, retention_days=180, max_per_user=50)
+
+        self.assertEqual(stats['expired'], 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 1)
+
+    def test_prune_command_runs(self):
+        self._notify(days_ago=40)
+        call_command('prune_notifications', '--compact-after-days', '30', stdout=StringIO())
+        self.assertTrue(Notification.objects.filter(recipient=self.user, is_summary=True).exists())
+
+
+class ClearAllNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        for i in range(5):
+            Notification.objects.create(
+                recipient=self.user, notification_type='system', title=f'n{i}', message='m'
+            )
+
+    def test_small_history_cleared_inline(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('clear-all-notifications'), HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json(), {'success': True, 'deleted': 5, 'pending': False})
+        self.assertFalse(Notification.objects.filter(recipient=self.user).exists())
+
+    @override_settings(NOTIFICATION_DELETE_BATCH_SIZE=2)
+    def test_large_history_schedules_background_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            deleted, pending = clear_all_for_user(self.user)
+        self.assertEqual(deleted, 2)
+        self.assertTrue(pending)
+        self.assertEqual(len(callbacks), 1)
+
+    @override_settings(NOTIFICATION_DELETE_BATCH_SIZE=2)
+    def test_background_job_keeps_notifications_that_arrive_later(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            clear_all_for_user(self.user)
+        newer = Notification.objects.create(recipient=self.user, notification_type='system', title='new', message='m')
+
+        with override_settings(NOTIFICATION_CLEAR_IN_BACKGROUND=False):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(list(Notification.objects.filter(recipient=self.user)), [newer])
+        self.assertFalse(PendingNotificationClear.objects.exists())
+
+    @override_settings(NOTIFICATION_DELETE_BATCH_SIZE=2)
+    def test_prune_finishes_a_clear_whose_job_never_ran(self):
+        clear_all_for_user(self.user)
+        self.assertTrue(PendingNotificationClear.objects.filter(user=self.user).exists())
+
+        stats = run_retention()
+        self.assertEqual(stats['cleared'], 3)
+        self.assertFalse(Notification.objects.filter(recipient=self.user).exists())
+        self.assertFalse(PendingNotificationClear.objects.exists())
+
@@ -9,4 +9,5 @@ urlpatterns = [
     path('delete/<int:notification_id>/', views.delete_notification, name='delete-notification'),
     path('clear-all/', views.clear_all_notifications, name='clear-all-notifications'),
     path('api/unread-count/', views.get_unread_count, name='unread-notification-count'),
+    path('stream/', views.event_stream, name='notification-stream'),
 ]
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from .models import Notification, NotificationPreference
+from .realtime import notification_payload, push_counter, push_to_user
 
 User = get_user_model()
 
@@ -31,6 +32,32 @@ def create_notification(recipient, notification_type, title, message,
     return None
 
 
+def create_notifications(notifications):
+    """
+    ``create_notification`` for many unsaved ``Notification`` rows at once:
+    the recipients' preferences are read with one query and the rows they
+    want are written with one ``bulk_create``. Returns the created rows.
+    """
+    notifications = list(notifications)
+    preferences = NotificationPreference.objects.in_bulk(
+        {notification.recipient_id for notification in notifications}, field_name='user_id'
+    )
+    wanted = [
+        notification for notification in notifications
+        if getattr(
+            preferences.get(notification.recipient_id),
+            f'push_{notification.notification_type.split("_")[0]}',
+            True,
+        )
+    ]
+    created = Notification.objects.bulk_create(wanted)
+    # bulk_create sends no post_save, so stream them here as the signal would
+    for notification in created:
+        push_to_user(notification.recipient_id, 'notification', notification_payload(notification))
+        push_counter(notification.recipient_id, 'notifications', delta=1)
+    return created
+
+
 # notifications/utils.py
 import requests
 from django.conf import settings
@@ -1,11 +1,17 @@
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import Notification, NotificationPreference
 from .forms import NotificationPreferenceForm
+from .retention import clear_all_for_user
+from .realtime import get_counters, push_counter, user_channel
+from homabay_souq.pubsub import get_broker
 
 @login_required
 def notification_list(request):
@@ -68,7 +74,9 @@ def notification_list(request):
 def mark_notification_read(request, notification_id):
     """Mark a single notification as read"""
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
-    notification.mark_as_read()
+    if not notification.is_read:
+        notification.mark_as_read()
+        push_counter(request.user.id, 'notifications', delta=-1)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -80,6 +88,7 @@ def mark_notification_read(request, notification_id):
 def mark_all_read(request):
     """Mark all notifications as read"""
     Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+    push_counter(request.user.id, 'notifications', value=0)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -91,7 +100,10 @@ def mark_all_read(request):
 def delete_notification(request, notification_id):
     """Delete a notification"""
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
+    was_unread = not notification.is_read
     notification.delete()
+    if was_unread:
+        push_counter(request.user.id, 'notifications', delta=-1)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -101,11 +113,12 @@ def delete_notification(request, notification_id):
 @login_required
 @require_POST
 def clear_all_notifications(request):
-    """Clear all notifications"""
-    Notification.objects.filter(recipient=request.user).delete()
+    """Clear all notifications (large histories finish in the background)"""
+    deleted, pending = clear_all_for_user(request.user)
+    push_counter(request.user.id, 'notifications', value=0)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'deleted': deleted, 'pending': pending})
     
     return redirect('notification-list')
 
@@ -130,4 +143,102 @@ def notification_preferences(request):
 def get_unread_count(request):
     """API endpoint to get unread notification count"""
     unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-    return JsonResponse({'unread_count': unread_count})
\ No newline at end of file
+    return JsonResponse({'unread_count': unread_count})
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _EventStream:
+    """
+    Async SSE body for one connection. Django registers ``close`` as a
+    resource closer, so the broker subscription is released as soon as the
+    response is closed, even if the generator is never resumed.
+    """
+
+    def __init__(self, user, subscription, counters):
+        self.user = user
+        self.subscription = subscription
+        self.counters = counters
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        heartbeat = getattr(settings, 'REALTIME_HEARTBEAT_SECONDS', 20)
+        subscription = self.subscription
+        try:
+            yield "retry: 5000\n\n"
+            yield _sse_event('counters', self.counters)
+            while True:
+                message = await subscription.get(timeout=heartbeat)
+                if message is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # We fell behind and dropped events; resend absolute counts.
+                    # Queued counter changes are already in them, so drop those
+                    subscription.overflowed = False
+                    pending = []
+                    while message is not None:
+                        if message['event'] != 'counter':
+                            pending.append(message)
+                        message = subscription.get_nowait()
+                    yield _sse_event('counters', await sync_to_async(get_counters)(self.user))
+                    for queued in pending:
+                        yield _sse_event(queued['event'], queued['data'])
+                    continue
+                yield _sse_event(message['event'], message['data'])
+        finally:
+            subscription.close()
+
+    def close(self):
+        self.subscription.close()
+
+
+async def _long_poll(request, user):
+    if request.GET.get('wait') != '1':
+        return JsonResponse({'counters': await sync_to_async(get_counters)(user), 'events': []})
+
+    timeout = getattr(settings, 'REALTIME_POLL_TIMEOUT_SECONDS', 25)
+    with get_broker().subscribe(user_channel(user.pk)) as subscription:
+        message = await subscription.get(timeout=timeout)
+        events = []
+        while message is not None:
+            events.append(message)
+            message = subscription.get_nowait()
+    return JsonResponse({'events': events})
+
+
+async def event_stream(request):
+    """
+    Live unread counters and new notifications for the signed-in user.
+
+    Serves Server-Sent Events by default. Clients without EventSource can use
+    ``?transport=poll`` for a counters snapshot and ``?transport=poll&wait=1``
+    to long-poll for the next events. Only the initial snapshot touches the
+    database; an idle connection just waits on the broker.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    if request.GET.get('transport') == 'poll':
+        return await _long_poll(request, user)
+
+    # Subscribe before taking the snapshot so no event can slip in between
+    subscription = get_broker().subscribe(user_channel(user.pk))
+    try:
+        counters = await sync_to_async(get_counters)(user)
+    except Exception:
+        subscription.close()
+        raise
+    response = StreamingHttpResponse(
+        _EventStream(user, subscription, counters),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,79 @@
+// Live unread badges fed by /notifications/stream/ (SSE), with a long-poll
+// fallback for browsers without EventSource. Replaces timer-based polling.
+(function () {
+    const script = document.currentScript;
+    const streamUrl = script.dataset.streamUrl;
+    const badgeLinks = {
+        notifications: script.dataset.notificationsUrl,
+        messages: script.dataset.messagesUrl
+    };
+    const counts = { notifications: 0, messages: 0 };
+
+    function renderBadges(name) {
+        const value = Math.max(0, counts[name]);
+        document.querySelectorAll(`a[href="${badgeLinks[name]}"]`).forEach(link => {
+            let badge = link.querySelector('.badge');
+            if (value > 0) {
+                if (!badge) {
+                    badge = document.createElement('span');
+                    badge.className = 'position-absolute top-0 start-100 translate-middle badge rounded-pill bg-danger';
+                    link.appendChild(badge);
+                }
+                badge.textContent = value;
+            } else if (badge) {
+                badge.remove();
+            }
+        });
+        document.dispatchEvent(new CustomEvent('live:counter', { detail: { name, value } }));
+    }
+
+    function applyCounters(data) {
+        Object.keys(counts).forEach(name => {
+            if (name in data) {
+                counts[name] = data[name];
+                renderBadges(name);
+            }
+        });
+    }
+
+    function applyEvent(event, data) {
+        if (event === 'counters') {
+            applyCounters(data);
+        } else if (event === 'counter') {
+            counts[data.name] = 'value' in data ? data.value : counts[data.name] + data.delta;
+            renderBadges(data.name);
+        } else if (event === 'notification') {
+            document.dispatchEvent(new CustomEvent('live:notification', { detail: data }));
+        }
+    }
+
+    function startStream() {
+        const source = new EventSource(streamUrl);
+        source.addEventListener('counters', e => applyEvent('counters', JSON.parse(e.data)));
+        source.addEventListener('counter', e => applyEvent('counter', JSON.parse(e.data)));
+        source.addEventListener('notification', e => applyEvent('notification', JSON.parse(e.data)));
+    }
+
+    async function startLongPoll() {
+        const snapshotEvery = 10;
+        let polls = 0;
+        while (true) {
+            try {
+                const wait = polls % snapshotEvery === 0 ? '' : '&wait=1';
+                const response = await fetch(`${streamUrl}?transport=poll${wait}`, { credentials: 'same-origin' });
+                const data = await response.json();
+                if (data.counters) applyCounters(data.counters);
+                (data.events || []).forEach(message => applyEvent(message.event, message.data));
+                polls++;
+            } catch (error) {
+                await new Promise(resolve => setTimeout(resolve, 5000));
+            }
+        }
+    }
+
+    if (window.EventSource) {
+        startStream();
+    } else {
+        startLongPoll();
+    }
+})();
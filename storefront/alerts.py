@@ -1,22 +1,260 @@
-from django.core.mail import mail_admins
-from django.conf import settings
+"""
+Alert evaluation for the payment system, run by ``manage.py evaluate_alerts``.
+
+Each rule turns a metrics snapshot into zero or one condition. Conditions are
+stored as ``AdminAlert`` rows keyed by a fingerprint of the rule, so a
+condition that stays true updates one row instead of raising a new alert.
+Admins are emailed when an alert opens or escalates, again at most once per
+cooldown while it stays active, and once more when it recovers; a recovery
+email that fails is retried on later runs until it goes out. All of a run's
+emails go out in batches over a single SMTP connection.
+"""
+import hashlib
 import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
 
 logger = logging.getLogger('storefront.payment')
+# 'storefront.payment' errors are mailed to ADMINS; SMTP failures must not go there
+dispatch_logger = logging.getLogger(__name__)
+
+AlertCondition = namedtuple('AlertCondition', ['rule', 'severity', 'subject', 'message'])
+AlertEmail = namedtuple('AlertEmail', ['alert', 'kind', 'subject', 'body'])
+
+
+def fingerprint(rule, scope=''):
+    return hashlib.sha256(f'{rule}:{scope}'.encode()).hexdigest()
+
+
+def collect_snapshot():
+    """Everything the rules look at, from a handful of bounded queries"""
+    from .monitoring import PaymentMonitor, payment_outcome_totals
+
+    return {
+        'subscriptions': PaymentMonitor.get_subscription_metrics(None),
+        'payments_24h': payment_outcome_totals(timedelta(hours=24)),
+        'payments_1h': payment_outcome_totals(timedelta(hours=1)),
+    }
+
+
+def _rate(part, whole):
+    return part / whole * 100 if whole else 0
+
+
+def payment_success_rate_rule(snapshot):
+    payments = snapshot['payments_24h']
+    if payments['attempts'] < getattr(settings, 'ALERT_MIN_PAYMENT_ATTEMPTS', 1):
+        return None
+    rate = _rate(payments['completed'], payments['attempts'])
+    if rate >= 70:
+        return None
+    return AlertCondition(
+        'payment_success_rate',
+        'critical' if rate < 50 else 'warning',
+        f"Low payment success rate {rate:.1f}%",
+        f"Payment success rate over the last 24 hours is {rate:.1f}% "
+        f"({payments['completed']} of {payments['attempts']} attempts). Please investigate.",
+    )
+
+
+def payment_failure_spike_rule(snapshot):
+    payments = snapshot['payments_1h']
+    if payments['attempts'] < getattr(settings, 'ALERT_MIN_PAYMENT_ATTEMPTS', 1):
+        return None
+    rate = _rate(payments['failed'], payments['attempts'])
+    if rate <= 30:
+        return None
+    return AlertCondition(
+        'payment_failure_spike',
+        'critical',
+        f"High payment failure rate {rate:.1f}% in the last hour",
+        f"{payments['failed']} of {payments['attempts']} M-Pesa payments failed in the last hour.",
+    )
+
+
+def past_due_rule(snapshot):
+    past_due = snapshot['subscriptions']['past_due_subscriptions']
+    if past_due <= 10:
+        return None
+    return AlertCondition(
+        'past_due_subscriptions',
+        'critical' if past_due > 20 else 'warning',
+        f"High past due subscriptions ({past_due})",
+        f"There are {past_due} past-due subscriptions. Please review billing and customer outreach.",
+    )
+
+
+def trial_conversion_rule(snapshot):
+    metrics = snapshot['subscriptions']
+    if not metrics['trials_ended'] or metrics['trial_conversion_rate'] >= 30:
+        return None
+    return AlertCondition(
+        'trial_conversion',
+        'warning',
+        f"Low trial conversion rate {metrics['trial_conversion_rate']:.1f}%",
+        f"Only {metrics['trial_conversion_rate']:.1f}% of ended trials converted to paid subscriptions.",
+    )
+
+
+def churn_rule(snapshot):
+    churn = snapshot['subscriptions']['churn_rate']
+    if churn <= 5:
+        return None
+    return AlertCondition(
+        'churn_rate',
+        'critical' if churn > 10 else 'warning',
+        f"High churn rate {churn:.1f}%",
+        f"Churn rate has exceeded acceptable threshold: {churn:.1f}%",
+    )
 
 
-def send_admin_alert(subject: str, message: str):
-    """Send alert to site admins (ADMINS in settings).
+RULES = [
+    payment_success_rate_rule,
+    payment_failure_spike_rule,
+    past_due_rule,
+    trial_conversion_rule,
+    churn_rule,
+]
 
-    Uses mail_admins which respects ADMINS setting and email backend.
-    Falls back to logging if ADMINS is not configured.
+
+def evaluate_rules(snapshot):
+    conditions = {}
+    for rule in RULES:
+        condition = rule(snapshot)
+        if condition is not None:
+            conditions[fingerprint(condition.rule)] = condition
+    return conditions
+
+
+def evaluate_alerts(now=None, snapshot=None):
     """
-    try:
-        if getattr(settings, 'ADMINS', None):
-            mail_admins(subject, message, fail_silently=False)
-            logger.info(f"Sent admin alert: {subject}")
+    Run every rule, update alert state and email whatever is due.
+    Returns ``{'active': ..., 'resolved': ..., 'notified': ...}``.
+    """
+    from .models import AdminAlert
+
+    now = now or timezone.now()
+    conditions = evaluate_rules(snapshot if snapshot is not None else collect_snapshot())
+    cooldown = timedelta(minutes=getattr(settings, 'ALERT_COOLDOWN_MINUTES', 60))
+    notify_severities = getattr(settings, 'ALERT_NOTIFY_SEVERITIES', ('critical',))
+    alerts = {
+        alert.fingerprint: alert
+        for alert in AdminAlert.objects.filter(
+            Q(is_active=True) | Q(fingerprint__in=conditions)
+            | Q(recovery_notified=False, last_notified_at__isnull=False)
+        )
+    }
+    outbox = []
+
+    for key, condition in conditions.items():
+        alert = alerts.get(key)
+        if alert is None:
+            alert = AdminAlert(fingerprint=key, rule=condition.rule, first_seen_at=now)
+        elif not alert.is_active:
+            # Fired again after recovering: a new incident
+            alert.first_seen_at = now
+            alert.resolved_at = None
+            alert.last_notified_at = None
+            alert.notified_severity = ''
+            alert.recovery_notified = False
+        alert.severity = condition.severity
+        alert.message = condition.message
+        alert.is_active = True
+        alert.last_seen_at = now
+        alert.save()
+
+        escalated = alert.notified_severity == 'warning' and condition.severity == 'critical'
+        cooled_down = alert.last_notified_at is None or now - alert.last_notified_at >= cooldown
+        if condition.severity in notify_severities and (escalated or cooled_down):
+            subject = f"{condition.severity.title()}: {condition.subject}"
+            outbox.append(AlertEmail(alert, 'firing', subject, condition.message))
+
+    resolved = 0
+    for key, alert in alerts.items():
+        if key in conditions:
+            continue
+        if alert.is_active:
+            alert.is_active = False
+            alert.resolved_at = now
+            alert.save(update_fields=['is_active', 'resolved_at'])
+            resolved += 1
+        # Also picks up recoveries whose email failed on an earlier run
+        if alert.last_notified_at and not alert.recovery_notified:
+            outbox.append(AlertEmail(
+                alert, 'recovery', f"Resolved: {alert.rule.replace('_', ' ')}",
+                f"This alert has recovered.\n\nLast state: {alert.message}",
+            ))
+
+    notified = dispatch_notifications(outbox, now)
+    return {'active': len(conditions), 'resolved': resolved, 'notified': notified}
+
+
+def _admin_emails():
+    return [admin if isinstance(admin, str) else admin[1] for admin in getattr(settings, 'ADMINS', [])]
+
+
+def _mark_notified(notifications, now):
+    from .models import AdminAlert
+
+    for notification in notifications:
+        alert = notification.alert
+        if notification.kind == 'firing':
+            alert.last_notified_at = now
+            alert.notified_severity = alert.severity
         else:
-            # No ADMINS configured — log as critical
-            logger.critical(f"ADMIN ALERT (no ADMINS configured): {subject} - {message}")
+            alert.last_notified_at = None
+            alert.notified_severity = ''
+            alert.recovery_notified = True
+    AdminAlert.objects.bulk_update(
+        [notification.alert for notification in notifications],
+        ['last_notified_at', 'notified_severity', 'recovery_notified'],
+    )
+
+
+def dispatch_notifications(notifications, now=None):
+    """
+    Email ``notifications`` to ADMINS over one SMTP connection, in batches of
+    ALERT_EMAIL_BATCH_SIZE. Alerts are only marked notified once their batch
+    was accepted, so a failed send is retried on the next run.
+    """
+    if not notifications:
+        return 0
+    now = now or timezone.now()
+    recipients = _admin_emails()
+    if not recipients:
+        for notification in notifications:
+            logger.critical(f"ADMIN ALERT (no ADMINS configured): {notification.subject} - {notification.body}")
+        _mark_notified(notifications, now)
+        return len(notifications)
+
+    batch_size = getattr(settings, 'ALERT_EMAIL_BATCH_SIZE', 50)
+    prefix = getattr(settings, 'EMAIL_SUBJECT_PREFIX', '[Django] ')
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for start in range(0, len(notifications), batch_size):
+            batch = notifications[start:start + batch_size]
+            connection.send_messages([
+                EmailMessage(
+                    f'{prefix}{notification.subject}',
+                    notification.body,
+                    settings.SERVER_EMAIL,
+                    recipients,
+                    connection=connection,
+                )
+                for notification in batch
+            ])
+            _mark_notified(batch, now)
+            sent += len(batch)
     except Exception as e:
-        logger.exception(f"Failed to send admin alert: {e}")
+        dispatch_logger.exception(f"Failed to send admin alerts: {e}")
+    finally:
+        connection.close()
+    dispatch_logger.info(f"Sent {sent} of {len(notifications)} admin alert emails")
+    return sent
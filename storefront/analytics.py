@@ -0,0 +1,345 @@
+"""
+Data for the seller and store analytics dashboards.
+
+Every chart is one grouped query over the rollups: revenue and per-category
+orders from ``StoreDailyStats``, and order and buyer counts from
+``StoreDailyOrders``, where they add up across days and cities (see
+``storefront.rollups``). A seller's order count is the sum over their stores.
+Only the per-product table, buyer ages and the activity feed, which are finer
+than the rollups, read the paid items. Periods are whole days: '24h' is
+today, '7d' and '30d' end today.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from listings.models import Listing, OrderItem
+from reviews.models import Review
+from .models import Store, StoreDailyOrders, StoreDailyStats
+from .rollups import counted_items
+
+PERIOD_DAYS = {'24h': 1, '7d': 7, '30d': 30}
+AGE_RANGES = [('18-24', 0, 25), ('25-34', 25, 35), ('35-44', 35, 45), ('45-54', 45, 55), ('55+', 55, None)]
+CHART_COLORS = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF']
+
+PeriodWindow = namedtuple('PeriodWindow', ['start', 'previous_start', 'days'])
+
+
+def normalize_period(period):
+    """One of the ``PERIOD_DAYS`` keys, or 'all' for anything else"""
+    return period if period in PERIOD_DAYS else 'all'
+
+
+def get_period_window(period, today=None):
+    """Return the first day of ``period`` and of the one before it, or None for all time"""
+    days = PERIOD_DAYS.get(period)
+    if not days:
+        return None
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    return PeriodWindow(start, start - timedelta(days=days), days)
+
+
+def daily_series(stats, days, today=None, daily_orders=None):
+    """
+    Revenue for each of the last ``days`` days, zero-filled, and the orders
+    and buyers from the ``daily_orders`` rollup (zeros when not given)
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    revenue_by_day = dict(
+        stats.filter(date__gte=start).values('date').annotate(day_revenue=Sum('revenue'))
+        .values_list('date', 'day_revenue').order_by()
+    )
+    counts_by_day = {}
+    if daily_orders is not None:
+        counts_by_day = {
+            row['date']: (row['day_orders'], row['day_buyers'])
+            for row in daily_orders.filter(date__gte=start).values('date').annotate(
+                day_orders=Sum('orders'), day_buyers=Sum('buyers'),
+            ).order_by()
+        }
+    labels, revenue, orders, buyers = [], [], [], []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        labels.append(day.strftime('%b %d'))
+        revenue.append(revenue_by_day.get(day, 0))
+        day_orders, day_buyers = counts_by_day.get(day, (0, 0))
+        orders.append(day_orders)
+        buyers.append(day_buyers)
+    return labels, revenue, orders, buyers
+
+
+def _years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29 February in a non-leap year
+        return today.replace(year=today.year - years, day=28)
+
+
+def buyer_age_counts(buyers):
+    """Bucket buyers into AGE_RANGES with a single conditional aggregate"""
+    today = timezone.localdate()
+    buckets = {}
+    for label, min_age, max_age in AGE_RANGES:
+        condition = Q(date_of_birth__lte=_years_ago(today, min_age))
+        if max_age is not None:
+            condition &= Q(date_of_birth__gt=_years_ago(today, max_age))
+        buckets[label] = Count('id', filter=condition)
+    counts = buyers.filter(date_of_birth__isnull=False).aggregate(**buckets)
+    return [counts[label] for label, _, _ in AGE_RANGES]
+
+
+def _locations_chart(daily_orders):
+    locations = daily_orders.values('city').annotate(count=Sum('orders')).order_by('-count')[:5]
+    return {
+        'labels': [loc['city'] for loc in locations],
+        'datasets': [{
+            'data': [loc['count'] for loc in locations],
+            'backgroundColor': CHART_COLORS,
+        }]
+    }
+
+
+def _percent_change(current, previous):
+    return (current - previous) / previous * 100 if previous else 0
+
+
+def seller_analytics_data(user, period):
+    stores = list(Store.objects.filter(owner=user))
+    store_ids = [store.pk for store in stores]
+    stats = StoreDailyStats.objects.filter(store_id__in=store_ids)
+    daily_orders = StoreDailyOrders.objects.filter(store_id__in=store_ids)
+    window = get_period_window(period)
+
+    # Headline totals and the previous period's: one pass over each rollup
+    if window:
+        current = Q(date__gte=window.start)
+        previous = Q(date__gte=window.previous_start, date__lt=window.start)
+        totals = stats.aggregate(
+            total_revenue=Sum('revenue', filter=current, default=0),
+            previous_revenue=Sum('revenue', filter=previous, default=0),
+        )
+        totals.update(daily_orders.aggregate(
+            total_orders=Sum('orders', filter=current, default=0),
+            previous_orders=Sum('orders', filter=previous, default=0),
+        ))
+        revenue_trend = _percent_change(totals['total_revenue'], totals['previous_revenue'])
+        orders_trend = _percent_change(totals['total_orders'], totals['previous_orders'])
+    else:
+        totals = stats.aggregate(total_revenue=Sum('revenue', default=0))
+        totals.update(daily_orders.aggregate(total_orders=Sum('orders', default=0)))
+        revenue_trend = 0
+        orders_trend = 0
+
+    labels, revenue_data, orders_data, buyers_data = daily_series(
+        stats, window.days if window else 1, daily_orders=daily_orders,
+    )
+    revenue_orders_trend_data = {
+        'labels': labels,
+        'datasets': [
+            {
+                'label': 'Revenue',
+                'data': revenue_data,
+                'borderColor': '#4CAF50',
+                'yAxisID': 'y',
+            },
+            {
+                'label': 'Orders',
+                'data': orders_data,
+                'borderColor': '#2196F3',
+                'yAxisID': 'y1',
+            },
+            {
+                'label': 'Buyers',
+                'data': buyers_data,
+                'borderColor': '#FF9800',
+                'yAxisID': 'y1',
+            }
+        ]
+    }
+
+    # Per-store revenue; every store belongs to this seller, so they share one rating
+    store_revenue = dict(
+        stats.values('store_id').annotate(revenue=Sum('revenue')).values_list('store_id', 'revenue').order_by()
+    )
+    store_orders = dict(
+        daily_orders.values('store_id').annotate(orders=Sum('orders')).values_list('store_id', 'orders').order_by()
+    )
+    rating = 0
+    if stores:
+        rating = Review.objects.filter(seller=user).aggregate(avg_rating=Avg('rating', default=0))['avg_rating']
+    top_stores = sorted((
+        {
+            'name': store.name,
+            'slug': store.slug,
+            'revenue': store_revenue.get(store.pk, 0),
+            'orders': store_orders.get(store.pk, 0),
+            'rating': rating,
+        }
+        for store in stores
+    ), key=lambda s: s['revenue'], reverse=True)
+    store_performance_data = {
+        'labels': [s['name'] for s in top_stores],
+        'datasets': [{
+            'data': [s['revenue'] for s in top_stores],
+            'backgroundColor': CHART_COLORS,
+        }]
+    }
+
+    top_categories = list(
+        stats.filter(category__isnull=False).values('category_id', 'category__name').annotate(
+            category_revenue=Sum('revenue'), category_orders=Sum('orders'),
+        ).order_by('-category_revenue')[:5]
+    )
+    top_category_ids = [c['category_id'] for c in top_categories]
+    listing_counts = dict(
+        Listing.objects.filter(
+            store_id__in=store_ids,
+            is_active=True,
+            category_id__in=top_category_ids,
+        ).values('category_id').annotate(count=Count('id')).values_list('category_id', 'count').order_by()
+    )
+    top_categories = [{
+        'name': c['category__name'],
+        'revenue': c['category_revenue'],
+        'orders': c['category_orders'],
+        'listings': listing_counts.get(c['category_id'], 0),
+    } for c in top_categories]
+
+    # Recent activity across all stores
+    recent_activity = []
+    for order in OrderItem.objects.filter(listing__store_id__in=store_ids).select_related(
+        'listing__store'
+    ).order_by('-added_at')[:5]:
+        recent_activity.append({
+            'timestamp': order.added_at,
+            'store': order.listing.store.name,
+            'type': 'Order',
+            'description': f'New order for {order.listing.title}'
+        })
+    if stores:
+        for review in Review.objects.filter(seller=user).select_related('reviewer').order_by('-date_created')[:5]:
+            recent_activity.append({
+                'timestamp': review.date_created,
+                'store': stores[0].name,
+                'type': 'Review',
+                'description': f'{review.rating}★ review by {review.reviewer.username}'
+            })
+    for listing in Listing.objects.filter(store_id__in=store_ids).select_related('store').order_by('-date_created')[:5]:
+        recent_activity.append({
+            'timestamp': listing.date_created,
+            'store': listing.store.name,
+            'type': 'Listing',
+            'description': f'New listing: {listing.title}'
+        })
+    recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
+
+    return {
+        'period': period,
+        'total_revenue': totals['total_revenue'],
+        'total_orders': totals['total_orders'],
+        'revenue_trend': round(revenue_trend, 1),
+        'orders_trend': round(orders_trend, 1),
+        'active_stores': len(stores),
+        'premium_stores': sum(1 for store in stores if store.is_premium),
+        'active_listings': Listing.objects.filter(store_id__in=store_ids, is_active=True).count(),
+        'revenue_orders_trend_data': revenue_orders_trend_data,
+        'store_performance_data': store_performance_data,
+        'top_stores': top_stores[:5],
+        'top_categories': top_categories,
+        'recent_activity': recent_activity[:10],
+        'customer_map_data': _locations_chart(daily_orders),
+    }
+
+
+def store_analytics_data(store, period):
+    window = get_period_window(period)
+    all_stats = StoreDailyStats.objects.filter(store=store)
+    stats = all_stats.filter(date__gte=window.start) if window else all_stats
+    daily_orders = StoreDailyOrders.objects.filter(store=store)
+    sold = counted_items().filter(listing__store=store)
+    if window:
+        daily_orders = daily_orders.filter(date__gte=window.start)
+        sold = sold.filter(order__paid_at__date__gte=window.start)
+
+    totals = stats.aggregate(total_revenue=Sum('revenue', default=0))
+    totals.update(daily_orders.aggregate(total_orders=Sum('orders', default=0)))
+
+    labels, revenue_trend, _, _ = daily_series(all_stats, window.days if window else 1)
+    revenue_trend_data = {
+        'labels': labels,
+        'datasets': [{
+            'label': 'Daily Revenue',
+            'data': revenue_trend,
+            'fill': False,
+            'borderColor': '#4CAF50',
+            'tension': 0.1
+        }]
+    }
+
+    category_sales = stats.values('category__name').annotate(
+        total_sales=Sum('orders')
+    ).order_by('-total_sales')[:5]
+    category_data = {
+        'labels': [item['category__name'] for item in category_sales],
+        'datasets': [{
+            'data': [item['total_sales'] for item in category_sales],
+            'backgroundColor': CHART_COLORS,
+        }]
+    }
+
+    # Product-level figures are finer than the rollup; one grouped query
+    top_products = list(sold.values('listing__title').annotate(
+        sales_count=Count('id'),
+        revenue=Sum('price')
+    ).order_by('-revenue')[:5])
+
+    recent_activity = []
+    for order in OrderItem.objects.filter(listing__store=store).select_related('listing').order_by('-added_at')[:5]:
+        recent_activity.append({
+            'timestamp': order.added_at,
+            'type': 'Order',
+            'description': f'New order for {order.listing.title}'
+        })
+    for review in Review.objects.filter(seller=store.owner_id).select_related('reviewer').order_by('-date_created')[:5]:
+        recent_activity.append({
+            'timestamp': review.date_created,
+            'type': 'Review',
+            'description': f'{review.rating}★ review by {review.reviewer.username}'
+        })
+    for listing in Listing.objects.filter(store=store).order_by('-date_created')[:5]:
+        recent_activity.append({
+            'timestamp': listing.date_created,
+            'type': 'Listing',
+            'description': f'New listing: {listing.title}'
+        })
+    recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
+
+    buyers = get_user_model().objects.filter(pk__in=sold.values('order__user_id'))
+    demographics_data = {
+        'labels': [label for label, _, _ in AGE_RANGES],
+        'datasets': [{
+            'label': 'Buyers by Age Range',
+            'data': buyer_age_counts(buyers),
+            'backgroundColor': '#4CAF50'
+        }]
+    }
+
+    return {
+        'period': period,
+        'revenue': totals['total_revenue'],
+        'orders_count': totals['total_orders'],
+        'active_listings': Listing.objects.filter(store=store, is_active=True).count(),
+        'avg_order_value': totals['total_revenue'] / totals['total_orders'] if totals['total_orders'] else 0,
+        'revenue_trend_data': revenue_trend_data,
+        'category_data': category_data,
+        'top_products': top_products,
+        'recent_activity': recent_activity[:10],
+        'demographics_data': demographics_data,
+        'locations_data': _locations_chart(daily_orders),
+    }
@@ -0,0 +1,119 @@
+"""
+Stale-while-revalidate result cache for the analytics and payment monitoring
+dashboards.
+
+Results are cached in the ``analytics`` namespace of ``homabay_souq.cache``
+per (view, owner, period), together with the data version they were computed
+from. A version is a stamp per scope (one seller's stores, or the payment
+system) that writers bump when orders, listings, reviews or payments change.
+An entry is fresh while its version is current and it is younger than the
+period's TTL. A stale entry is still served while one background thread
+recomputes it. On a miss, concurrent callers wait for a single computation
+(``Namespace.get_or_set``) instead of all running it.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from homabay_souq.cache import namespace
+
+from .analytics import normalize_period
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS = namespace('analytics')
+PAYMENTS_SCOPE = 'payments'
+# Seconds a result stays fresh; short periods move faster than long ones
+DEFAULT_TTLS = {'24h': 60, '7d': 300, '30d': 900, 'all': 1800}
+LOCK_TIMEOUT = 60
+
+
+def period_ttl(period):
+    ttls = {**DEFAULT_TTLS, **getattr(settings, 'ANALYTICS_CACHE_TTLS', {})}
+    return ttls.get(period, ttls['all'])
+
+
+def seller_scope(user_id):
+    return f'seller:{user_id}'
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def data_version(scope):
+    return ANALYTICS.get(_version_key(scope), 0)
+
+
+def bump_version(scope):
+    """Mark every cached result in ``scope`` stale once the current transaction commits"""
+    def bump():
+        # Any new value will do; a lost version reads as 0, which no entry carries after a bump
+        ANALYTICS.set(_version_key(scope), time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def _entry(version, data):
+    return {'version': version, 'computed_at': time.time(), 'data': data}
+
+
+def _timeout(period):
+    return period_ttl(period) + getattr(settings, 'ANALYTICS_CACHE_MAX_STALE_SECONDS', 86400)
+
+
+def _store(key, version, data, period):
+    ANALYTICS.set(key, _entry(version, data), _timeout(period))
+    return data
+
+
+def _refresh(key, lock_key, scope, period, compute):
+    try:
+        close_old_connections()
+        _store(key, data_version(scope), compute(), period)
+    except Exception as e:
+        logger.error(f"Background refresh of {key} failed: {str(e)}")
+    finally:
+        ANALYTICS.delete(lock_key)
+        connection.close()
+
+
+def _start_refresh(key, lock_key, scope, period, compute):
+    thread = threading.Thread(target=_refresh, args=(key, lock_key, scope, period, compute))
+    thread.daemon = True
+    thread.start()
+
+
+def get_or_compute(view, owner, period, scope, compute):
+    """
+    Return ``compute()``'s result for this dashboard, from cache when possible.
+
+    ``compute`` takes no arguments and must return something picklable.
+    ``period`` is normalized first, so arbitrary ``?period=`` values share the
+    'all' entry rather than each creating their own.
+    """
+    period = normalize_period(period)
+    key = f'{view}:{owner}:{period}'
+    lock_key = f'{key}:refresh'
+    version = data_version(scope)
+
+    entry = ANALYTICS.get(key)
+    if entry is not None:
+        if entry['version'] == version and time.time() - entry['computed_at'] < period_ttl(period):
+            return entry['data']
+        # Stale: serve it now; only the caller that takes the lock recomputes
+        if ANALYTICS.add(lock_key, 1, LOCK_TIMEOUT):
+            if getattr(settings, 'ANALYTICS_CACHE_BACKGROUND_REFRESH', True):
+                _start_refresh(key, lock_key, scope, period, compute)
+            else:
+                try:
+                    return _store(key, version, compute(), period)
+                finally:
+                    ANALYTICS.delete(lock_key)
+        return entry['data']
+
+    # Miss: one caller computes while the others wait for its result
+    return ANALYTICS.get_or_set(key, lambda: _entry(version, compute()), _timeout(period))['data']
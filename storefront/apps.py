@@ -5,3 +5,6 @@ class StorefrontConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'storefront'
     verbose_name = 'Storefront'
+
+    def ready(self):
+        import storefront.signals  # noqa: F401 (import registers signal handlers)
@@ -0,0 +1,94 @@
+"""
+Nightly subscription state changes, run by ``manage.py process_subscriptions``.
+
+Each transition is a handful of set-based statements per batch of at most
+SUBSCRIPTION_TRANSITION_BATCH_SIZE subscriptions: one UPDATE for the
+subscriptions, one for the premium flag of stores that lost their last live
+subscription, and one ``SubscriptionTransition`` audit row. Nothing is loaded
+or saved one row at a time, so ``Store.full_clean`` never runs here.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .analytics_cache import PAYMENTS_SCOPE, bump_version, seller_scope
+from .models import MpesaPayment, Store, Subscription, SubscriptionTransition
+
+BILLING_PERIOD_DAYS = 30
+GRACE_PERIOD_DAYS = 7
+LIVE_STATUSES = ('active', 'trialing')
+
+
+def _downgrade_stores(subscription_ids):
+    """Clear ``is_premium`` on the stores of these subscriptions that have no live subscription left"""
+    live = Subscription.objects.filter(store=OuterRef('pk'), status__in=LIVE_STATUSES)
+    stores = Store.objects.filter(
+        pk__in=Subscription.objects.filter(pk__in=subscription_ids).values('store_id'),
+        is_premium=True,
+    ).filter(~Exists(live))
+    owner_ids = set(stores.values_list('owner_id', flat=True).order_by())
+    # update() skips auto_now; updated_at also retires the stores' cached tiles
+    downgraded = stores.update(is_premium=False, updated_at=timezone.now())
+    for owner_id in owner_ids:
+        bump_version(seller_scope(owner_id))
+    return downgraded
+
+
+def _transition(name, subscriptions, changes, downgrade=False):
+    """
+    Apply ``changes`` to every subscription in ``subscriptions`` in batches.
+    ``subscriptions`` must stop matching a row once it has been changed.
+    Returns the number of subscriptions changed.
+    """
+    batch_size = getattr(settings, 'SUBSCRIPTION_TRANSITION_BATCH_SIZE', 1000)
+    total = 0
+    while True:
+        ids = list(subscriptions.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            # Re-apply the filter so a row that changed since it was read is left alone
+            changed = subscriptions.filter(pk__in=ids).update(**changes)
+            downgraded = _downgrade_stores(ids) if downgrade else 0
+            SubscriptionTransition.objects.create(
+                transition=name,
+                subscription_count=changed,
+                stores_downgraded=downgraded,
+                subscription_ids=ids,
+            )
+        total += changed
+    if total:
+        bump_version(PAYMENTS_SCOPE)
+    return total
+
+
+def process_trial_expirations(now=None):
+    """
+    Convert ended trials with a completed payment to active and cancel the
+    rest. Returns ``(converted, expired)``.
+    """
+    now = now or timezone.now()
+    paid = MpesaPayment.objects.filter(subscription=OuterRef('pk'), status='completed')
+    ended = Subscription.objects.filter(status='trialing', trial_ends_at__lte=now)
+    converted = _transition(
+        'trial_converted',
+        ended.filter(Exists(paid)),
+        {'status': 'active', 'next_billing_date': now + timedelta(days=BILLING_PERIOD_DAYS)},
+    )
+    expired = _transition('trial_expired', ended.filter(~Exists(paid)), {'status': 'cancelled'}, downgrade=True)
+    return converted, expired
+
+
+def cancel_past_due_subscriptions(now=None):
+    """Cancel subscriptions still past due a grace period after their billing date"""
+    now = now or timezone.now()
+    overdue = Subscription.objects.filter(
+        status='past_due',
+        next_billing_date__lte=now - timedelta(days=GRACE_PERIOD_DAYS),
+    )
+    return _transition(
+        'past_due_cancelled', overdue, {'status': 'cancelled', 'cancelled_at': now}, downgrade=True
+    )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from homabay_souq.cache import cache_stats, reset_cache_stats, stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit rate, traffic and latency per cache namespace, across every worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after showing them')
+
+    def handle(self, *args, **options):
+        stats.flush()
+        report = cache_stats()
+        if not report:
+            self.stdout.write('No cache traffic recorded yet.')
+        for name, counts in report.items():
+            hit_rate = f"{counts['hit_rate']:.1%}" if counts['hit_rate'] is not None else '-'
+            latency = f"{counts['mean_latency_ms']:.2f}ms" if counts['mean_latency_ms'] is not None else '-'
+            self.stdout.write(
+                f"{name}: {hit_rate} hits ({counts['hits']} hits, {counts['misses']} misses), "
+                f"{counts['sets']} writes, {counts['calls']} calls at {latency} mean"
+            )
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Cache statistics reset.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from storefront.alerts import evaluate_alerts
+
+
+class Command(BaseCommand):
+    help = 'Evaluate payment and subscription alert rules and email admins about new, escalated or recovered alerts. Run every few minutes (e.g. cron).'
+
+    def handle(self, *args, **options):
+        stats = evaluate_alerts()
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['active']} active alerts, {stats['resolved']} resolved, "
+            f"{stats['notified']} notifications sent."
+        ))
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from homabay_souq.db_router import replica_reads
+from storefront.media_migration import field_label, media_fields, migrate_media, pending_media
+
+
+class Command(BaseCommand):
+    help = ("Upload locally stored images of every image field to Cloudinary, in parallel. "
+            "Resumes where an interrupted run stopped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--field', action='append', dest='fields', metavar='APP.MODEL.FIELD',
+                            help='Only migrate this field, e.g. storefront.Store.logo (may be repeated)')
+        parser.add_argument('--dry-run', action='store_true', help='Count the files that would be uploaded')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many rows (0 = all)')
+        parser.add_argument('--workers', type=int, default=0, help='Upload threads (default MEDIA_MIGRATION_WORKERS)')
+        parser.add_argument('--restart', action='store_true', help='Ignore checkpoints and start from the first row')
+
+    def handle(self, *args, **options):
+        fields = media_fields(options['fields'])
+        if options['fields']:
+            unknown = set(options['fields']) - {field_label(model, field) for model, field in fields}
+            if unknown:
+                raise CommandError(f"Unknown image fields: {', '.join(sorted(unknown))}")
+
+        if options['dry_run']:
+            # Only counts rows, so the replica can take the scans
+            with replica_reads():
+                pending = pending_media(fields)
+            for label, count in pending.items():
+                self.stdout.write(f'{label}: {count} local files to upload')
+            return
+
+        if not getattr(settings, 'CLOUDINARY_CLOUD_NAME', ''):
+            raise CommandError('CLOUDINARY_CLOUD_NAME not set in settings; aborting.')
+
+        def progress(label, report):
+            self.stdout.write(
+                f'{label}: {report.migrated} uploaded, {report.reused} reused, '
+                f'{report.skipped} skipped, {report.failed} failed so far'
+            )
+
+        report = migrate_media(
+            fields, workers=options['workers'] or None, limit=options['limit'],
+            restart=options['restart'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {report.migrated} uploaded, {report.reused} reused, {report.skipped} skipped, '
+            f'{report.failed} failed in {report.seconds:.1f}s '
+            f'({report.files_per_second():.1f} files/s, {report.megabytes_per_second():.2f} MB/s)'
+        ))
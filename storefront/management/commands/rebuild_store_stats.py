@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from storefront.models import Store
+from storefront.rollups import rebuild_store_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the StoreDailyStats sales rollups from paid orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', action='append', dest='stores', metavar='SLUG',
+                            help='Only rebuild this store (may be repeated)')
+
+    def handle(self, *args, **options):
+        stores = None
+        if options['stores']:
+            stores = Store.objects.filter(slug__in=options['stores'])
+        rows = rebuild_store_stats(stores)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily stats rows."))
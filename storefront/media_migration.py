@@ -0,0 +1,317 @@
+"""
+Migration of locally stored images to Cloudinary, run by
+``manage.py migrate_media``.
+
+Every image field of every installed model is covered (store logos and
+covers, listing images and galleries, blog images, profile pictures). Rows are
+streamed in primary-key order with ``iterator()`` and handled in chunks of
+MEDIA_MIGRATION_CHUNK_SIZE. For each chunk, a pool of MEDIA_MIGRATION_WORKERS
+threads checksums the local files and uploads the ones whose contents were
+never uploaded before. Files already recorded in ``MigratedMedia`` under the
+same SHA-256 reuse that upload. The rows, the new ``MigratedMedia`` records
+and the field's ``MediaMigrationCheckpoint`` are then written together by the
+calling thread.
+
+An interrupted run picks up after the last chunk it finished. Rows whose
+upload failed are kept on the checkpoint and retried at the start of the next
+run, and a field is only marked complete once none are left. Workers never
+touch the database.
+"""
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MediaMigrationCheckpoint, MigratedMedia
+
+try:
+    from cloudinary.models import CloudinaryField
+except ImportError:
+    CloudinaryField = None
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class MigrationReport:
+    """Totals for one run over all of its fields"""
+
+    def __init__(self):
+        self.migrated = 0
+        self.reused = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_uploaded = 0
+        self.started = time.monotonic()
+        self.seconds = 0.0
+
+    def finish(self):
+        self.seconds = time.monotonic() - self.started
+        return self
+
+    def files_per_second(self):
+        return self.migrated / self.seconds if self.seconds > 0 else 0.0
+
+    def megabytes_per_second(self):
+        return self.bytes_uploaded / 1024 / 1024 / self.seconds if self.seconds > 0 else 0.0
+
+
+def _is_image_field(field):
+    if isinstance(field, models.ImageField):
+        return True
+    return CloudinaryField is not None and isinstance(field, CloudinaryField) and field.resource_type == 'image'
+
+
+def field_label(model, field):
+    return f'{model._meta.label}.{field.name}'
+
+
+def media_fields(labels=None):
+    """``(model, field)`` for every image field, or only those named in ``labels``"""
+    found = []
+    for model in apps.get_models():
+        if model._meta.proxy:
+            continue
+        for field in model._meta.concrete_fields:
+            if _is_image_field(field) and (labels is None or field_label(model, field) in labels):
+                found.append((model, field))
+    return found
+
+
+def upload_folder(model, field):
+    # CloudinaryFields are declared with their folder
+    folder = getattr(field, 'options', {}).get('folder')
+    if not folder:
+        folder = f'homabay_souq/{model._meta.app_label}/{model._meta.model_name}'
+    return folder.rstrip('/')
+
+
+def cloudinary_upload(path, folder):
+    import cloudinary.uploader
+
+    return cloudinary.uploader.upload(path, folder=folder, resource_type='image')
+
+
+def stored_value(field, result):
+    """What ``field`` should hold for the upload described by ``result``"""
+    if CloudinaryField is not None and isinstance(field, CloudinaryField):
+        from cloudinary import CloudinaryResource
+
+        return CloudinaryResource(
+            result['public_id'], version=result.get('version'), format=result.get('format'),
+            type=field.type, resource_type=field.resource_type,
+        ).get_prep_value()
+    return result['public_id']
+
+
+def _local_path(value):
+    """Path under MEDIA_ROOT of a field value, or None if its file is not stored locally"""
+    if not value:
+        return None
+    public_id = getattr(value, 'public_id', None)
+    if public_id:
+        # A CloudinaryField reads a legacy local path as "<public id>.<format>"
+        name = f'{public_id}.{value.format}' if value.format else public_id
+    else:
+        name = getattr(value, 'name', None) or str(value)
+    path = os.path.join(settings.MEDIA_ROOT, name.lstrip('/'))
+    return path if os.path.isfile(path) else None
+
+
+def _checksum(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+                digest.update(block)
+    except OSError as e:
+        logger.warning(f"Could not read {path}: {str(e)}")
+        return None
+    return digest.hexdigest()
+
+
+def _renders(model, field):
+    from listings.renditions import IMAGE_FIELDS
+
+    cloud = CloudinaryField is not None and isinstance(field, CloudinaryField)
+    return cloud and (model._meta.label, field.name) in IMAGE_FIELDS
+
+
+def _upload(upload, path, folder, field, render):
+    """Runs on a worker thread: upload one file and make its renditions"""
+    value = stored_value(field, upload(path, folder))
+    renditions = []
+    if render:
+        from listings.renditions import make_renditions
+
+        renditions = make_renditions(field.to_python(value))
+    return value, renditions
+
+
+def _migrate_chunk(model, field, rows, pool, upload, checkpoint, report):
+    from listings.renditions import save_renditions, source_name
+
+    label = field_label(model, field)
+    local = [(pk, path) for pk, path in ((pk, _local_path(value)) for pk, value in rows) if path]
+    skipped = len(rows) - len(local)
+    checksums = list(pool.map(_checksum, [path for _, path in local]))
+
+    known = dict(
+        MigratedMedia.objects.filter(checksum__in=[c for c in checksums if c])
+        .values_list('checksum', 'stored_value')
+    )
+    render = _renders(model, field)
+    folder = upload_folder(model, field)
+    futures = {}
+    for (pk, path), checksum in zip(local, checksums):
+        if checksum and checksum not in known and checksum not in futures:
+            futures[checksum] = (path, pool.submit(_upload, upload, path, folder, field, render))
+
+    new_media, uploaded_bytes, renditions = [], 0, []
+    for checksum, (path, future) in futures.items():
+        try:
+            value, rows_rendered = future.result()
+        except Exception as e:
+            logger.warning(f"Could not upload {path} for {label}: {str(e)}")
+            continue
+        size = os.path.getsize(path)
+        known[checksum] = value
+        new_media.append(MigratedMedia(
+            checksum=checksum, stored_value=value, size=size,
+            source=os.path.relpath(path, settings.MEDIA_ROOT)[:255],
+        ))
+        uploaded_bytes += size
+        if rows_rendered:
+            renditions.append((source_name(field.to_python(value)), rows_rendered))
+
+    migrated = reused = failed = 0
+    failed_pks = []
+    uploaded = set()
+    with transaction.atomic():
+        MigratedMedia.objects.bulk_create(new_media, ignore_conflicts=True)
+        for (pk, path), checksum in zip(local, checksums):
+            if checksum not in known:
+                failed += 1
+                failed_pks.append(pk)
+                continue
+            # update() skips save(), so no slug or rendition work per row
+            model._default_manager.filter(pk=pk).update(**{field.attname: known[checksum]})
+            # Only the first row with a given checksum uploaded it
+            if checksum in futures and checksum not in uploaded:
+                uploaded.add(checksum)
+                migrated += 1
+            else:
+                reused += 1
+        for source, rendered in renditions:
+            save_renditions(source, rendered)
+
+        # Retried rows sit below last_pk; their pks leave the list unless they failed again
+        chunk_pks = {pk for pk, _ in rows}
+        checkpoint.failed_pks = sorted({pk for pk in checkpoint.failed_pks if pk not in chunk_pks} | set(failed_pks))
+        checkpoint.last_pk = max(checkpoint.last_pk, rows[-1][0])
+        checkpoint.migrated += migrated
+        checkpoint.reused += reused
+        checkpoint.skipped += skipped
+        checkpoint.failed += failed
+        checkpoint.bytes_uploaded += uploaded_bytes
+        checkpoint.save()
+
+    report.migrated += migrated
+    report.reused += reused
+    report.skipped += skipped
+    report.failed += failed
+    report.bytes_uploaded += uploaded_bytes
+
+
+def migrate_media(fields=None, upload=None, workers=None, chunk_size=None, limit=0, restart=False, progress=None):
+    """
+    Upload the local files of ``fields`` (``(model, field)`` pairs, default
+    every image field) and point their rows at the uploads.
+
+    ``upload(path, folder)`` returns a Cloudinary upload response and defaults
+    to ``cloudinary.uploader.upload``. ``limit`` caps the rows examined in this
+    run. ``restart`` discards the checkpoints and starts from the first row.
+    ``progress(label, report)`` is called after every chunk. Returns a
+    ``MigrationReport``.
+    """
+    fields = media_fields() if fields is None else fields
+    upload = upload or cloudinary_upload
+    workers = workers or getattr(settings, 'MEDIA_MIGRATION_WORKERS', 8)
+    chunk_size = chunk_size or getattr(settings, 'MEDIA_MIGRATION_CHUNK_SIZE', 100)
+    report = MigrationReport()
+    remaining = limit or None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for model, field in fields:
+            label = field_label(model, field)
+            if restart:
+                MediaMigrationCheckpoint.objects.filter(field=label).delete()
+            checkpoint, _ = MediaMigrationCheckpoint.objects.get_or_create(field=label)
+
+            candidates = (
+                model._default_manager
+                .exclude(**{f'{field.attname}__isnull': True})
+                .exclude(**{field.attname: ''})
+                .order_by('pk')
+                .values_list('pk', field.attname)
+            )
+            retry = list(candidates.filter(pk__in=checkpoint.failed_pks))
+            # Failed rows that have since been cleared need no retry
+            checkpoint.failed_pks = [pk for pk, _ in retry]
+            rows = chain(retry, candidates.filter(pk__gt=checkpoint.last_pk).iterator(chunk_size=chunk_size))
+            exhausted = False
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = list(islice(rows, size))
+                if not chunk:
+                    exhausted = True
+                    break
+                _migrate_chunk(model, field, chunk, pool, upload, checkpoint, report)
+                if remaining is not None:
+                    remaining -= len(chunk)
+                if progress:
+                    progress(label, report)
+
+            if exhausted:
+                checkpoint.completed_at = None if checkpoint.failed_pks else timezone.now()
+                checkpoint.save(update_fields=['failed_pks', 'completed_at', 'updated_at'])
+            if remaining == 0:
+                break
+
+    report.finish()
+    logger.info(
+        f"Media migration: {report.migrated} uploaded, {report.reused} reused, {report.skipped} skipped, "
+        f"{report.failed} failed in {report.seconds:.1f}s ({report.files_per_second():.1f} files/s)"
+    )
+    return report
+
+
+def pending_media(fields=None):
+    """``{label: local files not yet migrated}``, without uploading anything"""
+    fields = media_fields() if fields is None else fields
+    checkpoints = {
+        label: (last_pk, failed_pks)
+        for label, last_pk, failed_pks in MediaMigrationCheckpoint.objects.values_list('field', 'last_pk', 'failed_pks')
+    }
+    pending = {}
+    for model, field in fields:
+        label = field_label(model, field)
+        last_pk, failed_pks = checkpoints.get(label, (0, []))
+        values = (
+            model._default_manager.filter(Q(pk__gt=last_pk) | Q(pk__in=failed_pks))
+            .exclude(**{f'{field.attname}__isnull': True})
+            .exclude(**{field.attname: ''})
+            .values_list(field.attname, flat=True)
+            .iterator()
+        )
+        pending[label] = sum(1 for value in values if _local_path(value))
+    return pending
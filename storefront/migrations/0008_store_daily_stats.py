@@ -0,0 +1,68 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_store_stats(apps, schema_editor):
+    OrderItem = apps.get_model('listings', 'OrderItem')
+    StoreDailyStats = apps.get_model('storefront', 'StoreDailyStats')
+
+    rows = OrderItem.objects.filter(
+        order__paid_at__isnull=False, listing__store__isnull=False
+    ).exclude(order__status='cancelled').annotate(day=TruncDate('order__paid_at')).values(
+        'listing__store_id', 'day', 'listing__category_id', 'order__city'
+    ).annotate(
+        revenue=Sum('price'),
+        item_count=Sum('quantity'),
+        order_count=Count('order', distinct=True),
+        buyer_count=Count('order__user', distinct=True),
+    ).order_by()
+
+    StoreDailyStats.objects.bulk_create([
+        StoreDailyStats(
+            store_id=row['listing__store_id'],
+            date=row['day'],
+            category_id=row['listing__category_id'],
+            city=row['order__city'] or '',
+            revenue=row['revenue'],
+            items=row['item_count'],
+            orders=row['order_count'],
+            buyers=row['buyer_count'],
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0023_alter_listing_image_alter_listingimage_image'),
+        ('storefront', '0007_convert_store_images_to_cloudinary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('orders', models.IntegerField(default=0)),
+                ('items', models.IntegerField(default=0)),
+                ('buyers', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='listings.category')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='storefront.store')),
+            ],
+            options={
+                'verbose_name_plural': 'Store daily stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['store', 'date'], name='storefront__store_i_a59b9f_idx')],
+                'unique_together': {('store', 'date', 'category', 'city')},
+            },
+        ),
+        migrations.RunPython(backfill_store_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:23
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+
+
+def backfill_payment_buckets(apps, schema_editor):
+    MpesaPayment = apps.get_model('storefront', 'MpesaPayment')
+    PaymentOutcomeBucket = apps.get_model('storefront', 'PaymentOutcomeBucket')
+
+    recent = Q(transaction_date__gte=timezone.now() - timedelta(hours=24))
+    for resolution, trunc, payments in (
+        ('hour', TruncHour, MpesaPayment.objects.all()),
+        ('minute', TruncMinute, MpesaPayment.objects.filter(recent)),
+    ):
+        rows = payments.annotate(start=trunc('transaction_date')).values('start').annotate(
+            attempt_count=Count('id'),
+            completed_count=Count('id', filter=Q(status='completed')),
+            failed_count=Count('id', filter=Q(status='failed')),
+            completed_amount=Sum('amount', filter=Q(status='completed'), default=0),
+        ).order_by()
+        PaymentOutcomeBucket.objects.bulk_create([
+            PaymentOutcomeBucket(
+                resolution=resolution,
+                start=row['start'],
+                attempts=row['attempt_count'],
+                completed=row['completed_count'],
+                failed=row['failed_count'],
+                revenue=row['completed_amount'],
+            )
+            for row in rows
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0008_store_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentOutcomeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('start', models.DateTimeField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'ordering': ['-start'],
+                'unique_together': {('resolution', 'start')},
+            },
+        ),
+        migrations.RunPython(backfill_payment_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0009_payment_outcome_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+                ('rule', models.CharField(max_length=50)),
+                ('severity', models.CharField(choices=[('warning', 'Warning'), ('critical', 'Critical')], max_length=10)),
+                ('message', models.TextField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('first_seen_at', models.DateTimeField()),
+                ('last_seen_at', models.DateTimeField()),
+                ('last_notified_at', models.DateTimeField(blank=True, null=True)),
+                ('notified_severity', models.CharField(blank=True, max_length=10)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-first_seen_at'],
+                'indexes': [models.Index(fields=['is_active', 'severity'], name='storefront__is_acti_2b28b6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0011_renewal_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transition', models.CharField(choices=[('trial_converted', 'Trial converted to active'), ('trial_expired', 'Trial expired unpaid'), ('past_due_cancelled', 'Past due cancelled after grace period')], max_length=30)),
+                ('subscription_count', models.PositiveIntegerField(default=0)),
+                ('stores_downgraded', models.PositiveIntegerField(default=0)),
+                ('subscription_ids', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
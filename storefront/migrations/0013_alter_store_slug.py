@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0012_subscription_transition'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='store',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0013_alter_store_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaMigrationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(help_text='app_label.Model.field', max_length=150, unique=True)),
+                ('last_pk', models.BigIntegerField(default=0)),
+                ('migrated', models.PositiveIntegerField(default=0)),
+                ('reused', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('bytes_uploaded', models.PositiveBigIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['field'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MigratedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(max_length=64, unique=True)),
+                ('stored_value', models.CharField(max_length=255)),
+                ('source', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0014_media_migration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0015_store_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='storedailystats',
+            name='buyers',
+        ),
+        migrations.RemoveField(
+            model_name='storedailystats',
+            name='orders',
+        ),
+    ]
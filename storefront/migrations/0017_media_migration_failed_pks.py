@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0016_remove_storedailystats_order_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediamigrationcheckpoint',
+            name='failed_pks',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
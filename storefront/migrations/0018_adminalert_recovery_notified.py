@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0017_media_migration_failed_pks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminalert',
+            name='recovery_notified',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_order_counts(apps, schema_editor):
+    OrderItem = apps.get_model('listings', 'OrderItem')
+    StoreDailyStats = apps.get_model('storefront', 'StoreDailyStats')
+    StoreDailyOrders = apps.get_model('storefront', 'StoreDailyOrders')
+
+    items = OrderItem.objects.filter(
+        order__paid_at__isnull=False, listing__store__isnull=False
+    ).exclude(order__status='cancelled').annotate(day=TruncDate('order__paid_at'))
+
+    for row in items.values('listing__store_id', 'day', 'listing__category_id', 'order__city').annotate(
+        order_count=Count('order', distinct=True),
+    ).order_by():
+        StoreDailyStats.objects.filter(
+            store_id=row['listing__store_id'], date=row['day'],
+            category_id=row['listing__category_id'], city=row['order__city'] or '',
+        ).update(orders=row['order_count'])
+
+    StoreDailyOrders.objects.bulk_create([
+        StoreDailyOrders(
+            store_id=row['listing__store_id'],
+            date=row['day'],
+            city=row['order__city'] or '',
+            orders=row['order_count'],
+            buyers=row['buyer_count'],
+        )
+        for row in items.values('listing__store_id', 'day', 'order__city').annotate(
+            order_count=Count('order', distinct=True),
+            buyer_count=Count('order__user', distinct=True),
+        ).order_by()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0023_alter_listing_image_alter_listingimage_image'),
+        ('storefront', '0018_adminalert_recovery_notified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedailystats',
+            name='orders',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StoreDailyOrders',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('orders', models.IntegerField(default=0)),
+                ('buyers', models.IntegerField(default=0)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_orders', to='storefront.store')),
+            ],
+            options={
+                'verbose_name_plural': 'Store daily orders',
+                'ordering': ['-date'],
+                'unique_together': {('store', 'date', 'city')},
+            },
+        ),
+        migrations.RunPython(backfill_order_counts, migrations.RunPython.noop),
+    ]
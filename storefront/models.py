@@ -3,11 +3,14 @@ from django.db import models
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 
+from homabay_souq.slugs import save_with_unique_slug
+
 
 class Store(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stores')
     name = models.CharField(max_length=255)
-    slug = models.SlugField(max_length=255, unique=True)
+    # Left blank, a unique slug is derived from the name on save
+    slug = models.SlugField(max_length=255, unique=True, blank=True)
     # Optional logo and cover image for storefronts
     # Use CloudinaryField when Cloudinary is configured (keeps behavior consistent with ListingImage)
     if 'cloudinary' in __import__('django.conf').conf.settings.INSTALLED_APPS and hasattr(__import__('django.conf').conf.settings, 'CLOUDINARY_CLOUD_NAME') and __import__('django.conf').conf.settings.CLOUDINARY_CLOUD_NAME:
@@ -20,6 +23,7 @@ class Store(models.Model):
     description = models.TextField(blank=True)
     is_premium = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -72,6 +76,11 @@ class Store(models.Model):
                     raise ValidationError("You must upgrade to Pro (subscribe) to create additional storefronts.")
 
     def save(self, *args, **kwargs):
+        if not self.slug:
+            return save_with_unique_slug(self, self.name, self._clean_and_save, *args, **kwargs)
+        return self._clean_and_save(*args, **kwargs)
+
+    def _clean_and_save(self, *args, **kwargs):
         # Run full_clean to ensure model-level validation runs on save as well as via forms
         self.full_clean()
         return super().save(*args, **kwargs)
@@ -147,3 +156,237 @@ class MpesaPayment(models.Model):
 
     def __str__(self):
         return f"Payment for {self.subscription.store.name} - {self.amount} - {self.status}"
+
+
+class StoreDailyStats(models.Model):
+    """
+    Paid sales rolled up per store, day, category and buyer city.
+
+    Maintained incrementally by ``storefront.rollups`` as orders are paid or
+    cancelled; ``manage.py rebuild_store_stats`` recomputes it from scratch.
+    ``orders`` counts the orders with an item in the row's category, so it
+    only adds up per category; ``StoreDailyOrders`` has the store's orders.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    category = models.ForeignKey('listings.Category', on_delete=models.SET_NULL, null=True, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    items = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ('store', 'date', 'category', 'city')
+        indexes = [
+            models.Index(fields=['store', 'date']),
+        ]
+        verbose_name_plural = 'Store daily stats'
+
+    def __str__(self):
+        return f"{self.store.name} - {self.date}"
+
+
+class StoreDailyOrders(models.Model):
+    """
+    Paid orders and distinct buyers per store, day and buyer city.
+
+    An order has one paid day and one city, so each of its stores counts it
+    in exactly one row and the counts add up across days and cities. An order
+    with items from two of a seller's stores counts once for each store.
+    Maintained alongside ``StoreDailyStats``.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='daily_orders')
+    date = models.DateField()
+    city = models.CharField(max_length=100, blank=True)
+    orders = models.IntegerField(default=0)
+    buyers = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ('store', 'date', 'city')
+        verbose_name_plural = 'Store daily orders'
+
+    def __str__(self):
+        return f"{self.store.name} - {self.date}"
+
+
+class PaymentOutcomeBucket(models.Model):
+    """
+    Rolling counts of M-Pesa payment attempts and outcomes per minute and per
+    hour, keyed by when the payment was started. Maintained by
+    ``storefront.monitoring``; minute buckets are pruned after a day.
+    """
+    RESOLUTIONS = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+    ]
+
+    resolution = models.CharField(max_length=6, choices=RESOLUTIONS)
+    start = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-start']
+        unique_together = ('resolution', 'start')
+
+    def __str__(self):
+        return f"{self.resolution} from {self.start}: {self.completed}/{self.attempts} completed"
+
+
+class AdminAlert(models.Model):
+    """
+    Current state of one alert rule, identified by its fingerprint.
+
+    Written only by ``manage.py evaluate_alerts`` (see ``storefront.alerts``);
+    the payment monitor just reads the active rows.
+    """
+    SEVERITY_CHOICES = [
+        ('warning', 'Warning'),
+        ('critical', 'Critical'),
+    ]
+
+    fingerprint = models.CharField(max_length=64, unique=True)
+    rule = models.CharField(max_length=50)
+    severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES)
+    message = models.TextField()
+    is_active = models.BooleanField(default=True)
+    first_seen_at = models.DateTimeField()
+    last_seen_at = models.DateTimeField()
+    last_notified_at = models.DateTimeField(null=True, blank=True)
+    notified_severity = models.CharField(max_length=10, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    # Set once the recovery email for the latest resolution has gone out
+    recovery_notified = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-first_seen_at']
+        indexes = [
+            models.Index(fields=['is_active', 'severity']),
+        ]
+
+    def __str__(self):
+        state = 'active' if self.is_active else 'resolved'
+        return f"{self.rule} ({self.severity}, {state})"
+
+
+class RenewalRun(models.Model):
+    """One pass of ``manage.py process_subscriptions`` over the due renewals"""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    dispatched = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    unconfirmed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Renewal run {self.started_at:%Y-%m-%d %H:%M}: {self.dispatched} dispatched, {self.failed} failed"
+
+    def throughput(self):
+        """STK pushes attempted per second, once the run has finished"""
+        if not self.finished_at:
+            return None
+        seconds = (self.finished_at - self.started_at).total_seconds()
+        return (self.dispatched + self.failed) / seconds if seconds > 0 else None
+
+
+class RenewalAttempt(models.Model):
+    """
+    The renewal charge for one subscription's billing date.
+
+    The row is reserved before the STK push is sent and is unique per billing
+    date, so a run that crashes or overlaps another never charges twice.
+    """
+    STATUS_CHOICES = [
+        ('reserved', 'Reserved'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('unknown', 'Unknown'),
+    ]
+
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='renewal_attempts')
+    billing_date = models.DateTimeField()
+    run = models.ForeignKey(RenewalRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempts')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='reserved')
+    payment = models.ForeignKey(MpesaPayment, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ('subscription', 'billing_date')
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Renewal of subscription {self.subscription_id} due {self.billing_date}: {self.status}"
+
+
+class SubscriptionTransition(models.Model):
+    """
+    Audit record for one batch of subscriptions moved between states by the
+    nightly lifecycle job (``storefront.lifecycle``).
+    """
+    TRANSITION_CHOICES = [
+        ('trial_converted', 'Trial converted to active'),
+        ('trial_expired', 'Trial expired unpaid'),
+        ('past_due_cancelled', 'Past due cancelled after grace period'),
+    ]
+
+    transition = models.CharField(max_length=30, choices=TRANSITION_CHOICES)
+    subscription_count = models.PositiveIntegerField(default=0)
+    stores_downgraded = models.PositiveIntegerField(default=0)
+    subscription_ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_transition_display()}: {self.subscription_count} subscriptions"
+
+
+class MediaMigrationCheckpoint(models.Model):
+    """How far ``manage.py migrate_media`` has got through one image field"""
+    field = models.CharField(max_length=150, unique=True, help_text="app_label.Model.field")
+    last_pk = models.BigIntegerField(default=0)
+    # Rows up to last_pk whose upload failed; the next run retries them first
+    failed_pks = models.JSONField(default=list, blank=True)
+    migrated = models.PositiveIntegerField(default=0)
+    reused = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    bytes_uploaded = models.PositiveBigIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['field']
+
+    def __str__(self):
+        state = 'complete' if self.completed_at else f'after pk {self.last_pk}'
+        return f"{self.field}: {self.migrated} migrated, {state}"
+
+
+class MigratedMedia(models.Model):
+    """
+    A file the media migration has uploaded, by the SHA-256 of its contents.
+    Rows whose file has the same checksum point at the existing upload
+    instead of uploading it again.
+    """
+    checksum = models.CharField(max_length=64, unique=True)
+    stored_value = models.CharField(max_length=255)
+    source = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.source} -> {self.stored_value}"
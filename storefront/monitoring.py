@@ -81,27 +81,75 @@ def handle_mpesa_error(func):
                 }, status=500)
     return wrapper
 
+def bucket_start(moment, resolution):
+    if resolution == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_payment_outcome(transaction_date, attempts=0, completed=0, failed=0, revenue=0):
+    """Add to the minute and hour buckets covering ``transaction_date``"""
+    from django.db.models import F
+    from .models import PaymentOutcomeBucket
+
+    for resolution in ('minute', 'hour'):
+        bucket, created = PaymentOutcomeBucket.objects.get_or_create(
+            resolution=resolution,
+            start=bucket_start(transaction_date, resolution),
+        )
+        PaymentOutcomeBucket.objects.filter(pk=bucket.pk).update(
+            attempts=F('attempts') + attempts,
+            completed=F('completed') + completed,
+            failed=F('failed') + failed,
+            revenue=F('revenue') + revenue,
+        )
+        if created and resolution == 'minute':
+            prune_minute_buckets()
+
+
+def prune_minute_buckets(now=None):
+    from datetime import timedelta
+    from .models import PaymentOutcomeBucket
+
+    retention = timedelta(hours=getattr(settings, 'PAYMENT_MINUTE_BUCKET_RETENTION_HOURS', 24))
+    cutoff = (now or timezone.now()) - retention
+    return PaymentOutcomeBucket.objects.filter(resolution='minute', start__lt=cutoff).delete()[0]
+
+
+def payment_outcome_totals(time_period=None):
+    """
+    Attempts, completions, failures and revenue over the last ``time_period``
+    (all time if None) from a single SUM over the rolling buckets. Windows of
+    up to an hour read minute buckets, longer ones hour buckets, so the
+    window is exact to the minute or hour respectively.
+    """
+    from datetime import timedelta
+    from django.db.models import Sum
+    from .models import PaymentOutcomeBucket
+
+    buckets = PaymentOutcomeBucket.objects.filter(resolution='hour')
+    if time_period:
+        resolution = 'minute' if time_period <= timedelta(hours=1) else 'hour'
+        since = bucket_start(timezone.now() - time_period, resolution)
+        buckets = PaymentOutcomeBucket.objects.filter(resolution=resolution, start__gte=since)
+    return buckets.aggregate(
+        attempts=Sum('attempts', default=0),
+        completed=Sum('completed', default=0),
+        failed=Sum('failed', default=0),
+        revenue=Sum('revenue', default=0),
+    )
+
+
 class PaymentMonitor:
     """Class to monitor payment health and metrics"""
     
     @staticmethod
     def get_payment_success_rate(time_period=None):
         """Calculate payment success rate"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        if time_period:
-            start_time = timezone.now() - time_period
-            payments = MpesaPayment.objects.filter(transaction_date__gte=start_time)
-        else:
-            payments = MpesaPayment.objects.all()
-            
-        total = payments.count()
-        if total == 0:
+        totals = payment_outcome_totals(time_period)
+        if totals['attempts'] == 0:
             return 100.0
-            
-        successful = payments.filter(status='completed').count()
-        return (successful / total) * 100
+        return (totals['completed'] / totals['attempts']) * 100
 
     @staticmethod
     def get_failed_payments(limit=10):
@@ -112,23 +160,53 @@ class PaymentMonitor:
 
     @staticmethod
     def get_subscription_metrics(time_period=None):
-        """Get detailed subscription health metrics"""
-        from django.db.models import Count, Avg, Sum
-        from django.db.models.functions import TruncDate
+        """
+        Get detailed subscription health metrics.
+
+        Subscription KPIs come from one conditional aggregate, payment KPIs
+        from one read of the outcome buckets, plus the daily trend query.
+        """
+        from django.db.models import Count, DecimalField, Min, OuterRef, Q, Subquery, Sum, Value
+        from django.db.models.functions import Coalesce, TruncDate
         from datetime import timedelta
 
+        now = timezone.now()
+        thirty_days_ago = now - timedelta(days=30)
+        base_queryset = Subscription.objects.all()
         if time_period:
-            start_time = timezone.now() - time_period
-            base_queryset = Subscription.objects.filter(started_at__gte=start_time)
-        else:
-            base_queryset = Subscription.objects.all()
-            start_time = base_queryset.order_by('started_at').first().started_at if base_queryset.exists() else timezone.now()
+            base_queryset = base_queryset.filter(started_at__gte=now - time_period)
+
+        # What each active subscription is actually billed: its latest completed payment
+        latest_amount = MpesaPayment.objects.filter(
+            subscription=OuterRef('pk'), status='completed'
+        ).order_by('-transaction_date').values('amount')[:1]
+        monthly_price = getattr(settings, 'SUBSCRIPTION_MONTHLY_PRICE', 999)
+        trial_over = Q(trial_ends_at__lte=now)
+        older_than_30_days = Q(started_at__lte=thirty_days_ago)
+
+        counts = base_queryset.annotate(
+            billed_amount=Coalesce(
+                Subquery(latest_amount),
+                Value(monthly_price, output_field=DecimalField(max_digits=10, decimal_places=2)),
+            )
+        ).aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='active')),
+            trialing=Count('id', filter=Q(status='trialing')),
+            past_due=Count('id', filter=Q(status='past_due')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            trials_ended=Count('id', filter=trial_over),
+            converted_trials=Count('id', filter=trial_over & Q(status='active')),
+            subs_30_days_ago=Count('id', filter=older_than_30_days),
+            still_active=Count('id', filter=older_than_30_days & Q(status='active')),
+            mrr=Sum('billed_amount', filter=trial_over & Q(status='active'), default=0),
+            first_started_at=Min('started_at'),
+        )
 
-        total = base_queryset.count()
-        active = base_queryset.filter(status='active').count()
-        trialing = base_queryset.filter(status='trialing').count()
-        past_due = base_queryset.filter(status='past_due').count()
-        cancelled = base_queryset.filter(status='cancelled').count()
+        if time_period:
+            start_time = now - time_period
+        else:
+            start_time = counts['first_started_at'] or now
 
         # Daily subscription trends
         daily_trends = base_queryset.annotate(
@@ -137,82 +215,33 @@ class PaymentMonitor:
             new_subscriptions=Count('id')
         ).order_by('-date')[:30]
 
-        # Trial conversion rate
-        trials_ended = base_queryset.filter(
-            trial_ends_at__lte=timezone.now(),
-            started_at__gte=start_time
-        ).count()
-        
-        converted_trials = base_queryset.filter(
-            trial_ends_at__lte=timezone.now(),
-            started_at__gte=start_time,
-            status='active'
-        ).count()
-
-        trial_conversion_rate = (converted_trials / trials_ended * 100) if trials_ended > 0 else 0
-
-        # Revenue metrics
-        successful_payments = MpesaPayment.objects.filter(
-            status='completed',
-            transaction_date__gte=start_time
-        )
-        
-        total_revenue = successful_payments.aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        avg_revenue_per_subscription = successful_payments.aggregate(
-            avg=Avg('amount')
-        )['avg'] or 0
-
-        # Retention metrics
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        subs_30_days_ago = base_queryset.filter(
-            started_at__lte=thirty_days_ago
-        ).count()
-        
-        still_active = base_queryset.filter(
-            started_at__lte=thirty_days_ago,
-            status='active'
-        ).count()
-
-        retention_rate = (still_active / subs_30_days_ago * 100) if subs_30_days_ago > 0 else 0
-
-        # Calculate monthly recurring revenue (MRR)
-        active_paid_subs = base_queryset.filter(
-            status='active',
-            trial_ends_at__lte=timezone.now()
-        ).count()
-        mrr = active_paid_subs * 999  # KSh 999 per subscription
+        payments = payment_outcome_totals(time_period)
+        total = counts['total']
+        trials_ended = counts['trials_ended']
+        subs_30_days_ago = counts['subs_30_days_ago']
 
         return {
             'total_subscriptions': total,
-            'active_subscriptions': active,
-            'trialing_subscriptions': trialing,
-            'past_due_subscriptions': past_due,
-            'cancelled_subscriptions': cancelled,
-            'active_rate': (active / total * 100) if total > 0 else 0,
-            'churn_rate': (cancelled / total * 100) if total > 0 else 0,
-            'trial_conversion_rate': trial_conversion_rate,
-            'retention_rate': retention_rate,
-            'total_revenue': total_revenue,
-            'avg_revenue_per_subscription': avg_revenue_per_subscription,
-            'mrr': mrr,
+            'active_subscriptions': counts['active'],
+            'trialing_subscriptions': counts['trialing'],
+            'past_due_subscriptions': counts['past_due'],
+            'cancelled_subscriptions': counts['cancelled'],
+            'active_rate': (counts['active'] / total * 100) if total > 0 else 0,
+            'churn_rate': (counts['cancelled'] / total * 100) if total > 0 else 0,
+            'trials_ended': trials_ended,
+            'trial_conversion_rate': (counts['converted_trials'] / trials_ended * 100) if trials_ended > 0 else 0,
+            'retention_rate': (counts['still_active'] / subs_30_days_ago * 100) if subs_30_days_ago > 0 else 0,
+            'total_revenue': payments['revenue'],
+            'avg_revenue_per_subscription': (
+                payments['revenue'] / payments['completed'] if payments['completed'] else 0
+            ),
+            'payment_attempts': payments['attempts'],
+            'failed_payment_count': payments['failed'],
+            'success_rate': (
+                payments['completed'] / payments['attempts'] * 100 if payments['attempts'] else 100.0
+            ),
+            'mrr': counts['mrr'],
             'daily_trends': list(daily_trends),
             'period_start': start_time,
-            'days_in_period': (timezone.now() - start_time).days
+            'days_in_period': (now - start_time).days
         }
-
-def alert_on_high_failure_rate(threshold=30):
-    """Alert if payment failure rate exceeds threshold"""
-    from datetime import timedelta
-    
-    # Check last hour's failure rate
-    failure_rate = 100 - PaymentMonitor.get_payment_success_rate(timedelta(hours=1))
-    
-    if failure_rate > threshold:
-        logger.critical(
-            f"High payment failure rate detected: {failure_rate:.2f}% "
-            f"(threshold: {threshold}%)"
-        )
-        # TODO: Implement additional alerting (email, SMS, etc.)
\ No newline at end of file
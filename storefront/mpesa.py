@@ -4,6 +4,11 @@ import base64
 from datetime import datetime
 import json
 import re
+import threading
+import time
+
+# Seconds to wait for Safaricom before giving up on a request
+REQUEST_TIMEOUT = 30
 
 
 class MpesaGateway:
@@ -17,9 +22,21 @@ class MpesaGateway:
         self.passkey = settings.MPESA_PASSKEY
         self.callback_url = settings.MPESA_CALLBACK_URL
         self.env = settings.MPESA_ENVIRONMENT
+        # One token is shared by every call (and thread) using this gateway
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
 
     def get_token(self):
-        """Get OAuth token for API calls"""
+        """Get OAuth token for API calls, reusing it until shortly before it expires"""
+        with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token_expires_at:
+                self._token, expires_in = self._fetch_token()
+                # Renew a minute early so in-flight requests never carry an expired token
+                self._token_expires_at = time.monotonic() + max(int(expires_in) - 60, 0)
+            return self._token
+
+    def _fetch_token(self):
         if self.env == "sandbox":
             api_url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
         else:
@@ -29,9 +46,10 @@ class MpesaGateway:
         headers = {"Authorization": f"Basic {auth}"}
 
         try:
-            response = requests.get(api_url, headers=headers)
+            response = requests.get(api_url, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()  # Raises an HTTPError for bad responses
-            return response.json()["access_token"]
+            data = response.json()
+            return data["access_token"], data.get("expires_in", 3599)
         except Exception as e:
             raise Exception(f"Failed to get access token: {str(e)}")
 
@@ -72,7 +90,7 @@ class MpesaGateway:
         }
 
         try:
-            response = requests.post(api_url, json=payload, headers=headers)
+            response = requests.post(api_url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
             if response.status_code != 200:
                 # Try to include useful details from the response body
                 error_msg = f"STK push failed with status {response.status_code}"
@@ -159,7 +177,7 @@ class MpesaGateway:
         }
 
         try:
-            response = requests.post(api_url, json=payload, headers=headers)
+            response = requests.post(api_url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -0,0 +1,199 @@
+"""
+Renewal charges for active subscriptions whose billing date has passed, run
+by ``manage.py process_subscriptions``.
+
+Due subscriptions are read in chunks of RENEWAL_CHUNK_SIZE in primary-key
+order, each with the phone number of its latest completed payment attached by
+a subquery. A ``RenewalAttempt`` is reserved for every subscription's billing
+date before its STK push is sent. The pushes go out through a pool of
+RENEWAL_DISPATCH_WORKERS threads that share one gateway, and so one OAuth
+token, and are paced to RENEWAL_REQUESTS_PER_SECOND. Results are written by
+the calling thread as they arrive.
+
+The reservations double as the run's checkpoint. A subscription that already
+has an attempt for its billing date is never pushed again, so a run that
+crashed can simply be started again. Reservations left behind by a crashed
+run may or may not have reached M-Pesa. They are marked ``unknown`` and their
+subscription goes past due instead of risking a second charge.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from .analytics_cache import PAYMENTS_SCOPE, bump_version
+from .models import MpesaPayment, RenewalAttempt, RenewalRun, Subscription
+from .mpesa import MpesaGateway
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces calls from any number of threads at least ``1 / rate`` seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def due_subscriptions(now):
+    """Active subscriptions past their billing date with no attempt for it yet"""
+    last_phone = MpesaPayment.objects.filter(
+        subscription=OuterRef('pk'), status='completed'
+    ).order_by('-transaction_date').values('phone_number')[:1]
+    attempted = RenewalAttempt.objects.filter(
+        subscription=OuterRef('pk'), billing_date=OuterRef('next_billing_date')
+    )
+    return Subscription.objects.filter(
+        status='active', next_billing_date__lte=now
+    ).annotate(
+        renewal_phone=Subquery(last_phone)
+    ).filter(~Exists(attempted))
+
+
+def expire_stale_reservations(now):
+    """
+    Give up on reservations older than RENEWAL_RESERVATION_TIMEOUT_MINUTES.
+    Returns how many there were.
+    """
+    cutoff = now - timedelta(minutes=getattr(settings, 'RENEWAL_RESERVATION_TIMEOUT_MINUTES', 30))
+    stale = RenewalAttempt.objects.filter(status='reserved', updated_at__lt=cutoff)
+    subscription_ids = list(stale.values_list('subscription_id', flat=True))
+    if not subscription_ids:
+        return 0
+    with transaction.atomic():
+        expired = stale.filter(subscription_id__in=subscription_ids).update(
+            status='unknown',
+            error='The run stopped before the STK push result was recorded',
+            updated_at=now,
+        )
+        Subscription.objects.filter(pk__in=subscription_ids, status='active').update(status='past_due')
+    bump_version(PAYMENTS_SCOPE)
+    logger.warning(f"{expired} renewal reservations were never confirmed; subscriptions moved to past due")
+    return expired
+
+
+def _reserve(run, subscriptions):
+    """Reserve an attempt per subscription; returns those this run now owns, by subscription id"""
+    RenewalAttempt.objects.bulk_create([
+        RenewalAttempt(subscription=subscription, billing_date=subscription.next_billing_date, run=run)
+        for subscription in subscriptions
+    ], ignore_conflicts=True)
+    return {
+        attempt.subscription_id: attempt
+        for attempt in RenewalAttempt.objects.filter(
+            run=run, status='reserved', subscription__in=subscriptions
+        )
+    }
+
+
+def _push(gateway, limiter, subscription, amount):
+    """Runs on a worker thread: no database access here"""
+    phone = gateway._normalize_phone(subscription.renewal_phone)
+    limiter.wait()
+    response = gateway.initiate_stk_push(
+        phone=phone,
+        amount=amount,
+        account_reference=f"Store-{subscription.store_id}-Renewal"
+    )
+    return phone, response
+
+
+def _record_sent(attempt, subscription, phone, response, amount):
+    with transaction.atomic():
+        attempt.payment = MpesaPayment.objects.create(
+            subscription=subscription,
+            checkout_request_id=response['CheckoutRequestID'],
+            merchant_request_id=response['MerchantRequestID'],
+            phone_number=phone,
+            amount=amount,
+            status='pending'
+        )
+        attempt.status = 'sent'
+        attempt.save(update_fields=['payment', 'status', 'updated_at'])
+
+
+def _record_failed(attempt, error):
+    attempt.status = 'failed'
+    attempt.error = str(error)
+    attempt.save(update_fields=['status', 'error', 'updated_at'])
+    logger.warning(f"Failed to initiate renewal for subscription {attempt.subscription_id}: {error}")
+
+
+def dispatch_renewals(now=None, gateway=None):
+    """
+    Send an STK push for every due renewal and return the finished ``RenewalRun``.
+    Subscriptions whose push could not be sent are moved to past due.
+    """
+    now = now or timezone.now()
+    gateway = gateway or MpesaGateway()
+    limiter = RateLimiter(getattr(settings, 'RENEWAL_REQUESTS_PER_SECOND', 5))
+    amount = getattr(settings, 'SUBSCRIPTION_MONTHLY_PRICE', 999)
+    chunk_size = getattr(settings, 'RENEWAL_CHUNK_SIZE', 200)
+
+    run = RenewalRun.objects.create()
+    run.unconfirmed = expire_stale_reservations(now)
+    cursor = 0
+    with ThreadPoolExecutor(max_workers=getattr(settings, 'RENEWAL_DISPATCH_WORKERS', 8)) as pool:
+        while True:
+            chunk = list(
+                due_subscriptions(now).filter(pk__gt=cursor).order_by('pk')[:chunk_size]
+            )
+            if not chunk:
+                break
+            cursor = chunk[-1].pk
+
+            # Nothing to charge without a number from an earlier payment
+            billable = [subscription for subscription in chunk if subscription.renewal_phone]
+            run.skipped += len(chunk) - len(billable)
+            reserved = _reserve(run, billable)
+            futures = {
+                pool.submit(_push, gateway, limiter, subscription, amount): subscription
+                for subscription in billable
+                if subscription.pk in reserved
+            }
+
+            failed_ids = []
+            for future in as_completed(futures):
+                subscription = futures[future]
+                attempt = reserved[subscription.pk]
+                try:
+                    phone, response = future.result()
+                except Exception as e:
+                    _record_failed(attempt, e)
+                    failed_ids.append(subscription.pk)
+                    continue
+                _record_sent(attempt, subscription, phone, response, amount)
+                run.dispatched += 1
+            if failed_ids:
+                Subscription.objects.filter(pk__in=failed_ids).update(status='past_due')
+                bump_version(PAYMENTS_SCOPE)
+                run.failed += len(failed_ids)
+            run.save(update_fields=['dispatched', 'failed', 'skipped', 'unconfirmed'])
+
+    run.finished_at = timezone.now()
+    run.save(update_fields=['dispatched', 'failed', 'skipped', 'unconfirmed', 'finished_at'])
+    throughput = run.throughput()
+    logger.info(
+        f"Renewal run {run.pk}: {run.dispatched} dispatched, {run.failed} failed, "
+        f"{run.skipped} skipped, {run.unconfirmed} unconfirmed"
+        + (f", {throughput:.1f} pushes/s" if throughput else "")
+    )
+    return run
@@ -0,0 +1,143 @@
+"""
+Incremental maintenance of ``StoreDailyStats`` and ``StoreDailyOrders``.
+
+An order's items count towards the rollups while the order is paid (has a
+``paid_at``) and not cancelled. ``StoreDailyStats`` rows are keyed by the
+store and category of the listing, the local date the order was paid and the
+order's city; ``StoreDailyOrders`` rows by the store, date and city only.
+
+Revenue and items add up across every row. An order counts once per store in
+``StoreDailyOrders`` and once per store and category in ``StoreDailyStats``,
+and a buyer once per store, day and city, so the order and buyer counts are
+kept at the grain where they add up.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from listings.models import OrderItem
+from .models import StoreDailyOrders, StoreDailyStats
+
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def is_counted(order):
+    return order.paid_at is not None and order.status not in EXCLUDED_STATUSES
+
+
+def counted_items():
+    return OrderItem.objects.filter(order__paid_at__isnull=False).exclude(order__status__in=EXCLUDED_STATUSES)
+
+
+def _stats_key(order, item):
+    return (
+        item.listing.store_id,
+        timezone.localdate(order.paid_at),
+        item.listing.category_id,
+        order.city or '',
+    )
+
+
+def _buyer_has_other_orders(order, store_id, day):
+    """Whether the buyer has another counted order from this store on ``day`` in the order's city"""
+    return counted_items().filter(
+        order__user_id=order.user_id, order__city=order.city, order__paid_at__date=day, listing__store_id=store_id,
+    ).exclude(order_id=order.pk).exists()
+
+
+def apply_items(order, items, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) some of a paid order's items"""
+    groups = defaultdict(list)
+    for item in items:
+        if item.listing.store_id:
+            groups[_stats_key(order, item)].append(item)
+    if not groups:
+        return
+
+    # The order's remaining items decide whether it already counts (or still
+    # counts) for a store and category
+    others = set(
+        OrderItem.objects.filter(order_id=order.pk).exclude(pk__in=[item.pk for item in items])
+        .values_list('listing__store_id', 'listing__category_id')
+    )
+    other_stores = {store_id for store_id, _ in others}
+    day = timezone.localdate(order.paid_at)
+    city = order.city or ''
+
+    with transaction.atomic():
+        for key, group in groups.items():
+            store_id, _, category_id, _ = key
+            stats, _ = StoreDailyStats.objects.get_or_create(
+                store_id=store_id, date=day, category_id=category_id, city=city
+            )
+            StoreDailyStats.objects.filter(pk=stats.pk).update(
+                revenue=F('revenue') + sign * sum((item.price for item in group), Decimal('0')),
+                items=F('items') + sign * sum(item.quantity for item in group),
+                orders=F('orders') + (0 if (store_id, category_id) in others else sign),
+            )
+        for store_id in {key[0] for key in groups} - other_stores:
+            daily, _ = StoreDailyOrders.objects.get_or_create(store_id=store_id, date=day, city=city)
+            new_buyer = order.user_id is not None and not _buyer_has_other_orders(order, store_id, day)
+            StoreDailyOrders.objects.filter(pk=daily.pk).update(
+                orders=F('orders') + sign,
+                buyers=F('buyers') + (sign if new_buyer else 0),
+            )
+
+
+def rebuild_store_stats(stores=None):
+    """
+    Recompute the rollups from order items with one grouped query each.
+    ``stores`` limits the rebuild to a queryset or list of stores.
+    Returns the number of ``StoreDailyStats`` rows written.
+    """
+    items = counted_items().filter(listing__store__isnull=False)
+    existing = StoreDailyStats.objects.all()
+    existing_orders = StoreDailyOrders.objects.all()
+    if stores is not None:
+        items = items.filter(listing__store__in=stores)
+        existing = existing.filter(store__in=stores)
+        existing_orders = existing_orders.filter(store__in=stores)
+    items = items.annotate(day=TruncDate('order__paid_at'))
+
+    rows = items.values(
+        'listing__store_id', 'day', 'listing__category_id', 'order__city'
+    ).annotate(
+        revenue=Sum('price'),
+        item_count=Sum('quantity'),
+        order_count=Count('order', distinct=True),
+    ).order_by()
+    order_rows = items.values('listing__store_id', 'day', 'order__city').annotate(
+        order_count=Count('order', distinct=True),
+        buyer_count=Count('order__user', distinct=True),
+    ).order_by()
+
+    with transaction.atomic():
+        existing.delete()
+        existing_orders.delete()
+        created = StoreDailyStats.objects.bulk_create([
+            StoreDailyStats(
+                store_id=row['listing__store_id'],
+                date=row['day'],
+                category_id=row['listing__category_id'],
+                city=row['order__city'] or '',
+                revenue=row['revenue'],
+                items=row['item_count'],
+                orders=row['order_count'],
+            )
+            for row in rows
+        ], batch_size=500)
+        StoreDailyOrders.objects.bulk_create([
+            StoreDailyOrders(
+                store_id=row['listing__store_id'],
+                date=row['day'],
+                city=row['order__city'] or '',
+                orders=row['order_count'],
+                buyers=row['buyer_count'],
+            )
+            for row in order_rows
+        ], batch_size=500)
+    return len(created)
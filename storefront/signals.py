@@ -0,0 +1,90 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from listings.models import Listing, Order, OrderItem
+from reviews.models import Review
+from .analytics_cache import PAYMENTS_SCOPE, bump_version, seller_scope
+from .models import MpesaPayment, Store, Subscription
+from .monitoring import record_payment_outcome
+from .rollups import apply_items, is_counted
+
+
+@receiver(post_init, sender=Order)
+def remember_rollup_state(sender, instance, **kwargs):
+    # Deferred fields would cost a query each; only track fully loaded orders
+    if 'paid_at' in instance.__dict__ and 'status' in instance.__dict__:
+        instance._rollup_counted = instance.pk is not None and is_counted(instance)
+
+
+@receiver(post_save, sender=Order)
+def roll_up_paid_order(sender, instance, created, **kwargs):
+    """Add an order's items to the store rollups when it is paid, remove them if it is cancelled"""
+    was_counted = False if created else getattr(instance, '_rollup_counted', None)
+    now_counted = is_counted(instance)
+    if was_counted is not None and was_counted != now_counted:
+        items = list(instance.order_items.select_related('listing'))
+        if items:
+            apply_items(instance, items, 1 if now_counted else -1)
+            for seller_id in {item.listing.seller_id for item in items}:
+                bump_version(seller_scope(seller_id))
+    instance._rollup_counted = now_counted
+
+
+@receiver(post_save, sender=OrderItem)
+def roll_up_added_item(sender, instance, created, **kwargs):
+    if created:
+        bump_version(seller_scope(instance.listing.seller_id))
+        if is_counted(instance.order):
+            apply_items(instance.order, [instance], 1)
+
+
+@receiver(post_delete, sender=OrderItem)
+def roll_up_removed_item(sender, instance, **kwargs):
+    try:
+        order = instance.order
+    except Order.DoesNotExist:
+        return
+    if is_counted(order):
+        apply_items(order, [instance], -1)
+        bump_version(seller_scope(instance.listing.seller_id))
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_seller_analytics(sender, instance, **kwargs):
+    bump_version(seller_scope(instance.seller_id))
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store_owner_analytics(sender, instance, **kwargs):
+    bump_version(seller_scope(instance.owner_id))
+
+
+@receiver(post_init, sender=MpesaPayment)
+def remember_payment_status(sender, instance, **kwargs):
+    if 'status' in instance.__dict__:
+        instance._recorded_status = instance.status if instance.pk else None
+
+
+@receiver(post_save, sender=MpesaPayment)
+def record_payment_bucket(sender, instance, created, **kwargs):
+    """Keep the rolling outcome buckets in step with payment attempts and results"""
+    previous = None if created else getattr(instance, '_recorded_status', instance.status)
+    if previous == instance.status and not created:
+        return
+    deltas = {'attempts': 1 if created else 0, 'completed': 0, 'failed': 0, 'revenue': 0}
+    for status, sign in ((previous, -1), (instance.status, 1)):
+        if status in ('completed', 'failed'):
+            deltas[status] += sign
+        if status == 'completed':
+            deltas['revenue'] += sign * instance.amount
+    record_payment_outcome(instance.transaction_date, **deltas)
+    instance._recorded_status = instance.status
+
+
+@receiver(post_save, sender=MpesaPayment)
+@receiver(post_save, sender=Subscription)
+def invalidate_payment_monitor(sender, instance, **kwargs):
+    bump_version(PAYMENTS_SCOPE)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..alerts import evaluate_alerts
+from ..models import AdminAlert
+
+
+def snapshot(past_due=0, attempts=0, completed=0, failed=0):
+    payments = {'attempts': attempts, 'completed': completed, 'failed': failed, 'revenue': 0}
+    return {
+        'subscriptions': {
+            'past_due_subscriptions': past_due,
+            'trials_ended': 0,
+            'trial_conversion_rate': 0,
+            'churn_rate': 0,
+        },
+        'payments_24h': payments,
+        'payments_1h': payments,
+    }
+
+
+@override_settings(ADMINS=[('Ops', 'ops@example.com')], ALERT_COOLDOWN_MINUTES=60, ALERT_MIN_PAYMENT_ATTEMPTS=1)
+class AlertEngineTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def run_at(self, minutes, **state):
+        return evaluate_alerts(now=self.now + timedelta(minutes=minutes), snapshot=snapshot(**state))
+
+    def test_warnings_are_recorded_without_email(self):
+        self.run_at(0, past_due=15)
+        alert = AdminAlert.objects.get(rule='past_due_subscriptions')
+        self.assertEqual((alert.severity, alert.is_active), ('warning', True))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_cooldown_deduplicates_and_escalation_bypasses_it(self):
+        self.run_at(0, past_due=15)
+        self.run_at(1, past_due=25)  # escalated to critical
+        self.run_at(2, past_due=25)
+        self.run_at(30, past_due=25)
+        self.assertEqual(len(mail.outbox), 1)
+        self.run_at(62, past_due=25)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(AdminAlert.objects.count(), 1)
+
+    def test_recovery_notice_is_sent_once(self):
+        self.run_at(0, past_due=25)
+        self.run_at(5)
+        self.run_at(10)
+        self.assertEqual([m.subject.split(' ', 1)[1] for m in mail.outbox], [
+            'Critical: High past due subscriptions (25)',
+            'Resolved: past due subscriptions',
+        ])
+        alert = AdminAlert.objects.get()
+        self.assertFalse(alert.is_active)
+        self.assertIsNotNone(alert.resolved_at)
+
+    def test_all_notifications_share_one_connection(self):
+        with mock.patch('storefront.alerts.get_connection', wraps=mail.get_connection) as get_connection:
+            stats = self.run_at(0, past_due=25, attempts=10, completed=2, failed=8)
+        self.assertEqual(stats['notified'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        get_connection.assert_called_once()
+
+    def test_failed_send_is_retried_next_run(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            self.run_at(0, past_due=25)
+        self.assertIsNone(AdminAlert.objects.get().last_notified_at)
+        self.run_at(1, past_due=25)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_recovery_notice_is_retried_next_run(self):
+        self.run_at(0, past_due=25)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            self.run_at(5)
+        self.assertFalse(AdminAlert.objects.get().recovery_notified)
+        self.run_at(10)
+        self.run_at(15)
+        self.assertEqual(mail.outbox[-1].subject.split(' ', 1)[1], 'Resolved: past due subscriptions')
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertTrue(AdminAlert.objects.get().recovery_notified)
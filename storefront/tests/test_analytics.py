@@ -1,6 +1,9 @@
+import json
+
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
@@ -12,6 +15,9 @@ User = get_user_model()
 
 class AnalyticsViewsTests(TestCase):
     def setUp(self):
+        # Dashboards are cached; start every test cold
+        cache.clear()
+        
         # Create test user
         self.user = User.objects.create_user(
             username='testuser',
@@ -60,10 +66,12 @@ class AnalyticsViewsTests(TestCase):
             is_active=True
         )
         
-        # Create orders
+        # Create paid orders (analytics only count paid sales)
         order1 = Order.objects.create(
             user=self.user,
-            total_price=self.listing1.price
+            total_price=self.listing1.price,
+            status='paid',
+            paid_at=timezone.now()
         )
         OrderItem.objects.create(
             order=order1,
@@ -74,7 +82,9 @@ class AnalyticsViewsTests(TestCase):
         
         order2 = Order.objects.create(
             user=self.user,
-            total_price=self.listing2.price
+            total_price=self.listing2.price,
+            status='paid',
+            paid_at=timezone.now()
         )
         OrderItem.objects.create(
             order=order2,
@@ -131,6 +141,34 @@ class AnalyticsViewsTests(TestCase):
         self.assertTrue(any(a['type'] == 'Order' for a in recent_activity))
         # Reviews now shown in seller dashboard instead of listing specific
 
+    def test_orders_spanning_categories_count_once_per_store(self):
+        second_store = Store.objects.create(name='Second Store', slug='second-store', owner=self.user)
+        other_category = Category.objects.create(name='Other Category')
+        order = Order.objects.create(user=self.user, total_price=Decimal('0'), status='paid', paid_at=timezone.now())
+        for store, category in ((self.store, other_category), (second_store, self.category), (second_store, other_category)):
+            listing = Listing.objects.create(
+                title=f'{store.name} {category.name}', price=Decimal('50.00'), description='Test',
+                seller=self.user, store=store, category=category,
+            )
+            OrderItem.objects.create(order=order, listing=listing, quantity=1, price=listing.price)
+
+        response = self.client.get(reverse('storefront:seller_analytics'), {'period': '7d'})
+        # One order in each of the seller's two stores counts for both
+        self.assertEqual(response.context['total_orders'], 4)
+        trend = json.loads(response.context['revenue_orders_trend_data'])['datasets']
+        self.assertEqual((trend[1]['data'][-1], trend[2]['data'][-1]), (4, 2))
+        self.assertEqual({c['name']: c['orders'] for c in response.context['top_categories']}, {
+            'Test Category': 3, 'Other Category': 2,
+        })
+        self.assertEqual(
+            {s['slug']: s['orders'] for s in response.context['top_stores']},
+            {'test-store': 3, 'second-store': 1},
+        )
+
+        response = self.client.get(reverse('storefront:store_analytics', kwargs={'slug': 'second-store'}))
+        self.assertEqual(response.context['orders_count'], 1)
+        self.assertEqual(response.context['avg_order_value'], Decimal('100.00'))
+
     def test_store_analytics_view(self):
         """Test the individual store analytics view"""
         url = reverse('storefront:store_analytics', kwargs={'slug': self.store.slug})
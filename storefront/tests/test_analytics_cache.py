@@ -0,0 +1,90 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..analytics_cache import ANALYTICS, bump_version, data_version, get_or_compute
+
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {'revenue': self.calls}
+
+    def get(self, period='24h'):
+        return get_or_compute('seller_analytics', 1, period, 'seller:1', self.compute)
+
+    def bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('seller:1')
+
+    def test_fresh_results_are_reused_per_period(self):
+        self.assertEqual(self.get(), {'revenue': 1})
+        self.assertEqual(self.get(), {'revenue': 1})
+        self.assertEqual(self.get('30d'), {'revenue': 2})
+        self.assertEqual(self.calls, 2)
+
+    def test_unknown_periods_share_the_all_time_entry(self):
+        self.assertEqual(self.get('all'), {'revenue': 1})
+        self.assertEqual(self.get('1y'), {'revenue': 1})
+        self.assertEqual(self.get('x' * 200), {'revenue': 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_version_bump_waits_for_commit(self):
+        bump_version('seller:1')
+        self.assertEqual(data_version('seller:1'), 0)
+        self.bump()
+        self.assertNotEqual(data_version('seller:1'), 0)
+
+    @override_settings(ANALYTICS_CACHE_BACKGROUND_REFRESH=False)
+    def test_data_change_recomputes(self):
+        self.get()
+        self.bump()
+        self.assertEqual(self.get(), {'revenue': 2})
+
+    def test_stale_result_is_served_while_one_refresh_runs(self):
+        self.get()
+        self.bump()
+        with mock.patch('storefront.analytics_cache._start_refresh') as start_refresh:
+            self.assertEqual(self.get(), {'revenue': 1})
+            self.assertEqual(self.get(), {'revenue': 1})
+        self.assertEqual(start_refresh.call_count, 1)
+
+    def test_ttl_expiry_marks_result_stale(self):
+        self.get()
+        key = 'seller_analytics:1:24h'
+        entry = ANALYTICS.get(key)
+        entry['computed_at'] -= 61
+        ANALYTICS.set(key, entry)
+        with mock.patch('storefront.analytics_cache._start_refresh') as start_refresh:
+            self.assertEqual(self.get(), {'revenue': 1})
+        start_refresh.assert_called_once()
+
+    def test_concurrent_misses_compute_once(self):
+        release = threading.Event()
+        results = []
+
+        def slow_compute():
+            release.wait(5)
+            return self.compute()
+
+        def first():
+            results.append(get_or_compute('seller_analytics', 1, '24h', 'seller:1', slow_compute))
+
+        worker = threading.Thread(target=first)
+        worker.start()
+        while not cache.get('analytics:seller_analytics:1:24h:lock'):
+            pass
+        waiter = threading.Thread(target=lambda: results.append(self.get()))
+        waiter.start()
+        release.set()
+        worker.join()
+        waiter.join()
+
+        self.assertEqual(results, [{'revenue': 1}, {'revenue': 1}])
+        self.assertEqual(self.calls, 1)
@@ -0,0 +1,115 @@
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from homabay_souq.cache import Namespace, cache_stats, get_cache, reset_cache_stats, stats
+
+User = get_user_model()
+
+
+class NamespaceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+        self.addCleanup(cache.clear)
+        self.ns = Namespace('widgets')
+
+    def test_values_round_trip_under_the_namespace_prefix(self):
+        self.ns.set('a', {'n': 1})
+        self.assertEqual(self.ns.get('a'), {'n': 1})
+        self.assertIsNotNone(cache.get('widgets:a'))
+        self.assertIsNone(Namespace('gadgets').get('a'))
+
+    def test_bump_retires_every_entry(self):
+        self.ns.set_many({'a': 1, 'b': 2})
+        self.ns.bump()
+        self.assertEqual(self.ns.get_many(['a', 'b']), {})
+        self.ns.set('a', 3)
+        self.assertEqual(self.ns.get('a'), 3)
+
+    def test_losing_the_version_retires_every_entry(self):
+        self.ns.set('a', 1)
+        cache.delete('widgets:version')
+        self.assertIsNone(self.ns.get('a'))
+
+    def test_values_are_read_with_their_version_in_one_round_trip(self):
+        self.ns.set_many({'a': 1, 'b': 2})
+        with mock.patch.object(get_cache(), 'get_many', wraps=get_cache().get_many) as get_many:
+            self.assertEqual(self.ns.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        get_many.assert_called_once()
+
+    def test_values_computed_across_a_bump_are_not_kept(self):
+        version, found = self.ns.lookup(['a'])
+        self.ns.bump()
+        self.ns.set('a', 'computed from old data', version=version)
+        self.assertIsNone(self.ns.get('a'))
+
+    def test_concurrent_misses_compute_once(self):
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        first = threading.Thread(target=lambda: results.append(self.ns.get_or_set('slow', compute)))
+        first.start()
+        started.wait(5)
+        others = [threading.Thread(target=lambda: results.append(self.ns.get_or_set('slow', compute))) for _ in range(3)]
+        for thread in others:
+            thread.start()
+        release.set()
+        for thread in [first, *others]:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+
+class CacheStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.addCleanup(cache.clear)
+        self.ns = Namespace('widgets')
+
+    def test_hits_and_misses_are_counted_per_namespace(self):
+        self.ns.set('a', 1)
+        self.ns.get_many(['a', 'b'])
+        self.ns.get('a')
+        counts = cache_stats()['widgets']
+        self.assertEqual((counts['hits'], counts['misses'], counts['sets']), (2, 1, 1))
+        self.assertAlmostEqual(counts['hit_rate'], 2 / 3)
+        self.assertIsNotNone(counts['mean_latency_ms'])
+
+    def test_flushed_counts_are_shared_between_processes(self):
+        self.ns.get('a')
+        stats.flush()
+        self.assertEqual(stats.pending(), {})
+        # Another worker reading the shared totals sees this one's traffic
+        self.assertEqual(cache_stats()['widgets']['misses'], 1)
+
+    def test_staff_monitor_and_command_report_the_counts(self):
+        self.ns.get('a')
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('storefront:cache_monitor'))
+        self.assertEqual(response.json()['namespaces']['widgets']['misses'], 1)
+
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+        self.assertIn('widgets: 0.0% hits (0 hits, 1 misses)', out.getvalue())
+        self.assertNotIn('widgets', cache_stats())
+
+    def test_monitor_is_staff_only(self):
+        user = User.objects.create_user(username='seller', password='testpass123')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('storefront:cache_monitor')).status_code, 302)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..lifecycle import cancel_past_due_subscriptions, process_trial_expirations
+from ..models import MpesaPayment, Store, Subscription, SubscriptionTransition
+
+User = get_user_model()
+
+
+@override_settings(SUBSCRIPTION_TRANSITION_BATCH_SIZE=2)
+class SubscriptionLifecycleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='testpass123')
+        self.now = timezone.now()
+        self.count = 0
+
+    def make_subscription(self, paid=False, **fields):
+        self.count += 1
+        store = Store.objects.create(
+            owner=self.user, name=f'Store {self.count}', slug=f'store-{self.count}', is_premium=True
+        )
+        subscription = Subscription.objects.create(store=store, **fields)
+        if paid:
+            MpesaPayment.objects.create(
+                subscription=subscription, checkout_request_id=f'co-{self.count}',
+                merchant_request_id=f'mr-{self.count}', phone_number='254712345678',
+                amount=999, status='completed'
+            )
+        return subscription
+
+    def test_trials_convert_or_expire_in_batches(self):
+        ended = self.now - timedelta(days=1)
+        paid = [self.make_subscription(paid=True, status='trialing', trial_ends_at=ended) for _ in range(3)]
+        unpaid = self.make_subscription(status='trialing', trial_ends_at=ended)
+        running = self.make_subscription(status='trialing', trial_ends_at=self.now + timedelta(days=3))
+
+        # Per batch: select ids, update, audit row (+ store lookup and update when downgrading)
+        with self.assertNumQueries(19):
+            converted, expired = process_trial_expirations(now=self.now)
+
+        self.assertEqual((converted, expired), (3, 1))
+        for subscription in paid:
+            subscription.refresh_from_db()
+            self.assertEqual(subscription.status, 'active')
+            self.assertEqual(subscription.next_billing_date, self.now + timedelta(days=30))
+        unpaid.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(unpaid.status, 'cancelled')
+        self.assertFalse(Store.objects.get(pk=unpaid.store_id).is_premium)
+        self.assertEqual(running.status, 'trialing')
+        self.assertTrue(Store.objects.get(pk=running.store_id).is_premium)
+
+        audit = list(SubscriptionTransition.objects.order_by('pk').values_list(
+            'transition', 'subscription_count', 'stores_downgraded'
+        ))
+        self.assertEqual(audit, [
+            ('trial_converted', 2, 0),
+            ('trial_converted', 1, 0),
+            ('trial_expired', 1, 1),
+        ])
+
+    def test_past_due_cancelled_after_grace_period(self):
+        overdue = self.make_subscription(status='past_due', next_billing_date=self.now - timedelta(days=8))
+        in_grace = self.make_subscription(status='past_due', next_billing_date=self.now - timedelta(days=2))
+        # A store that is still on a live subscription keeps its premium flag
+        Subscription.objects.create(store=overdue.store, status='active')
+
+        self.assertEqual(cancel_past_due_subscriptions(now=self.now), 1)
+
+        overdue.refresh_from_db()
+        in_grace.refresh_from_db()
+        self.assertEqual((overdue.status, overdue.cancelled_at), ('cancelled', self.now))
+        self.assertEqual(in_grace.status, 'past_due')
+        self.assertTrue(Store.objects.get(pk=overdue.store_id).is_premium)
+        audit = SubscriptionTransition.objects.get()
+        self.assertEqual(audit.subscription_ids, [overdue.pk])
+        self.assertEqual(audit.stores_downgraded, 0)
+
+    def test_nothing_due_writes_no_audit_record(self):
+        self.make_subscription(status='active', next_billing_date=self.now + timedelta(days=10))
+        self.assertEqual(process_trial_expirations(now=self.now), (0, 0))
+        self.assertEqual(cancel_past_due_subscriptions(now=self.now), 0)
+        self.assertFalse(SubscriptionTransition.objects.exists())
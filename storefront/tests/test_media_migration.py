@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..media_migration import media_fields, migrate_media, pending_media
+from ..models import MediaMigrationCheckpoint, MigratedMedia, Store
+
+User = get_user_model()
+
+
+class FakeUploader:
+    """Stands in for cloudinary.uploader.upload; fails for file names in ``failing``"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.paths = []
+        self.lock = threading.Lock()
+
+    def __call__(self, path, folder):
+        with self.lock:
+            self.paths.append(os.path.basename(path))
+            number = len(self.paths)
+        if os.path.basename(path) in self.failing:
+            raise Exception("Upload failed: connection reset")
+        return {'public_id': f'{folder}/{number}', 'version': 1, 'format': 'png'}
+
+
+class MediaMigrationTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.write('store_logos/a.png', b'logo a')
+        self.write('store_logos/b.png', b'logo b')
+        # Same contents as a.png under another name
+        self.write('store_logos/copy.png', b'logo a')
+        self.stores = [
+            self.make_store('one', logo='store_logos/a.png'),
+            self.make_store('two', logo='store_logos/b.png'),
+            self.make_store('three', logo='store_logos/copy.png'),
+            self.make_store('four', logo='store_logos/missing.png'),
+        ]
+        self.logo = [(Store, Store._meta.get_field('logo'))]
+
+    def write(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def make_store(self, name, logo):
+        owner = User.objects.create_user(username=name, password='testpass123')
+        store = Store.objects.create(owner=owner, name=name, slug=name)
+        # Legacy rows: point at the file without going through the upload signals
+        Store.objects.filter(pk=store.pk).update(logo=logo)
+        return store
+
+    def logos(self):
+        return list(Store.objects.order_by('pk').values_list('logo', flat=True))
+
+    def test_covers_every_image_field(self):
+        labels = {f'{model._meta.label}.{field.name}' for model, field in media_fields()}
+        self.assertTrue({
+            'storefront.Store.logo', 'storefront.Store.cover_image', 'listings.Listing.image',
+            'listings.ListingImage.image', 'blog.BlogPost.image', 'users.User.profile_picture',
+        } <= labels)
+
+    def test_uploads_local_files_once_per_checksum(self):
+        uploader = FakeUploader()
+        self.assertEqual(pending_media(self.logo), {'storefront.Store.logo': 3})
+
+        report = migrate_media(self.logo, upload=uploader, workers=3, chunk_size=10)
+
+        self.assertEqual(sorted(uploader.paths), ['a.png', 'b.png'])
+        self.assertEqual((report.migrated, report.reused, report.skipped, report.failed), (2, 1, 1, 0))
+        self.assertEqual(report.bytes_uploaded, 12)
+        one, two, three, four = self.logos()
+        self.assertTrue(one.startswith('homabay_souq/storefront/store/'))
+        self.assertEqual(one, three)
+        self.assertNotEqual(one, two)
+        self.assertEqual(four, 'store_logos/missing.png')
+        self.assertEqual(MigratedMedia.objects.count(), 2)
+
+        checkpoint = MediaMigrationCheckpoint.objects.get(field='storefront.Store.logo')
+        self.assertEqual(checkpoint.last_pk, self.stores[-1].pk)
+        self.assertIsNotNone(checkpoint.completed_at)
+
+        # Nothing is left to do on a second run
+        again = FakeUploader()
+        migrate_media(self.logo, upload=again, restart=True)
+        self.assertEqual(again.paths, [])
+
+    def test_interrupted_run_resumes_after_its_checkpoint(self):
+        first = FakeUploader()
+        migrate_media(self.logo, upload=first, chunk_size=1, limit=2)
+        self.assertEqual(first.paths, ['a.png', 'b.png'])
+        checkpoint = MediaMigrationCheckpoint.objects.get(field='storefront.Store.logo')
+        self.assertEqual(checkpoint.last_pk, self.stores[1].pk)
+        self.assertIsNone(checkpoint.completed_at)
+
+        second = FakeUploader()
+        report = migrate_media(self.logo, upload=second, chunk_size=1)
+        # copy.png matches a.png's checksum, so nothing is uploaded again
+        self.assertEqual(second.paths, [])
+        self.assertEqual((report.migrated, report.reused, report.skipped), (0, 1, 1))
+        self.assertEqual(self.logos()[0], self.logos()[2])
+
+    def test_failed_uploads_leave_the_row_alone(self):
+        report = migrate_media(self.logo, upload=FakeUploader(failing={'b.png'}))
+        self.assertEqual((report.migrated, report.reused, report.failed), (1, 1, 1))
+        self.assertEqual(self.logos()[1], 'store_logos/b.png')
+        self.assertEqual(MediaMigrationCheckpoint.objects.get(field='storefront.Store.logo').failed, 1)
+
+    def test_failed_uploads_are_retried_by_the_next_run(self):
+        migrate_media(self.logo, upload=FakeUploader(failing={'b.png'}), chunk_size=1)
+        checkpoint = MediaMigrationCheckpoint.objects.get(field='storefront.Store.logo')
+        self.assertEqual(checkpoint.failed_pks, [self.stores[1].pk])
+        self.assertEqual(checkpoint.last_pk, self.stores[-1].pk)
+        self.assertIsNone(checkpoint.completed_at)
+        self.assertEqual(pending_media(self.logo), {'storefront.Store.logo': 1})
+
+        retry = FakeUploader()
+        report = migrate_media(self.logo, upload=retry)
+        self.assertEqual(retry.paths, ['b.png'])
+        self.assertEqual((report.migrated, report.failed), (1, 0))
+        self.assertNotEqual(self.logos()[1], 'store_logos/b.png')
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.failed_pks, [])
+        self.assertIsNotNone(checkpoint.completed_at)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import MpesaPayment, PaymentOutcomeBucket, Store, Subscription
+from ..monitoring import PaymentMonitor, payment_outcome_totals, prune_minute_buckets
+
+User = get_user_model()
+
+
+class PaymentMonitorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+        self.store = Store.objects.create(owner=self.user, name='Test Store', slug='test-store')
+        self.subscription = Subscription.objects.create(
+            store=self.store, status='active', trial_ends_at=timezone.now() - timedelta(days=1)
+        )
+
+    def pay(self, status, amount='999.00'):
+        payment = MpesaPayment.objects.create(
+            subscription=self.subscription, checkout_request_id='ws_CO_1', merchant_request_id='m-1',
+            phone_number='254712345678', amount=Decimal(amount),
+        )
+        if status != 'pending':
+            payment = MpesaPayment.objects.get(pk=payment.pk)
+            payment.status = status
+            payment.save()
+        return payment
+
+    def test_outcome_buckets_follow_payment_results(self):
+        self.pay('completed')
+        self.pay('failed')
+        self.pay('pending')
+
+        for resolution in ('minute', 'hour'):
+            bucket = PaymentOutcomeBucket.objects.get(resolution=resolution)
+            self.assertEqual((bucket.attempts, bucket.completed, bucket.failed), (3, 1, 1))
+            self.assertEqual(bucket.revenue, Decimal('999.00'))
+
+        with self.assertNumQueries(1):
+            self.assertAlmostEqual(PaymentMonitor.get_payment_success_rate(timedelta(hours=1)), 100 / 3)
+        self.assertEqual(payment_outcome_totals()['attempts'], 3)
+
+    def test_changed_outcome_moves_between_counters(self):
+        payment = self.pay('failed')
+        payment.status = 'completed'
+        payment.save()
+        totals = payment_outcome_totals(timedelta(hours=24))
+        self.assertEqual((totals['completed'], totals['failed']), (1, 0))
+
+    def test_old_minute_buckets_are_pruned(self):
+        self.pay('completed')
+        self.assertEqual(prune_minute_buckets(timezone.now() + timedelta(days=2)), 1)
+        self.assertTrue(PaymentOutcomeBucket.objects.filter(resolution='hour').exists())
+
+    def test_subscription_metrics_in_a_few_queries(self):
+        self.pay('completed', amount='1200.00')
+        Subscription.objects.create(store=self.store, status='cancelled')
+        Subscription.objects.create(store=self.store, status='past_due')
+
+        for period in (timedelta(hours=24), timedelta(days=7), timedelta(days=30), None):
+            with self.assertNumQueries(3):
+                metrics = PaymentMonitor.get_subscription_metrics(period)
+            self.assertEqual(metrics['total_subscriptions'], 3)
+            self.assertEqual(metrics['past_due_subscriptions'], 1)
+            self.assertAlmostEqual(metrics['churn_rate'], 100 / 3)
+            self.assertEqual(metrics['trial_conversion_rate'], 100)
+            self.assertEqual(metrics['total_revenue'], Decimal('1200.00'))
+            # MRR uses what the subscription is actually billed
+            self.assertEqual(metrics['mrr'], Decimal('1200.00'))
@@ -0,0 +1,137 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import MpesaPayment, RenewalAttempt, RenewalRun, Store, Subscription
+from ..mpesa import MpesaGateway
+from ..renewals import dispatch_renewals
+
+User = get_user_model()
+
+
+class FakeGateway:
+    """Stands in for MpesaGateway; fails for the phone numbers in ``failing``"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.pushes = []
+        self.lock = threading.Lock()
+
+    def _normalize_phone(self, phone):
+        return MpesaGateway._normalize_phone(None, phone)
+
+    def initiate_stk_push(self, phone, amount, account_reference):
+        with self.lock:
+            self.pushes.append(account_reference)
+        if phone in self.failing:
+            raise Exception("STK push failed: insufficient funds")
+        return {'CheckoutRequestID': f'ws_CO_{account_reference}', 'MerchantRequestID': f'mr_{account_reference}'}
+
+
+@override_settings(RENEWAL_CHUNK_SIZE=2, RENEWAL_DISPATCH_WORKERS=3, RENEWAL_REQUESTS_PER_SECOND=0)
+class RenewalDispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seller', password='testpass123')
+        self.now = timezone.now()
+
+    def make_subscription(self, n, phone='254712345678'):
+        store = Store.objects.create(owner=self.user, name=f'Store {n}', slug=f'store-{n}')
+        subscription = Subscription.objects.create(
+            store=store, status='active', next_billing_date=self.now - timedelta(days=1)
+        )
+        if phone:
+            MpesaPayment.objects.create(
+                subscription=subscription, checkout_request_id=f'old-{n}', merchant_request_id=f'old-{n}',
+                phone_number=phone, amount=999, status='completed'
+            )
+        return subscription
+
+    def test_every_due_subscription_is_pushed_once_across_chunks(self):
+        subscriptions = [self.make_subscription(n) for n in range(5)]
+        gateway = FakeGateway()
+
+        run = dispatch_renewals(now=self.now, gateway=gateway)
+
+        self.assertEqual(len(gateway.pushes), 5)
+        self.assertEqual((run.dispatched, run.failed, run.skipped), (5, 0, 0))
+        self.assertIsNotNone(run.finished_at)
+        for subscription in subscriptions:
+            attempt = RenewalAttempt.objects.get(subscription=subscription)
+            self.assertEqual(attempt.status, 'sent')
+            self.assertEqual(attempt.payment.status, 'pending')
+            self.assertEqual(attempt.payment.amount, 999)
+
+        # The billing date has not moved yet (that happens on the callback),
+        # but the attempt marks it as charged
+        dispatch_renewals(now=self.now, gateway=gateway)
+        self.assertEqual(len(gateway.pushes), 5)
+
+    def test_failed_push_marks_past_due_and_missing_phone_is_skipped(self):
+        failing = self.make_subscription(1, phone='254700000001')
+        no_phone = self.make_subscription(2, phone=None)
+        ok = self.make_subscription(3)
+
+        run = dispatch_renewals(now=self.now, gateway=FakeGateway(failing={'254700000001'}))
+
+        self.assertEqual((run.dispatched, run.failed, run.skipped), (1, 1, 1))
+        failing.refresh_from_db()
+        no_phone.refresh_from_db()
+        ok.refresh_from_db()
+        self.assertEqual(failing.status, 'past_due')
+        self.assertIn('insufficient funds', RenewalAttempt.objects.get(subscription=failing).error)
+        self.assertEqual(no_phone.status, 'active')
+        self.assertFalse(RenewalAttempt.objects.filter(subscription=no_phone).exists())
+        self.assertEqual(ok.status, 'active')
+
+    def test_reservations_from_a_crashed_run_are_never_pushed_again(self):
+        crashed = self.make_subscription(1)
+        pending = self.make_subscription(2)
+        old_run = RenewalRun.objects.create()
+        attempt = RenewalAttempt.objects.create(
+            subscription=crashed, billing_date=crashed.next_billing_date, run=old_run
+        )
+        RenewalAttempt.objects.filter(pk=attempt.pk).update(updated_at=self.now - timedelta(hours=1))
+        gateway = FakeGateway()
+
+        run = dispatch_renewals(now=self.now, gateway=gateway)
+
+        self.assertEqual(gateway.pushes, [f'Store-{pending.store_id}-Renewal'])
+        self.assertEqual(run.unconfirmed, 1)
+        attempt.refresh_from_db()
+        crashed.refresh_from_db()
+        self.assertEqual(attempt.status, 'unknown')
+        self.assertEqual(crashed.status, 'past_due')
+
+    def test_next_billing_date_gets_a_new_attempt(self):
+        subscription = self.make_subscription(1)
+        gateway = FakeGateway()
+        dispatch_renewals(now=self.now, gateway=gateway)
+
+        Subscription.objects.filter(pk=subscription.pk).update(next_billing_date=self.now + timedelta(days=29))
+        dispatch_renewals(now=self.now + timedelta(days=30), gateway=gateway)
+
+        self.assertEqual(len(gateway.pushes), 2)
+        self.assertEqual(RenewalAttempt.objects.filter(subscription=subscription, status='sent').count(), 2)
+
+
+class GatewayTokenTests(TestCase):
+    @patch('storefront.mpesa.MpesaGateway._fetch_token', return_value=('token-1', 3599))
+    def test_token_is_fetched_once_and_shared(self, fetch_token):
+        gateway = MpesaGateway()
+        threads = [threading.Thread(target=gateway.get_token) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(gateway.get_token(), 'token-1')
+        self.assertEqual(fetch_token.call_count, 1)
+
+    @patch('storefront.mpesa.MpesaGateway._fetch_token', side_effect=[('token-1', 0), ('token-2', 3599)])
+    def test_expired_token_is_renewed(self, fetch_token):
+        gateway = MpesaGateway()
+        self.assertEqual(gateway.get_token(), 'token-1')
+        self.assertEqual(gateway.get_token(), 'token-2')
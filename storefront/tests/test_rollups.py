@@ -0,0 +1,107 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from listings.models import Category, Listing, Order, OrderItem
+from ..models import Store, StoreDailyOrders, StoreDailyStats
+from ..rollups import rebuild_store_stats
+
+User = get_user_model()
+
+
+class StoreDailyStatsTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', email='seller@test.com', password='testpass123')
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@test.com', password='testpass123')
+        self.store = Store.objects.create(name='Test Store', slug='test-store', owner=self.seller)
+        self.category = Category.objects.create(name='Phones')
+        self.listing = Listing.objects.create(
+            title='Phone', price=Decimal('100.00'), description='Test', seller=self.seller,
+            store=self.store, category=self.category, stock=10,
+        )
+
+    def place_order(self, price='100.00', quantity=1, city='Homa Bay'):
+        order = Order.objects.create(user=self.buyer, total_price=Decimal(price), city=city)
+        OrderItem.objects.create(order=order, listing=self.listing, quantity=quantity, price=Decimal(price))
+        return order
+
+    def stats(self):
+        return StoreDailyStats.objects.get(store=self.store, category=self.category, city='Homa Bay')
+
+    def daily_orders(self):
+        daily = StoreDailyOrders.objects.get(store=self.store, city='Homa Bay')
+        return daily.orders, daily.buyers
+
+    def test_pending_orders_are_not_counted(self):
+        self.place_order()
+        self.assertFalse(StoreDailyStats.objects.exists())
+
+    def test_paying_orders_rolls_them_up(self):
+        first = self.place_order(quantity=2)
+        first.mark_as_paid()
+        second = self.place_order(price='50.00')
+        second.mark_as_paid()
+
+        stats = self.stats()
+        self.assertEqual(stats.date, timezone.localdate())
+        self.assertEqual(stats.revenue, Decimal('150.00'))
+        self.assertEqual(stats.items, 3)
+        self.assertEqual(stats.orders, 2)
+        self.assertEqual(self.daily_orders(), (2, 1))
+
+    def test_items_added_to_and_removed_from_a_paid_order(self):
+        order = self.place_order()
+        order.mark_as_paid()
+        extra = OrderItem.objects.create(order=order, listing=self.listing, quantity=1, price=Decimal('30.00'))
+        self.assertEqual((self.stats().revenue, self.stats().items), (Decimal('130.00'), 2))
+        self.assertEqual((self.stats().orders, self.daily_orders()), (1, (1, 1)))
+
+        extra.delete()
+        self.assertEqual((self.stats().revenue, self.stats().items), (Decimal('100.00'), 1))
+        self.assertEqual((self.stats().orders, self.daily_orders()), (1, (1, 1)))
+
+    def test_cancelling_a_paid_order_removes_it(self):
+        kept = self.place_order()
+        kept.mark_as_paid()
+        cancelled = self.place_order(price='40.00')
+        cancelled.mark_as_paid()
+
+        cancelled = Order.objects.get(pk=cancelled.pk)
+        cancelled.status = 'cancelled'
+        cancelled.save()
+
+        stats = self.stats()
+        self.assertEqual((stats.revenue, stats.items, stats.orders), (Decimal('100.00'), 1, 1))
+        self.assertEqual(self.daily_orders(), (1, 1))
+
+        kept = Order.objects.get(pk=kept.pk)
+        kept.status = 'cancelled'
+        kept.save()
+        self.assertEqual(self.daily_orders(), (0, 0))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for price in ('100.00', '25.00'):
+            self.place_order(price=price).mark_as_paid()
+        self.place_order(city='Rodi').mark_as_paid()
+        incremental = sorted(StoreDailyStats.objects.values_list('city', 'revenue', 'items', 'orders'))
+        incremental_orders = sorted(StoreDailyOrders.objects.values_list('city', 'orders', 'buyers'))
+
+        StoreDailyStats.objects.update(revenue=0, items=0, orders=0)
+        StoreDailyOrders.objects.all().delete()
+        self.assertEqual(rebuild_store_stats(), 2)
+        self.assertEqual(
+            sorted(StoreDailyStats.objects.values_list('city', 'revenue', 'items', 'orders')),
+            incremental,
+        )
+        self.assertEqual(
+            sorted(StoreDailyOrders.objects.values_list('city', 'orders', 'buyers')),
+            incremental_orders,
+        )
+
+        StoreDailyStats.objects.all().delete()
+        call_command('rebuild_store_stats', '--store', self.store.slug, stdout=StringIO())
+        self.assertEqual(StoreDailyStats.objects.count(), 2)
@@ -35,6 +35,7 @@ urlpatterns = [
     
     # Payment monitoring
     path('dashboard/monitor/payments/', views.payment_monitor, name='payment_monitor'),
+    path('dashboard/monitor/cache/', views.cache_monitor, name='cache_monitor'),
     
     # M-Pesa webhook
     path('mpesa/callback/', mpesa_webhook.mpesa_callback, name='mpesa_callback'),
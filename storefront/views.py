@@ -2,27 +2,61 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
-from .models import Store, Subscription, MpesaPayment
+from .models import Store, Subscription, MpesaPayment, AdminAlert
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from listings.models import Listing, Category
 from listings.forms import ListingForm
 from .forms import StoreForm
 from listings.models import ListingImage
+from listings.gallery import queue_gallery_uploads
+from homabay_souq.conditional import Validators, collection_versions, conditional_page
+from homabay_souq.page_cache import cache_anonymous_page, tag_page
 
 
+@cache_anonymous_page('stores')
 def store_list(request):
     stores = Store.objects.filter()
+    # Tiles show each store's product count
+    tag_page(request, *(f'store:{pk}' for pk in stores.values_list('pk', flat=True)))
     return render(request, 'storefront/store_list.html', {'stores': stores})
 
 
+def store_validators(request, slug):
+    updated = Store.objects.filter(slug=slug).values_list('updated_at', flat=True).first()
+    if updated is None:
+        return None
+    versions = collection_versions('listings', 'reviews')
+    return Validators('store', slug, updated, versions, modified=[updated, *versions.values()])
+
+
+def product_validators(request, store_slug, slug):
+    row = Listing.objects.filter(store__slug=store_slug, slug=slug).values_list(
+        'date_updated', 'store__updated_at'
+    ).first()
+    if row is None:
+        return None
+    versions = collection_versions('listings', 'reviews')
+    return Validators('product', store_slug, slug, row, versions, modified=[*row, *versions.values()])
+
+
+def store_tags(request, slug):
+    pk = Store.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return None if pk is None else [f'store:{pk}']
+
+
+@conditional_page(store_validators)
+@cache_anonymous_page(store_tags)
 def store_detail(request, slug):
     store = get_object_or_404(Store, slug=slug)
     # Only show listings associated with this specific store
     products = Listing.objects.filter(store=store, is_active=True)
+    for listing_id, category_id in products.values_list('pk', 'category_id'):
+        tag_page(request, f'listing:{listing_id}', f'category:{category_id}')
     return render(request, 'storefront/store_detail.html', {'store': store, 'products': products})
 
 
+@conditional_page(product_validators)
 def product_detail(request, store_slug, slug):
     store = get_object_or_404(Store, slug=store_slug)
     # Only show products associated with this specific store
@@ -233,24 +267,8 @@ def product_create(request, store_slug):
             listing.seller = request.user
             listing.store = store
             listing.save()
-            # Handle multiple uploaded images robustly
-            images = request.FILES.getlist('images')
-            failed_images = []
-            max_size = getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024)
-            for img in images:
-                try:
-                    # Basic validation: content type and size
-                    content_type = getattr(img, 'content_type', '')
-                    size = getattr(img, 'size', None)
-                    if content_type and not content_type.startswith('image/'):
-                        raise ValueError('Invalid file type')
-                    if size is not None and size > max_size:
-                        raise ValueError('File too large')
-
-                    ListingImage.objects.create(listing=listing, image=img)
-                except Exception as e:
-                    # Log and track failed image; continue processing
-                    failed_images.append({'name': getattr(img, 'name', 'unknown'), 'error': str(e)})
+            # Gallery images are validated and staged here, then uploaded in the background
+            failed_images = queue_gallery_uploads(listing, request.FILES.getlist('images'))
 
             if failed_images:
                 # Keep the listing but inform the user which images failed to upload.
@@ -311,21 +329,8 @@ def product_edit(request, pk):
             
             listing.save()
             
-            # Handle additional uploaded images
-            images = request.FILES.getlist('images')
-            failed_images = []
-            max_size = getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', 5 * 1024 * 1024)
-            for img in images:
-                try:
-                    content_type = getattr(img, 'content_type', '')
-                    size = getattr(img, 'size', None)
-                    if content_type and not content_type.startswith('image/'):
-                        raise ValueError('Invalid file type')
-                    if size is not None and size > max_size:
-                        raise ValueError('File too large')
-                    ListingImage.objects.create(listing=listing, image=img)
-                except Exception as e:
-                    failed_images.append({'name': getattr(img, 'name', 'unknown'), 'error': str(e)})
+            # Gallery images are validated and staged here, then uploaded in the background
+            failed_images = queue_gallery_uploads(listing, request.FILES.getlist('images'))
 
             if failed_images:
                 err_msgs = '; '.join([f"{f['name']}: {f['error']}" for f in failed_images])
@@ -426,10 +431,14 @@ from .mpesa import MpesaGateway
 from .forms import UpgradeForm
 from django.db.models import Q, Sum, Count, Avg
 from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from .monitoring import PaymentMonitor
 from reviews.models import Review
 from listings.models import OrderItem
 from .utils import dumps_with_decimals
+from .analytics import normalize_period, seller_analytics_data, store_analytics_data
+from .analytics_cache import PAYMENTS_SCOPE, get_or_compute, seller_scope
+from homabay_souq.cache import cache_stats
 
 @login_required
 def subscription_manage(request, slug):
@@ -525,13 +534,13 @@ def cancel_subscription(request, slug):
 def payment_monitor(request):
     """Admin view for monitoring payment system health.
 
-    Supports time periods via ?period=24h|7d|30d|all and sends email alerts
-    to ADMINS for critical conditions.
+    Supports time periods via ?period=24h|7d|30d|all and shows the alerts
+    currently raised by `manage.py evaluate_alerts`.
     """
     monitor = PaymentMonitor()
     
     # Determine time period
-    period = request.GET.get('period', '24h')
+    period = normalize_period(request.GET.get('period', '24h'))
     time_period = None
     if period == '24h':
         time_period = timedelta(hours=24)
@@ -541,76 +550,24 @@ def payment_monitor(request):
         time_period = timedelta(days=30)
     # else 'all' -> time_period stays None
 
-    # Gather metrics
-    success_rate = monitor.get_payment_success_rate(time_period)
-    failed_payments = monitor.get_failed_payments()
-    subscription_metrics = monitor.get_subscription_metrics(time_period)
-
-    alerts = []
-
-    # Payment success rate alerting
-    if success_rate < 70:
-        severity = 'critical' if success_rate < 50 else 'warning'
-        alerts.append({
-            'message': f'Payment success rate low: {success_rate:.1f}%',
-            'severity': severity,
-            'timestamp': timezone.now()
-        })
-        # Send email on critical
-        if severity == 'critical':
-            try:
-                from .alerts import send_admin_alert
-                send_admin_alert(
-                    subject=f"Critical: Low payment success rate {success_rate:.1f}%",
-                    message=f"Payment success rate for period {period} is {success_rate:.1f}%. Please investigate."
-                )
-            except Exception:
-                # Don't raise in view; just log via logger configured elsewhere
-                pass
-
-    # Past due subscriptions
-    past_due = subscription_metrics.get('past_due_subscriptions', 0)
-    if past_due > 10:
-        severity = 'critical' if past_due > 20 else 'warning'
-        alerts.append({
-            'message': f'High number of past due subscriptions: {past_due}',
-            'severity': severity,
-            'timestamp': timezone.now()
-        })
-        if severity == 'critical':
-            try:
-                from .alerts import send_admin_alert
-                send_admin_alert(
-                    subject=f"Critical: High past due subscriptions ({past_due})",
-                    message=f"There are {past_due} past-due subscriptions. Please review billing and customer outreach."
-                )
-            except Exception:
-                pass
-
-    # Trial conversion / churn alerts (warning level)
-    if subscription_metrics.get('trial_conversion_rate', 100) < 30:
-        alerts.append({
-            'message': f"Low trial conversion rate: {subscription_metrics.get('trial_conversion_rate', 0):.1f}%",
-            'severity': 'warning',
-            'timestamp': timezone.now()
-        })
-
-    if subscription_metrics.get('churn_rate', 0) > 5:
-        severity = 'critical' if subscription_metrics.get('churn_rate') > 10 else 'warning'
-        alerts.append({
-            'message': f"High churn rate: {subscription_metrics.get('churn_rate'):.1f}%",
-            'severity': severity,
-            'timestamp': timezone.now()
-        })
-        if severity == 'critical':
-            try:
-                from .alerts import send_admin_alert
-                send_admin_alert(
-                    subject=f"Critical: High churn rate {subscription_metrics.get('churn_rate'):.1f}%",
-                    message=f"Churn rate has exceeded acceptable threshold: {subscription_metrics.get('churn_rate'):.1f}%"
-                )
-            except Exception:
-                pass
+    # Gather metrics (cached until payments or subscriptions change)
+    def compute_metrics():
+        return {
+            'failed_payments': list(monitor.get_failed_payments()),
+            'subscription_metrics': monitor.get_subscription_metrics(time_period),
+        }
+    
+    metrics = get_or_compute('payment_monitor', 'staff', period, PAYMENTS_SCOPE, compute_metrics)
+    failed_payments = metrics['failed_payments']
+    subscription_metrics = metrics['subscription_metrics']
+    success_rate = subscription_metrics['success_rate']
+
+    # Alert state is maintained by `manage.py evaluate_alerts`; just read it
+    alerts = [{
+        'message': alert.message,
+        'severity': alert.severity,
+        'timestamp': alert.first_seen_at,
+    } for alert in AdminAlert.objects.filter(is_active=True)]
 
     # Prepare context for template (use enhanced template)
     daily_trends = subscription_metrics.get('daily_trends', [])
@@ -633,261 +590,25 @@ def payment_monitor(request):
 
     return render(request, 'storefront/payment_monitor_enhanced.html', context)
 
+@staff_member_required
+def cache_monitor(request):
+    """Hit rate, traffic and latency per cache namespace, as JSON for monitoring"""
+    return JsonResponse({'namespaces': cache_stats()})
+
 @login_required
 def seller_analytics(request):
     """
     Seller analytics dashboard showing aggregated metrics across all stores.
     """
-    # Get all stores owned by the user
-    stores = Store.objects.filter(owner=request.user)
-    
-    # Get time period from query params
-    period = request.GET.get('period', '24h')
-    time_period = None
-    previous_period = None
-    
-    if period == '24h':
-        time_period = timezone.now() - timedelta(hours=24)
-        previous_period = timezone.now() - timedelta(hours=48)
-    elif period == '7d':
-        time_period = timezone.now() - timedelta(days=7)
-        previous_period = timezone.now() - timedelta(days=14)
-    elif period == '30d':
-        time_period = timezone.now() - timedelta(days=30)
-        previous_period = timezone.now() - timedelta(days=60)
-    
-    # Base queryset for orders across all stores
-    orders_qs = OrderItem.objects.filter(listing__store__in=stores)
-    
-    # Current period metrics
-    if time_period:
-        current_orders = orders_qs.filter(added_at__gte=time_period)
-        current_revenue = current_orders.aggregate(
-            total=Sum('price', default=0)
-        )['total']
-        current_order_count = current_orders.count()
-        
-        # Previous period for trend calculation
-        previous_orders = orders_qs.filter(
-            added_at__gte=previous_period,
-            added_at__lt=time_period
-        )
-        previous_revenue = previous_orders.aggregate(
-            total=Sum('price', default=0)
-        )['total']
-        previous_order_count = previous_orders.count()
-        
-        # Calculate trends
-        revenue_trend = (
-            ((current_revenue - previous_revenue) / previous_revenue * 100)
-            if previous_revenue else 0
-        )
-        orders_trend = (
-            ((current_order_count - previous_order_count) / previous_order_count * 100)
-            if previous_order_count else 0
-        )
-    else:
-        # All time metrics
-        current_revenue = orders_qs.aggregate(
-            total=Sum('price', default=0)
-        )['total']
-        current_order_count = orders_qs.count()
-        revenue_trend = 0
-        orders_trend = 0
-    
-    # Store metrics
-    active_stores = stores.count()
-    premium_stores = stores.filter(is_premium=True).count()
-    active_listings = Listing.objects.filter(
-        store__in=stores,
-        is_active=True
-    ).count()
-    
-    # Revenue & Orders trend data
-    trend_days = 30 if period == '30d' else (7 if period == '7d' else 1)
-    revenue_data = []
-    orders_data = []
-    labels = []
-    
-    for i in range(trend_days):
-        day = timezone.now() - timedelta(days=i)
-        day_orders = orders_qs.filter(added_at__date=day.date())
-        
-        revenue = day_orders.aggregate(
-            total=Sum('price', default=0)
-        )['total']
-        orders = day_orders.count()
-        
-        revenue_data.insert(0, revenue)
-        orders_data.insert(0, orders)
-        labels.insert(0, day.strftime('%b %d'))
-    
-    revenue_orders_trend_data = {
-        'labels': labels,
-        'datasets': [
-            {
-                'label': 'Revenue',
-                'data': revenue_data,
-                'borderColor': '#4CAF50',
-                'yAxisID': 'y',
-            },
-            {
-                'label': 'Orders',
-                'data': orders_data,
-                'borderColor': '#2196F3',
-                'yAxisID': 'y1',
-            }
-        ]
-    }
-    
-    # Store performance distribution
-    store_performance = []
-    for store in stores:
-        store_revenue = orders_qs.filter(
-            listing__store=store
-        ).aggregate(total=Sum('price', default=0))['total']
-        store_performance.append({
-            'name': store.name,
-            'revenue': store_revenue
-        })
-    
-    store_performance.sort(key=lambda x: x['revenue'], reverse=True)
-    store_performance_data = {
-        'labels': [s['name'] for s in store_performance],
-        'datasets': [{
-            'data': [s['revenue'] for s in store_performance],
-            'backgroundColor': [
-                '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'
-            ]
-        }]
-    }
-    
-    # Top performing stores
-    top_stores = []
-    for store in stores:
-        store_orders = orders_qs.filter(listing__store=store)
-        store_revenue = store_orders.aggregate(
-            total=Sum('price', default=0)
-        )['total']
-        
-        # Calculate average rating
-        store_ratings = Review.objects.filter(
-            seller=store.owner
-        ).aggregate(avg_rating=Avg('rating', default=0))
-        
-        top_stores.append({
-            'name': store.name,
-            'slug': store.slug,
-            'revenue': store_revenue,
-            'orders': store_orders.count(),
-            'rating': store_ratings['avg_rating']
-        })
-    
-    top_stores.sort(key=lambda x: x['revenue'], reverse=True)
-    
-    # Top categories
-    top_categories = []
-    categories = Category.objects.filter(
-        listing__store__in=stores
-    ).distinct()
-    
-    for category in categories:
-        category_orders = orders_qs.filter(
-            listing__category=category
-        )
-        revenue = category_orders.aggregate(
-            total=Sum('price', default=0)
-        )['total']
-        
-        top_categories.append({
-            'name': category.name,
-            'revenue': revenue,
-            'orders': category_orders.count(),
-            'listings': Listing.objects.filter(
-                store__in=stores,
-                category=category,
-                is_active=True
-            ).count()
-        })
-    
-    top_categories.sort(key=lambda x: x['revenue'], reverse=True)
-    top_categories = top_categories[:5]
-    
-    # Recent activity across all stores
-    recent_activity = []
-    
-    # Recent orders
-    recent_orders = orders_qs.order_by('-added_at')[:5]
-    for order in recent_orders:
-        recent_activity.append({
-            'timestamp': order.added_at,
-            'store': order.listing.store.name,
-            'type': 'Order',
-            'description': f'New order for {order.listing.title}'
-        })
-    
-    # Recent reviews
-    recent_reviews = Review.objects.filter(
-        seller__in=[store.owner for store in stores]
-    ).order_by('-date_created')[:5]
-    
-    for review in recent_reviews:
-        recent_activity.append({
-            'timestamp': review.date_created,
-            'store': review.seller.stores.first().name if review.seller.stores.exists() else 'Unknown Store',
-            'type': 'Review',
-            'description': f'{review.rating}★ review by {review.reviewer.username}'
-        })
-    
-    # Recent listings
-    recent_listings = Listing.objects.filter(
-        store__in=stores
-    ).order_by('-date_created')[:5]
-    
-    for listing in recent_listings:
-        recent_activity.append({
-            'timestamp': listing.date_created,
-            'store': listing.store.name,
-            'type': 'Listing',
-            'description': f'New listing: {listing.title}'
-        })
-    
-    recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
-    recent_activity = recent_activity[:10]
-    
-    # Customer location data
-    customer_locations = orders_qs.values(
-        'order__city'
-    ).annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
-    
-    customer_map_data = {
-        'labels': [loc['order__city'] for loc in customer_locations],
-        'datasets': [{
-            'data': [loc['count'] for loc in customer_locations],
-            'backgroundColor': [
-                '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'
-            ]
-        }]
-    }
+    period = normalize_period(request.GET.get('period', '24h'))
+    context = get_or_compute(
+        'seller_analytics', request.user.pk, period, seller_scope(request.user.pk),
+        lambda: seller_analytics_data(request.user, period),
+    )
     
-    context = {
-        'period': period,
-        'total_revenue': current_revenue,
-        'total_orders': current_order_count,
-        'revenue_trend': round(revenue_trend, 1),
-        'orders_trend': round(orders_trend, 1),
-        'active_stores': active_stores,
-        'premium_stores': premium_stores,
-        'active_listings': active_listings,
-        'revenue_orders_trend_data': dumps_with_decimals(revenue_orders_trend_data),
-        'store_performance_data': dumps_with_decimals(store_performance_data),
-        'top_stores': top_stores[:5],
-        'top_categories': top_categories,
-        'recent_activity': recent_activity,
-        'customer_map_data': dumps_with_decimals(customer_map_data)
-    }
+    context = {**context}
+    for key in ('revenue_orders_trend_data', 'store_performance_data', 'customer_map_data'):
+        context[key] = dumps_with_decimals(context[key])
     
     return render(request, 'storefront/seller_analytics.html', context)
 
@@ -897,194 +618,15 @@ def store_analytics(request, slug):
     Store analytics view with comprehensive metrics and visualizations.
     """
     store = get_object_or_404(Store, slug=slug, owner=request.user)
-    
-    # Get time period from query params
-    period = request.GET.get('period', '24h')
-    time_period = None
-    
-    if period == '24h':
-        time_period = timezone.now() - timedelta(hours=24)
-    elif period == '7d':
-        time_period = timezone.now() - timedelta(days=7)
-    elif period == '30d':
-        time_period = timezone.now() - timedelta(days=30)
-    
-    # Base queryset for the store's listings
-    listings_qs = Listing.objects.filter(store=store)
-    orders_qs = OrderItem.objects.filter(listing__store=store)
-    
-    if time_period:
-        orders_qs = orders_qs.filter(added_at__gte=time_period)
-    
-    # Basic metrics
-    revenue = orders_qs.aggregate(
-        total=Sum('price', default=0)
-    )['total']
-    
-    orders_count = orders_qs.count()
-    active_listings = listings_qs.filter(is_active=True).count()
-    avg_order_value = orders_qs.aggregate(
-        avg=Avg('price', default=0)
-    )['avg']
-    
-    # Revenue trend (daily data points)
-    trend_days = 30 if period == '30d' else (7 if period == '7d' else 1)
-    revenue_trend = []
-    labels = []
-    
-    for i in range(trend_days):
-        day = timezone.now() - timedelta(days=i)
-        day_revenue = orders_qs.filter(
-            added_at__date=day.date()
-        ).aggregate(total=Sum('price', default=0))['total']
-        
-        revenue_trend.insert(0, day_revenue)
-        labels.insert(0, day.strftime('%b %d'))
-    
-    revenue_trend_data = {
-        'labels': labels,
-        'datasets': [{
-            'label': 'Daily Revenue',
-            'data': revenue_trend,
-            'fill': False,
-            'borderColor': '#4CAF50',
-            'tension': 0.1
-        }]
-    }
-    
-    # Top categories by sales
-    category_sales = orders_qs.values(
-        'listing__category__name'
-    ).annotate(
-        total_sales=Count('id'),
-        revenue=Sum('price')
-    ).order_by('-total_sales')[:5]
-    
-    category_data = {
-        'labels': [item['listing__category__name'] for item in category_sales],
-        'datasets': [{
-            'data': [item['total_sales'] for item in category_sales],
-            'backgroundColor': [
-                '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'
-            ]
-        }]
-    }
-    
-    # Top performing products
-    top_products = orders_qs.values(
-        'listing__title'
-    ).annotate(
-        sales_count=Count('id'),
-        revenue=Sum('price')
-    ).order_by('-revenue')[:5]
-    
-    # Recent activity (orders, reviews, listings)
-    recent_activity = []
-    
-    # Add recent orders
-    recent_orders = orders_qs.order_by('-added_at')[:5]
-    for order in recent_orders:
-        recent_activity.append({
-            'timestamp': order.added_at,
-            'type': 'Order',
-            'description': f'New order for {order.listing.title}'
-        })
-    
-    # Add recent reviews
-    recent_reviews = Review.objects.filter(
-        seller=store.owner
-    ).order_by('-date_created')[:5]
-    
-    for review in recent_reviews:
-        recent_activity.append({
-            'timestamp': review.date_created,
-            'type': 'Review',
-            'description': f'{review.rating}★ review by {review.reviewer.username}'
-        })
-    
-    # Add recent listings
-    recent_listings = listings_qs.order_by('-date_created')[:5]
-    for listing in recent_listings:
-        recent_activity.append({
-            'timestamp': listing.date_created,
-            'type': 'Listing',
-            'description': f'New listing: {listing.title}'
-        })
-    
-    # Sort combined activity by timestamp
-    recent_activity.sort(key=lambda x: x['timestamp'], reverse=True)
-    recent_activity = recent_activity[:10]  # Keep top 10
-    
-    # Customer demographics (if we have user data)
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    buyer_ages = (
-        User.objects.filter(
-            orders__order_items__listing__store=store,
-            date_of_birth__isnull=False
-        )
-        .values('date_of_birth')
-        .annotate(count=Count('id'))
-        .order_by('date_of_birth')
+    period = normalize_period(request.GET.get('period', '24h'))
+    context = get_or_compute(
+        'store_analytics', store.pk, period, seller_scope(store.owner_id),
+        lambda: store_analytics_data(store, period),
     )
+    context = {**context, 'store': store}
     
-    age_ranges = ['18-24', '25-34', '35-44', '45-54', '55+']
-    age_data = [0] * len(age_ranges)
-    
-    for buyer in buyer_ages:
-        age = (timezone.now().date() - buyer['date_of_birth']).days // 365
-        if age < 25:
-            age_data[0] += buyer['count']
-        elif age < 35:
-            age_data[1] += buyer['count']
-        elif age < 45:
-            age_data[2] += buyer['count']
-        elif age < 55:
-            age_data[3] += buyer['count']
-        else:
-            age_data[4] += buyer['count']
-    
-    demographics_data = {
-        'labels': age_ranges,
-        'datasets': [{
-            'label': 'Buyers by Age Range',
-            'data': age_data,
-            'backgroundColor': '#4CAF50'
-        }]
-    }
-    
-    # Customer locations
-    locations = orders_qs.values(
-        'order__city'
-    ).annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
-    
-    locations_data = {
-        'labels': [loc['order__city'] for loc in locations],
-        'datasets': [{
-            'data': [loc['count'] for loc in locations],
-            'backgroundColor': [
-                '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'
-            ]
-        }]
-    }
-    
-    context = {
-        'store': store,
-        'period': period,
-        'revenue': revenue,
-        'orders_count': orders_count,
-        'active_listings': active_listings,
-        'avg_order_value': avg_order_value,
-        'revenue_trend_data': dumps_with_decimals(revenue_trend_data),
-        'category_data': dumps_with_decimals(category_data),
-        'top_products': top_products,
-        'recent_activity': recent_activity,
-        'demographics_data': dumps_with_decimals(demographics_data),
-        'locations_data': dumps_with_decimals(locations_data),
-    }
+    for key in ('revenue_trend_data', 'category_data', 'demographics_data', 'locations_data'):
+        context[key] = dumps_with_decimals(context[key])
     
     return render(request, 'storefront/store_analytics.html', context)
 